@@ -0,0 +1,227 @@
+"""
+Almacén de descargas direccionado por contenido.
+
+Cada archivo se descarga una sola vez: los bytes se guardan en
+objetos/<sha256[:2]>/<sha256><ext> y la clave (ID de Drive + formato de
+exportación) apunta a su hash en claves/<..>.json. Las rutas del árbol de
+salida (por alumno y tarea) se crean como enlaces duros al objeto, o como
+reflink / copia si el sistema de archivos no los permite. Así una plantilla
+repartida a toda la clase o un archivo entregado en varias tareas ocupa
+disco y pide red una vez.
+
+Ojo: con enlaces duros, editar un archivo del árbol edita el objeto.
+
+No hay índice global: cada clave es un JSON aparte escrito de forma atómica,
+así que varios procesos (modo lote con --procesos) pueden compartir almacén.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import itertools
+
+from descargas import extension_descarga
+from manifiesto import sha256_archivo
+
+ALMACEN_POR_DEFECTO = "almacen_classroom"
+
+# ioctl FICLONE de Linux (reflink en btrfs, XFS...)
+FICLONE = 0x40049409
+
+
+def _reflink(origen, destino):
+    """Clona los bloques de origen en destino (solo Linux); lanza OSError si no se puede"""
+    import fcntl
+    with open(origen, 'rb') as f_origen, open(destino, 'wb') as f_destino:
+        try:
+            fcntl.ioctl(f_destino.fileno(), FICLONE, f_origen.fileno())
+        except OSError:
+            f_destino.close()
+            os.remove(destino)
+            raise
+
+
+def clave_descarga(item):
+    """Clave de un elemento del plan: ID de Drive + formato de exportación"""
+    return f"{item['id']}:{item['formato']}"
+
+
+def con_extension(item, ext):
+    """Copia del elemento del plan con la extensión ya decidida en nombre y ruta"""
+    if not ext or item['ruta'].endswith(ext):
+        return item
+    return dict(item, nombre=item['nombre'] + ext, ruta=item['ruta'] + ext)
+
+
+class AlmacenContenido:
+    """
+    Objetos por hash + claves por (ID, formato).
+    `vigencia` (segundos): pasado ese tiempo una clave se vuelve a descargar
+    (None = no caduca). El contenido repetido se sigue deduplicando.
+    """
+
+    def __init__(self, raiz=ALMACEN_POR_DEFECTO, vigencia=None):
+        self.raiz = raiz
+        self.vigencia = vigencia
+        for sub in ('objetos', 'claves', 'tmp'):
+            os.makedirs(os.path.join(raiz, sub), exist_ok=True)
+        # clave -> elementos del plan que esperan esa descarga
+        self.copias = {}
+        self._temporales = itertools.count()
+        # Ahorro de esta ejecución
+        self.ahorro = {'peticiones': 0, 'bytes_red': 0, 'bytes_disco': 0, 'enlaces': 0, 'copias': 0}
+
+    # ---------------- Rutas ----------------
+
+    def _ruta_clave(self, clave):
+        h = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        return os.path.join(self.raiz, 'claves', h[:2], h + '.json')
+
+    def ruta_objeto(self, sha256, ext=''):
+        return os.path.join(self.raiz, 'objetos', sha256[:2], sha256 + ext)
+
+    def temporal(self, clave):
+        """Ruta temporal dentro del almacén (mismo sistema de archivos que los objetos)"""
+        nombre = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        return os.path.join(self.raiz, 'tmp', f"{nombre}.{os.getpid()}.{next(self._temporales)}")
+
+    def parcial(self, clave):
+        """.part fijo por clave: una descarga cortada se continúa en la siguiente ejecución"""
+        nombre = hashlib.sha1(clave.encode('utf-8')).hexdigest()
+        return os.path.join(self.raiz, 'tmp', nombre + '.part')
+
+    # ---------------- Claves ----------------
+
+    def buscar(self, clave):
+        """{'clave', 'sha256', 'bytes', 'ext', 'fecha'} si la clave está vigente y su objeto existe"""
+        try:
+            with open(self._ruta_clave(clave), encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.vigencia is not None and time.time() - entrada['fecha'] > self.vigencia:
+            return None
+        if not os.path.exists(self.ruta_objeto(entrada['sha256'], entrada['ext'])):
+            return None
+        return entrada
+
+    def _guardar_clave(self, entrada):
+        ruta = self._ruta_clave(entrada['clave'])
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f)
+        os.replace(temporal, ruta)
+
+    # ---------------- Árbol de salida ----------------
+
+    def enlazar(self, objeto, destino):
+        """Crea destino como enlace duro al objeto (o reflink, o copia)"""
+        carpeta = os.path.dirname(destino)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        try:
+            if os.path.samefile(objeto, destino):
+                return
+        except OSError:
+            pass
+        # Cada objeto ya enlazado en otro sitio del árbol es una copia menos en disco
+        compartido = os.stat(objeto).st_nlink > 1
+        temporal = f"{destino}.{os.getpid()}.enlace"
+        try:
+            os.link(objeto, temporal)
+            self.ahorro['enlaces'] += 1
+        except OSError:
+            try:
+                _reflink(objeto, temporal)
+                self.ahorro['enlaces'] += 1
+                compartido = True
+            except (OSError, ImportError):
+                shutil.copyfile(objeto, temporal)
+                self.ahorro['copias'] += 1
+                compartido = False
+        os.replace(temporal, destino)
+        if compartido:
+            self.ahorro['bytes_disco'] += os.path.getsize(destino)
+
+    def servir(self, plan):
+        """
+        Materializa los elementos del plan que ya están en el almacén.
+        Devuelve (pendientes, servidos); los servidos llevan la ruta final y 'sha256'.
+        """
+        pendientes, servidos = [], []
+        for item in plan:
+            entrada = self.buscar(clave_descarga(item))
+            if not entrada:
+                pendientes.append(item)
+                continue
+            item = dict(con_extension(item, entrada['ext']), sha256=entrada['sha256'])
+            self.enlazar(self.ruta_objeto(entrada['sha256'], entrada['ext']), item['ruta'])
+            self.ahorro['peticiones'] += 1
+            self.ahorro['bytes_red'] += entrada['bytes']
+            servidos.append(item)
+        return pendientes, servidos
+
+    def agrupar(self, plan):
+        """
+        Una descarga por clave: devuelve elementos que se descargan a una ruta
+        temporal del almacén. El resto espera en self.copias hasta guardar().
+        """
+        descargas = []
+        for item in plan:
+            clave = clave_descarga(item)
+            if clave not in self.copias:
+                self.copias[clave] = []
+                descargas.append(dict(item, clave=clave, ruta=self.temporal(clave), parcial=self.parcial(clave)))
+            self.copias[clave].append(item)
+        return descargas
+
+    def descartar(self, descarga):
+        """Olvida una descarga fallida (y su temporal)"""
+        self.copias.pop(descarga['clave'], None)
+        if os.path.exists(descarga['ruta']):
+            os.remove(descarga['ruta'])
+
+    def guardar(self, descarga, sha256=None, tipo=None, nombre_servidor=None):
+        """
+        Mueve la descarga temporal a su objeto, registra la clave y enlaza todos
+        los elementos del plan que la esperaban. Devuelve esos elementos con su
+        ruta final y 'sha256'.
+        """
+        ext = extension_descarga(descarga['formato'], tipo, nombre_servidor)
+        sha256 = sha256 or sha256_archivo(descarga['ruta'])
+        tam = os.path.getsize(descarga['ruta'])
+        objeto = self.ruta_objeto(sha256, ext)
+        if os.path.exists(objeto):
+            # Mismo contenido con otro ID (p. ej. copias de una plantilla)
+            os.remove(descarga['ruta'])
+        else:
+            os.makedirs(os.path.dirname(objeto), exist_ok=True)
+            os.replace(descarga['ruta'], objeto)
+        self._guardar_clave({'clave': descarga['clave'], 'sha256': sha256, 'bytes': tam, 'ext': ext,
+                             'fecha': time.time()})
+
+        items = self.copias.pop(descarga['clave'], [])
+        # Los repetidos de la misma ejecución tampoco piden red
+        self.ahorro['peticiones'] += max(0, len(items) - 1)
+        self.ahorro['bytes_red'] += tam * max(0, len(items) - 1)
+        listos = []
+        for item in items:
+            item = dict(con_extension(item, ext), sha256=sha256)
+            self.enlazar(objeto, item['ruta'])
+            listos.append(item)
+        return listos
+
+    # ---------------- Informe ----------------
+
+    def informe(self):
+        """Peticiones y bytes ahorrados en esta ejecución"""
+        a = self.ahorro
+        if not (a['enlaces'] or a['copias']):
+            return
+        print("\n🗃 ALMACÉN DE DESCARGAS:")
+        print("-" * 50)
+        print(f"  {a['peticiones']} descarga(s) evitadas, {a['bytes_red'] / 1e6:.1f} MB sin pedir a Google")
+        print(f"  {a['enlaces']} enlace(s), {a['copias']} copia(s); {a['bytes_disco'] / 1e6:.1f} MB de disco compartidos")
@@ -0,0 +1,244 @@
+"""
+Base de datos SQLite con los resultados de todas las ejecuciones: clases,
+tareas, alumnos, entregas, archivos y descargas. A diferencia de los
+entregas_*.json (uno por tarea, que se pisa en cada ejecución) aquí se
+acumula todo, con índices por alumno, tarea e ID de archivo, así que
+preguntas como "qué alumnos no han entregado nada este trimestre" se
+responden con una consulta en milisegundos.
+
+La escriben extraer_todas_entregas (entregas y archivos) y
+descargar_como_pdf (descargas), en lotes dentro de una transacción. Modo
+WAL y timeout de espera: los procesos del modo lote pueden escribir a la vez.
+"""
+
+import csv
+import time
+import sqlite3
+from datetime import datetime
+
+BASE_POR_DEFECTO = "classroom.sqlite3"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clases (
+    id TEXT PRIMARY KEY,
+    nombre TEXT,
+    actualizado TEXT
+);
+CREATE TABLE IF NOT EXISTS tareas (
+    id TEXT PRIMARY KEY,
+    clase_id TEXT NOT NULL,
+    nombre TEXT,
+    actualizado TEXT
+);
+CREATE TABLE IF NOT EXISTS estudiantes (
+    id TEXT PRIMARY KEY,
+    nombre TEXT
+);
+CREATE TABLE IF NOT EXISTS entregas (
+    tarea_id TEXT NOT NULL,
+    estudiante_id TEXT NOT NULL,
+    clase_id TEXT NOT NULL,
+    archivos INTEGER NOT NULL,
+    extraido TEXT,
+    PRIMARY KEY (tarea_id, estudiante_id)
+);
+CREATE TABLE IF NOT EXISTS archivos (
+    tarea_id TEXT NOT NULL,
+    estudiante_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    url TEXT,
+    PRIMARY KEY (tarea_id, estudiante_id, file_id)
+);
+CREATE TABLE IF NOT EXISTS descargas (
+    tarea_id TEXT NOT NULL,
+    estudiante_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    ruta TEXT,
+    bytes INTEGER,
+    sha256 TEXT,
+    fecha TEXT,
+    PRIMARY KEY (tarea_id, estudiante_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS ix_tareas_clase ON tareas (clase_id);
+CREATE INDEX IF NOT EXISTS ix_entregas_estudiante ON entregas (estudiante_id);
+CREATE INDEX IF NOT EXISTS ix_entregas_clase ON entregas (clase_id);
+CREATE INDEX IF NOT EXISTS ix_entregas_sin_archivos ON entregas (estudiante_id, clase_id) WHERE archivos = 0;
+CREATE INDEX IF NOT EXISTS ix_archivos_file ON archivos (file_id);
+CREATE INDEX IF NOT EXISTS ix_archivos_estudiante ON archivos (estudiante_id);
+CREATE INDEX IF NOT EXISTS ix_descargas_file ON descargas (file_id);
+CREATE INDEX IF NOT EXISTS ix_descargas_sha ON descargas (sha256);
+"""
+
+# Consultas con nombre para `bot.py consulta` (parámetros :clase, :alumno, :desde)
+CONSULTAS = {
+    'faltan': """
+        SELECT s.nombre AS alumno, s.id AS estudiante_id, COUNT(*) AS sin_entregar,
+               GROUP_CONCAT(t.nombre, ' | ') AS tareas
+        FROM entregas e
+        JOIN estudiantes s ON s.id = e.estudiante_id
+        JOIN tareas t ON t.id = e.tarea_id
+        WHERE e.archivos = 0
+          AND (:clase IS NULL OR e.clase_id = :clase)
+          AND (:desde IS NULL OR e.extraido >= :desde)
+        GROUP BY s.id
+        ORDER BY sin_entregar DESC, s.nombre
+    """,
+    'alumno': """
+        SELECT c.nombre AS clase, t.nombre AS tarea, e.archivos, e.extraido,
+               (SELECT COUNT(*) FROM descargas d
+                WHERE d.tarea_id = e.tarea_id AND d.estudiante_id = e.estudiante_id) AS descargados
+        FROM entregas e
+        JOIN estudiantes s ON s.id = e.estudiante_id
+        JOIN tareas t ON t.id = e.tarea_id
+        LEFT JOIN clases c ON c.id = e.clase_id
+        WHERE e.estudiante_id IN (SELECT id FROM estudiantes
+                                  WHERE id = :alumno OR nombre LIKE '%' || :alumno || '%')
+          AND (:clase IS NULL OR e.clase_id = :clase)
+        ORDER BY c.nombre, t.nombre
+    """,
+    'tareas': """
+        SELECT c.nombre AS clase, t.nombre AS tarea, t.id AS tarea_id, COUNT(e.estudiante_id) AS alumnos,
+               SUM(e.archivos > 0) AS con_archivos, SUM(e.archivos) AS archivos, t.actualizado
+        FROM tareas t
+        LEFT JOIN clases c ON c.id = t.clase_id
+        LEFT JOIN entregas e ON e.tarea_id = t.id
+        WHERE (:clase IS NULL OR t.clase_id = :clase)
+        GROUP BY t.id
+        ORDER BY c.nombre, t.nombre
+    """,
+    'archivo': """
+        SELECT a.file_id, s.nombre AS alumno, t.nombre AS tarea, a.url, d.ruta, d.bytes, d.sha256
+        FROM archivos a
+        JOIN estudiantes s ON s.id = a.estudiante_id
+        JOIN tareas t ON t.id = a.tarea_id
+        LEFT JOIN descargas d USING (tarea_id, estudiante_id, file_id)
+        WHERE a.file_id = :archivo
+    """,
+}
+
+
+def ahora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class BaseEntregas:
+    """
+    Conexión a la base y escritura por lotes: las entregas se acumulan y se
+    insertan juntas en una transacción cada `lote` filas (y al cerrar).
+    """
+
+    def __init__(self, ruta=BASE_POR_DEFECTO, lote=200, solo_lectura=False):
+        self.ruta = ruta
+        self.lote = lote
+        if solo_lectura:
+            # Para consultas a mano: un UPDATE/DELETE por error no toca la base
+            self.conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, timeout=30)
+        else:
+            self.conexion = sqlite3.connect(ruta, timeout=30)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("PRAGMA synchronous=NORMAL")
+            self.conexion.executescript(ESQUEMA)
+        # (clase_id, tarea_id, entrega) pendientes de insertar
+        self._pendientes = []
+
+    # ---------------- Escritura ----------------
+
+    def registrar_tarea(self, clase_id, tarea_id, nombre_tarea=None, nombre_clase=None):
+        """Crea o actualiza la clase y la tarea (sin borrar nombres ya conocidos)"""
+        fecha = ahora()
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT INTO clases (id, nombre, actualizado) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET nombre = COALESCE(excluded.nombre, nombre), "
+                "actualizado = excluded.actualizado",
+                (clase_id, nombre_clase or None, fecha))
+            self.conexion.execute(
+                "INSERT INTO tareas (id, clase_id, nombre, actualizado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET nombre = COALESCE(excluded.nombre, nombre), "
+                "actualizado = excluded.actualizado",
+                (tarea_id, clase_id, nombre_tarea or None, fecha))
+
+    def anotar_entrega(self, clase_id, tarea_id, entrega):
+        """Encola una entrega; se escribe al llegar a `lote` o con volcar()"""
+        self._pendientes.append((clase_id, tarea_id, entrega))
+        if len(self._pendientes) >= self.lote:
+            self.volcar()
+
+    def volcar(self):
+        """Inserta las entregas pendientes en una sola transacción"""
+        if not self._pendientes:
+            return
+        pendientes, self._pendientes = self._pendientes, []
+        fecha = ahora()
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT INTO estudiantes (id, nombre) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET nombre = excluded.nombre",
+                [(e['estudiante_id'], e['nombre_alumno']) for _, _, e in pendientes])
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO entregas (tarea_id, estudiante_id, clase_id, archivos, extraido) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(t, e['estudiante_id'], c, len(e['archivos']), fecha) for c, t, e in pendientes])
+            # Los archivos del alumno en la tarea se sustituyen por los de ahora
+            self.conexion.executemany(
+                "DELETE FROM archivos WHERE tarea_id = ? AND estudiante_id = ?",
+                [(t, e['estudiante_id']) for _, t, e in pendientes])
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO archivos (tarea_id, estudiante_id, file_id, url) VALUES (?, ?, ?, ?)",
+                [(t, e['estudiante_id'], a['id'], a['url']) for _, t, e in pendientes for a in e['archivos']])
+
+    def anotar_descargas(self, tarea_id, descargas):
+        """Registra descargas terminadas: [(estudiante_id, file_id, ruta, bytes, sha256)]"""
+        fecha = ahora()
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO descargas (tarea_id, estudiante_id, file_id, ruta, bytes, sha256, fecha) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(tarea_id,) + tuple(d) + (fecha,) for d in descargas])
+
+    def importar(self, tareas):
+        """Carga entregas_*.json ya guardados (ver offline.cargar_tareas); devuelve cuántas entregas"""
+        total = 0
+        for t in tareas:
+            if not t.get('tarea_id') or not t.get('clase_id'):
+                print(f"⚠ Sin clase_id/tarea_id, se omite: {t.get('_ruta')}")
+                continue
+            self.registrar_tarea(t['clase_id'], t['tarea_id'], t.get('tarea'), t.get('clase'))
+            for entrega in t.get('entregas', []):
+                self.anotar_entrega(t['clase_id'], t['tarea_id'], entrega)
+                total += 1
+        self.volcar()
+        return total
+
+    def cerrar(self):
+        self.volcar()
+        self.conexion.close()
+
+    # ---------------- Consulta ----------------
+
+    def consultar(self, sql, parametros=None):
+        """(columnas, filas, segundos) de una consulta"""
+        inicio = time.perf_counter()
+        cursor = self.conexion.execute(sql, parametros or {})
+        filas = cursor.fetchall()
+        columnas = [d[0] for d in cursor.description or []]
+        return columnas, filas, time.perf_counter() - inicio
+
+
+def mostrar_tabla(columnas, filas, ancho_max=40):
+    """Tabla de texto con columnas ajustadas al contenido"""
+    textos = [[('' if v is None else str(v))[:ancho_max] for v in fila] for fila in filas]
+    anchos = [max([len(c)] + [len(f[i]) for f in textos]) for i, c in enumerate(columnas)]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    print("-" * (sum(anchos) + 2 * max(0, len(anchos) - 1)))
+    for fila in textos:
+        print("  ".join(v.ljust(a) for v, a in zip(fila, anchos)))
+
+
+def exportar_csv(columnas, filas, ruta):
+    """Guarda el resultado de una consulta en CSV (mismo formato que offline.exportar_csv)"""
+    with open(ruta, 'w', encoding='utf-8-sig', newline='') as f:
+        escritor = csv.writer(f, delimiter=';')
+        escritor.writerow(columnas)
+        escritor.writerows(filas)
+    print(f"✓ CSV guardado en {ruta}")
@@ -0,0 +1,85 @@
+"""
+Benchmark de arranque de los comandos sin navegador.
+Mide, en procesos nuevos, el tiempo de `import bot` y de cada comando offline
+(resumen, csv, faltan, plan) sobre un archivo sintético grande de
+entregas_*.json, y comprueba que Playwright no se llega a importar.
+
+Uso:
+    python benchmarks/bench_arranque.py [n_tareas] [alumnos_por_tarea]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIMITE = 1.0  # segundos: los comandos offline deben quedarse por debajo
+REPETICIONES = 5
+
+
+def crear_archivo(carpeta, n_tareas, n_alumnos, semilla=1):
+    """Genera n_tareas JSON con el formato del resumen (bot.cabecera_resumen + salida_jsonl.escribir_resumen)"""
+    rnd = random.Random(semilla)
+    alumnos = [(f"{i:020d}", f"Alumno {i}") for i in range(n_alumnos)]
+    for t in range(n_tareas):
+        entregas = []
+        for est_id, nombre in alumnos:
+            archivos = [{
+                'id': f"1{t:05d}{est_id[-8:]}{k}xyzABCDEFGH",
+                'url': f"https://docs.google.com/document/d/1{t:05d}{est_id[-8:]}{k}xyzABCDEFGH/edit",
+                'url_pdf': ''
+            } for k in range(rnd.choice([0, 0, 1, 1, 2]))]
+            entregas.append({'estudiante_id': est_id, 'nombre_alumno': nombre, 'archivos': archivos})
+        datos = {'clase': f"Clase {t % 5}", 'clase_id': f"C{t % 5}", 'tarea': f"Tarea {t}",
+                 'tarea_id': f"T{t}", 'entregas': entregas}
+        carpeta_tarea = os.path.join(carpeta, f"Clase {t % 5}", f"Tarea {t}")
+        os.makedirs(carpeta_tarea, exist_ok=True)
+        with open(os.path.join(carpeta_tarea, f"entregas_Tarea {t}.json"), 'w', encoding='utf-8') as f:
+            json.dump(datos, f)
+
+
+def medir(argumentos):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable] + argumentos, cwd=RAIZ, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main(n_tareas=60, n_alumnos=300):
+    salida = subprocess.run(
+        [sys.executable, '-c', "import sys, bot; print('playwright' in sys.modules)"],
+        cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    print(f"Playwright importado al hacer `import bot`: {salida}")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        crear_archivo(carpeta, n_tareas, n_alumnos)
+        print(f"Archivo sintético: {n_tareas} tareas x {n_alumnos} alumnos\n")
+        casos = [
+            ("python (vacío)", ['-c', 'pass']),
+            ("import bot", ['-c', 'import bot']),
+            ("resumen", ['bot.py', 'resumen', carpeta]),
+            ("csv cuaderno", ['bot.py', 'csv', carpeta, '--formato', 'cuaderno', '-o', os.path.join(carpeta, 'c.csv')]),
+            ("faltan", ['bot.py', 'faltan', carpeta]),
+            ("plan", ['bot.py', 'plan', carpeta, '-o', os.path.join(carpeta, 'plan.json')]),
+        ]
+        print(f"{'comando':<18} {'mediana':>9}")
+        print("-" * 30)
+        lentos = 0
+        for nombre, argumentos in casos:
+            t = medir(argumentos)
+            marca = "" if t < LIMITE else "  ⚠ supera 1s"
+            lentos += t >= LIMITE
+            print(f"{nombre:<18} {t * 1000:>7.0f}ms{marca}")
+    return 1 if lentos or salida != 'False' else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:3]]))
@@ -0,0 +1,225 @@
+"""
+Benchmark de punta a punta contra un Classroom sintético local
+(servidor_mock.ClassroomSintetico), sin tocar Google.
+
+Para cada tamaño de clase (30, 300 y 3000 alumnos por defecto) mide:
+  - navegador: el bot real (Playwright) con base_url y hosts de exportación
+    apuntando al servidor: listar clases y tareas, extraer las entregas de
+    todos los alumnos y descargarlas. Solo si Playwright está instalado.
+  - http:      el mismo recorrido sin navegador (lista de alumnos, adjuntos
+    de cada alumno por XHR y descarga del plan con MotorDescargas).
+  - red:       el modo captura de red sin navegador: graba la página de
+    entregas y su batchexecute, los sirve desde un ServidorMock de
+    reproducción y comprueba que entregas_desde_capturas da, alumno por
+    alumno, los mismos IDs de archivo que la vista de calificación.
+En ambos casos comprueba que lo extraído coincide con lo generado e informa
+alumnos/min, archivos/min y el pico de memoria de Python (tracemalloc; el
+servidor corre en el mismo proceso y entra en la cuenta). En modo navegador
+también muestra cuántos cambios de alumno dentro de la app acabaron en
+recarga (--fallo-spa hace que el servidor ignore esa fracción de cambios;
+--sin-spa vuelve a goto + reload por alumno).
+
+Uso:
+    python benchmarks/bench_e2e.py [--tamanos 30,300,3000] [--concurrencia 4]
+        [--descargas 4] [--latencia 0.05] [--tam-archivo 51200] [--sin-navegador]
+        [--fallo-spa 0.1] [--sin-spa] [--captura-red]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+import importlib.util
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import ClassroomEntregasBot
+from descargas import MotorDescargas, plan_descargas
+from extractor_html import extraer_estudiantes
+from captura_red import entregas_desde_capturas, RE_ID_ARCHIVO
+from servidor_mock import ServidorMock, ClassroomSintetico
+
+
+def crear_bot(servidor, carpeta, navegacion_spa=True, captura_red=False):
+    """Bot apuntando al servidor local (sin manifiesto ni sesión guardada)"""
+    return ClassroomEntregasBot(
+        '', '', user_data_dir=os.path.join(carpeta, 'perfil'),
+        base_url=servidor.base_url,
+        hosts_exportacion={'docs': servidor.base_url, 'drive': servidor.base_url},
+        navegacion_spa=navegacion_spa,
+        captura_red=captura_red,
+    )
+
+
+def comprobar(sintetico, clase_id, tarea_id, entregas):
+    """Lista de diferencias entre lo extraído y lo generado (vacía si todo cuadra)"""
+    extraidas = {e['estudiante_id']: [a['url'] for a in e['archivos']] for e in entregas}
+    errores = []
+    for esperada in sintetico.entregas_esperadas(clase_id, tarea_id):
+        if extraidas.get(esperada['estudiante_id']) != esperada['urls']:
+            errores.append(esperada['estudiante_id'])
+    return errores
+
+
+def fase_http(sintetico, servidor, carpeta, descargas):
+    bot = crear_bot(servidor, carpeta)
+    clase_id = sintetico.clases()[0]['id']
+    tarea_id = sintetico.tareas(clase_id)[0]['id']
+
+    inicio = time.perf_counter()
+    url = f"{servidor.base_url}/c/{clase_id}/a/{tarea_id}/submissions/by-status/and-sort-name/all"
+    estudiantes = extraer_estudiantes(urllib.request.urlopen(url).read().decode('utf-8'))
+    entregas = []
+    for est in estudiantes:
+        url = f"{servidor.base_url}/_mock/entrega/{clase_id}/{tarea_id}/{est['id']}"
+        urls = json.loads(urllib.request.urlopen(url).read())
+        entregas.append({'estudiante_id': est['id'], 'nombre_alumno': est['nombre'],
+                         'archivos': bot._archivos_desde_urls(urls)})
+    t_extraccion = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    plan = plan_descargas(entregas, os.path.join(carpeta, 'pdf_http'), bot.hosts_exportacion)
+    resultados = MotorDescargas([], concurrencia=descargas).descargar(plan)
+    t_descarga = time.perf_counter() - inicio
+
+    return {'alumnos': len(entregas), 'archivos': sum(1 for r in resultados if r['ok']),
+            't_extraccion': t_extraccion, 't_descarga': t_descarga,
+            'errores': comprobar(sintetico, clase_id, tarea_id, entregas)}
+
+
+def _ids(urls):
+    return [m.group(1) for m in map(RE_ID_ARCHIVO.search, urls) if m]
+
+
+def fase_red(sintetico, servidor, carpeta, descargas):
+    bot = crear_bot(servidor, carpeta)
+    clase_id = sintetico.clases()[0]['id']
+    tarea_id = sintetico.tareas(clase_id)[0]['id']
+
+    # Grabación como la de CapturaRespuestas: el HTML (AF_initDataCallback) y el XHR batchexecute
+    grabacion = []
+    for ruta, datos in ((f"/c/{clase_id}/a/{tarea_id}/submissions/by-status/and-sort-name/all", None),
+                        (sintetico.ruta_batchexecute(clase_id, tarea_id), b'')):
+        respuesta = urllib.request.urlopen(servidor.base_url + ruta, data=datos)
+        grabacion.append({'url': servidor.base_url + ruta, 'status': respuesta.status,
+                          'content_type': respuesta.headers.get('Content-Type'),
+                          'body': respuesta.read().decode('utf-8')})
+    estudiantes = extraer_estudiantes(grabacion[0]['body'])
+
+    inicio = time.perf_counter()
+    with ServidorMock(grabacion) as reproduccion:
+        capturas = [dict(c, body=urllib.request.urlopen(reproduccion.base_url + ServidorMock._clave(c['url']),
+                                                        data=b'' if 'batchexecute' in c['url'] else None)
+                         .read().decode('utf-8')) for c in grabacion]
+    por_red = entregas_desde_capturas(capturas, estudiantes)
+    entregas = [{'estudiante_id': est['id'], 'nombre_alumno': est['nombre'],
+                 'archivos': bot._archivos_desde_urls(por_red.get(est['id'], []))} for est in estudiantes]
+    t_extraccion = time.perf_counter() - inicio
+
+    # Lo mismo que pinta la vista de calificación de cada alumno (camino del DOM)
+    errores = []
+    for est in estudiantes:
+        url = f"{servidor.base_url}/_mock/entrega/{clase_id}/{tarea_id}/{est['id']}"
+        if est['id'] not in por_red or _ids(por_red[est['id']]) != _ids(json.loads(urllib.request.urlopen(url).read())):
+            errores.append(est['id'])
+
+    inicio = time.perf_counter()
+    plan = plan_descargas(entregas, os.path.join(carpeta, 'pdf_red'), bot.hosts_exportacion)
+    resultados = MotorDescargas([], concurrencia=descargas).descargar(plan)
+    t_descarga = time.perf_counter() - inicio
+
+    return {'alumnos': len(entregas), 'archivos': sum(1 for r in resultados if r['ok']),
+            't_extraccion': t_extraccion, 't_descarga': t_descarga,
+            'errores': errores + comprobar(sintetico, clase_id, tarea_id, entregas)}
+
+
+def fase_navegador(sintetico, servidor, carpeta, concurrencia, descargas, navegacion_spa=True, captura_red=False):
+    bot = crear_bot(servidor, carpeta, navegacion_spa, captura_red)
+    try:
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+            bot.iniciar_navegador(headless=True)
+            bot.ir_a_classroom()
+            clase_id = bot.listar_clases()[0]['id']
+            bot.ir_a_trabajo_de_clase(clase_id)
+            tarea_id = bot.listar_tareas()[0]['id']
+
+            inicio = time.perf_counter()
+            entregas = bot.extraer_todas_entregas(clase_id, tarea_id, concurrencia=concurrencia)
+            t_extraccion = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            archivos = bot.descargar_como_pdf(entregas, os.path.join(carpeta, 'pdf_navegador'),
+                                              concurrencia=descargas)
+            t_descarga = time.perf_counter() - inicio
+    finally:
+        bot.cerrar()
+
+    spa = bot.estadisticas_spa
+    return {'alumnos': len(entregas), 'archivos': archivos,
+            't_extraccion': t_extraccion, 't_descarga': t_descarga,
+            'errores': comprobar(sintetico, clase_id, tarea_id, entregas),
+            'recargas': f"recargas {spa['recarga']}/{spa['spa'] + spa['recarga']}, cargas {spa['carga']}"}
+
+
+def por_minuto(n, segundos):
+    return n * 60 / segundos if segundos else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta con un Classroom sintético")
+    parser.add_argument('--tamanos', default='30,300,3000', help="alumnos por clase, separados por comas")
+    parser.add_argument('--concurrencia', type=int, default=4, help="pestañas para extraer alumnos")
+    parser.add_argument('--descargas', type=int, default=4, help="descargas HTTP simultáneas")
+    parser.add_argument('--latencia', type=float, default=0.05, help="latencia de cada exportación (s)")
+    parser.add_argument('--tam-archivo', type=int, default=50 * 1024, help="bytes de cada PDF falso")
+    parser.add_argument('--sin-navegador', action='store_true', help="solo la fase http")
+    parser.add_argument('--fallo-spa', type=float, default=0.0,
+                        help="fracción de cambios de alumno que el servidor ignora")
+    parser.add_argument('--sin-spa', action='store_true', help="goto + reload por alumno")
+    parser.add_argument('--captura-red', action='store_true',
+                        help="fase navegador con el modo captura de red (solo se visitan los no resueltos)")
+    args = parser.parse_args()
+
+    modos = ['http', 'red']
+    if args.sin_navegador:
+        pass
+    elif importlib.util.find_spec('playwright') is None:
+        print("⚠ Playwright no está instalado: solo se mide la fase http")
+    else:
+        modos.insert(0, 'navegador')
+
+    print(f"{'alumnos':>8} {'modo':<10} {'archivos':>9} {'alumnos/min':>12} {'archivos/min':>13} "
+          f"{'pico MB':>8}  comprobación")
+    print("-" * 82)
+    tracemalloc.start()
+    fallos = 0
+    for n in [int(t) for t in args.tamanos.split(',')]:
+        sintetico = ClassroomSintetico(n_alumnos=n, tam_archivo=args.tam_archivo,
+                                       latencia_exportacion=args.latencia, fallo_spa=args.fallo_spa)
+        with sintetico.instalar(ServidorMock()) as servidor:
+            for modo in modos:
+                with tempfile.TemporaryDirectory() as carpeta:
+                    tracemalloc.reset_peak()
+                    if modo == 'navegador':
+                        r = fase_navegador(sintetico, servidor, carpeta, args.concurrencia, args.descargas,
+                                           navegacion_spa=not args.sin_spa, captura_red=args.captura_red)
+                    elif modo == 'red':
+                        r = fase_red(sintetico, servidor, carpeta, args.descargas)
+                    else:
+                        r = fase_http(sintetico, servidor, carpeta, args.descargas)
+                    pico = tracemalloc.get_traced_memory()[1] / 1e6
+                fallos += bool(r['errores'])
+                estado = "✓" if not r['errores'] else f"✗ {len(r['errores'])} alumno(s) distintos"
+                print(f"{n:>8} {modo:<10} {r['archivos']:>9} {por_minuto(r['alumnos'], r['t_extraccion']):>12.0f} "
+                      f"{por_minuto(r['archivos'], r['t_descarga']):>13.0f} {pico:>8.1f}  {estado}"
+                      + (f"  ({r['recargas']})" if 'recargas' in r else ''))
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Micro-benchmark: extractor de una sola pasada (extractor_html) frente a las
+expresiones regulares con re.DOTALL que se usaban antes sobre page.content().
+
+Genera páginas sintéticas grandes con la misma estructura que Classroom
+(enlaces /c/ID con span.YVvGBb, enlaces /a/ID y filas /student/ID) y mide
+ambos métodos comprobando que devuelven lo mismo.
+
+Uso:
+    python benchmarks/bench_extractor.py [n_alumnos ...]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor_html import analizar, extraer_clases, extraer_ids_tareas, extraer_estudiantes
+
+
+# ---------------- Implementación anterior (referencia) ----------------
+
+def regex_clases(html):
+    patron = r'href="(/c/([A-Za-z0-9]+))"[^>]*>.*?YVvGBb[^>]*>([^<]+)<'
+    clases, vistas = [], set()
+    for href, clase_id, nombre in re.findall(patron, html, re.DOTALL):
+        nombre = nombre.strip()
+        if clase_id not in vistas and nombre not in ['Inicio', 'Calendar', 'Para revisar', 'Ajustes', 'Clases archivadas']:
+            clases.append(clase_id)
+            vistas.add(clase_id)
+    return clases
+
+
+def regex_tareas(html):
+    ids = list(set(re.findall(r'href="[^"]*?/a/(ACg8oc[A-Za-z0-9_-]+)[^"]*"', html)))
+    ids.extend(list(set(re.findall(r'href="[^"]*?/a/(\d{15,})[^"]*"', html))))
+    return ids
+
+
+def regex_estudiantes(html):
+    """Los tres métodos de obtener_lista_estudiantes, cada uno con su pasada"""
+    patron = r'/student/([A-Za-z0-9]{16,})"[^>]*>.*?<span[^>]*class="YVvGBb"[^>]*>([^<]+)</span>'
+    estudiantes, vistos = [], set()
+    for est_id, nombre in re.findall(patron, html, re.DOTALL):
+        nombre = nombre.strip()
+        if est_id not in vistos and nombre:
+            estudiantes.append((est_id, nombre))
+            vistos.add(est_id)
+    if not estudiantes:
+        patron2 = r'data-student-id="(\d+)".*?<span[^>]*class="YVvGBb"[^>]*>([^<]+)</span>'
+        for est_id, nombre in re.findall(patron2, html, re.DOTALL):
+            nombre = nombre.strip()
+            if est_id not in vistos and nombre:
+                estudiantes.append((est_id, nombre))
+                vistos.add(est_id)
+    if not estudiantes:
+        for est_id in set(re.findall(r'/student/([A-Za-z0-9]{16,})', html)):
+            estudiantes.append((est_id, f'Estudiante_{est_id[:8]}'))
+    return estudiantes
+
+
+# ---------------- Páginas sintéticas ----------------
+
+def _id(n, rnd):
+    return ''.join(rnd.choice(string.ascii_letters + string.digits) for _ in range(n))
+
+
+def pagina_sintetica(n_alumnos, n_clases=40, n_tareas=80, semilla=1, con_nombres=True):
+    """
+    HTML con la estructura de Classroom y mucho relleno entre elementos.
+    Con con_nombres=False las filas de alumnos no llevan span.YVvGBb (el caso
+    en que las regex antiguas recorren el resto del documento por cada enlace).
+    """
+    clase_nombre = 'YVvGBb' if con_nombres else 'Xk9mJb'
+    rnd = random.Random(semilla)
+    relleno = '<div class="x{0}"><div><svg viewBox="0 0 24 24"><path d="M0 0h24v24H0z"/></svg></div></div>\n'
+    partes = ['<html><head><script>var AF_initDataCallback = {"data": "' + 'x' * 20000 + '"};</script></head><body>']
+    for i in range(n_clases):
+        partes.append(f'<a href="/c/{_id(16, rnd)}" class="onkcGd" jsaction="click">')
+        partes.append(relleno.format(i) * 3)
+        partes.append(f'<div class="YVvGBb z3vRcc-ZoZQ1">Clase {i}</div></a>\n')
+    for i in range(n_tareas):
+        tarea = 'ACg8oc' + _id(30, rnd) if i % 2 else str(rnd.randrange(10**15, 10**16))
+        partes.append(f'<li data-item-id="{i}"><a href="/c/X/a/{tarea}/details">Tarea {i}</a></li>\n')
+    for i in range(n_alumnos):
+        partes.append(f'<tr><td><a href="/c/X/a/Y/submissions/student/{_id(20, rnd)}" tabindex="0">')
+        partes.append(relleno.format(i) * 5)
+        partes.append(f'<span class="{clase_nombre}">Alumno {i}</span></a></td><td>Entregado</td></tr>\n')
+    partes.append('</body></html>')
+    return ''.join(partes)
+
+
+def medir(funcion, html, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion(html)
+    return (time.perf_counter() - inicio) / repeticiones, resultado
+
+
+def main(tamanos):
+    print(f"{'alumnos':>8} {'nombres':>8} {'HTML':>9} {'regex':>10} {'1 pasada':>10} {'x':>7}")
+    print("-" * 58)
+    for n, con_nombres in [(n, c) for c in (True, False) for n in tamanos]:
+        html = pagina_sintetica(n, con_nombres=con_nombres)
+        repeticiones = max(1, 2000 // n)
+
+        def antiguo(h):
+            return regex_clases(h), regex_tareas(h), regex_estudiantes(h)
+
+        def nuevo(h):
+            ext = analizar(h)
+            return (extraer_clases(h, extractor=ext), extraer_ids_tareas(h, extractor=ext),
+                    extraer_estudiantes(h, extractor=ext))
+
+        t_antiguo, (c1, t1, e1) = medir(antiguo, html, repeticiones)
+        t_nuevo, (c2, t2, e2) = medir(nuevo, html, repeticiones)
+
+        # Los dos métodos deben encontrar lo mismo
+        assert c1 == [c['id'] for c in c2], "clases distintas"
+        assert set(t1) == set(t2), "tareas distintas"
+        assert sorted(e1) == sorted((e['id'], e['nombre']) for e in e2), "estudiantes distintos"
+
+        print(f"{n:>8} {'sí' if con_nombres else 'no':>8} {len(html) / 1e6:>7.1f}MB "
+              f"{t_antiguo * 1000:>8.1f}ms {t_nuevo * 1000:>8.1f}ms {t_antiguo / t_nuevo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [30, 300, 3000])
@@ -4,16 +4,136 @@ Navega a las tareas y extrae los archivos adjuntos entregados por los alumnos
 INCLUYE: Nombre del alumno + URLs de archivos + Descarga en PDF
 """
 
-from playwright.sync_api import sync_playwright
 import re
 import time
 import os
+import sys
 import json
 import shutil
 import tempfile
+import contextlib
+import urllib.parse
+
+from descargas import MotorDescargas, plan_descargas, extension_descarga, HOSTS_EXPORTACION
+from almacen import AlmacenContenido, clave_descarga, con_extension, ALMACEN_POR_DEFECTO
+from salida_zip import ArchivoZip, manifiesto_zip, MANIFIESTO_ZIP
+from cache_listados import CacheListados, edad_legible, CACHE_POR_DEFECTO
+from base_datos import BaseEntregas, BASE_POR_DEFECTO
+from indice_texto import INDICE_POR_DEFECTO
+from manifiesto import Manifiesto
+from extractor_html import extraer_clases, extraer_ids_tareas, extraer_estudiantes
+from contador_ipc import ContadorIPC
+from captura_red import CapturaRespuestas, entregas_desde_capturas
+from politica_recursos import PoliticaRecursos
+from trazas import Trazador
+from ciclo_paginas import CicloPaginas, pagina_caida
+from ritmo import ControlRitmo, REINTENTABLES, REINTENTOS_FRENADO, motivo_frenado
+from sesion import tiene_sesion, guardar_sesion, cargar_sesion, restaurar_sesion
+from salida_jsonl import EscritorEntregas, ruta_jsonl, escribir_resumen
+
+# Condición de "página lista": basta con que se cumpla cualquiera de ellas
+JS_PAGINA_LISTA = """
+({selector, urls, distinta}) => {
+    if (selector && document.querySelector(selector)) return true;
+    if (urls.some(u => location.href.includes(u))) return true;
+    if (distinta && location.href !== distinta) return true;
+    return false;
+}
+"""
+
+# Selectores que indican que cada vista ya tiene contenido
+SELECTOR_TAREAS = '[data-item-id], [data-coursework-id]'
+SELECTOR_ADJUNTOS = 'div.clmEye[data-url]'
+
+# Se inyecta en cada pestaña antes que los scripts de la página
+JS_OCULTAR_WEBDRIVER = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+"""
+
+# Extracción del DOM en una sola llamada (page.evaluate) en lugar de
+# pedir cada atributo/texto de cada elemento por separado
+JS_TAREAS = r"""
+(selector) => Array.from(document.querySelectorAll(selector)).map(e => {
+    const titulo = e.querySelector('.asQXV, .YVvGBb, [role="heading"]');
+    let nombre = titulo ? titulo.innerText.trim() : '';
+    if (!nombre) nombre = e.innerText.split('\n')[0].trim().slice(0, 60);
+    return {id: e.getAttribute('data-item-id') || e.getAttribute('data-coursework-id'), nombre};
+})
+"""
+
+JS_ENLACES_CLASES = r"""
+() => Array.from(document.querySelectorAll('a[href*="/c/"]')).map(a => ({
+    href: a.getAttribute('href') || '',
+    texto: a.innerText
+}))
+"""
+
+JS_ADJUNTOS = r"""
+(selector) => ({
+    ojo: Array.from(document.querySelectorAll(selector)).map(e => e.getAttribute('data-url')).filter(Boolean),
+    docs: Array.from(document.querySelectorAll('[data-url^="https://docs.google.com/"]')).map(e => e.getAttribute('data-url'))
+})
+"""
+
+# Cambio de alumno dentro de la app (sin recargar): devuelve la huella de los
+# adjuntos que se veían antes y cambia el #u= del fragmento
+JS_CAMBIAR_ALUMNO = r"""
+({hash, selector}) => {
+    const antes = Array.from(document.querySelectorAll(selector)).map(e => e.getAttribute('data-url')).join('\n');
+    location.hash = hash;
+    return antes;
+}
+"""
+
+# ¿El panel ya es del alumno nuevo? Por su ID o nombre en el elemento
+# seleccionado de la lista, o porque los adjuntos han cambiado
+JS_ALUMNO_VISIBLE = r"""
+({id, nombre, antes, selector}) => {
+    if (!location.hash.includes('u=' + id)) return false;
+    for (const e of document.querySelectorAll('[aria-selected="true"], [aria-current="true"], [aria-current="page"]')) {
+        if (Object.values(e.dataset).includes(id)) return 'id';
+        if (nombre && (e.innerText || '').includes(nombre)) return 'nombre';
+    }
+    const urls = Array.from(document.querySelectorAll(selector)).map(e => e.getAttribute('data-url')).join('\n');
+    if (urls && urls !== antes) return 'adjuntos';
+    return false;
+}
+"""
+
+# Texto de la fila de cada alumno en la página de entregas (estado, nota...)
+JS_FILAS_ALUMNOS = r"""
+() => {
+    const filas = {};
+    for (const e of document.querySelectorAll('a[href*="/student/"], [data-student-id]')) {
+        const m = (e.getAttribute('href') || '').match(/\/student\/([A-Za-z0-9]{16,})/);
+        const id = e.getAttribute('data-student-id') || (m && m[1]);
+        if (!id || id in filas) continue;
+        const fila = e.closest('[role="row"], [role="listitem"], li, tr') || e;
+        filas[id] = (fila.innerText || '').replace(/\s+/g, ' ').trim();
+    }
+    return filas;
+}
+"""
+
+# Timeout (segundos) de cada condición de espera
+TIMEOUTS_ESPERA = {
+    'login': 10,
+    'login_email': 10,
+    'login_password': 15,
+    'classroom': 15,
+    'trabajo_de_clase': 15,
+    'listar_tareas': 5,
+    'entregas': 15,
+    'adjuntos': 5,
+    'cambio_alumno': 3,
+}
 
 class ClassroomEntregasBot:
-    def __init__(self, email, password, user_data_dir=None):
+    def __init__(self, email, password, user_data_dir=None, timeouts=None, manifiesto=None,
+                 dom_por_lotes=True, medir_ipc=False, captura_red=False, grabar_red=None,
+                 politica_recursos=None, ruta_sesion=None, base_url=None, hosts_exportacion=None,
+                 trazas=None, ritmo=None, almacen=None, navegacion_spa=True, cache=None,
+                 base_datos=None, ciclo=None):
         self.email = email
         self.password = password
         # Usar carpeta en TEMP para evitar problemas con OneDrive
@@ -23,10 +143,68 @@ class ClassroomEntregasBot:
             self.user_data_dir = user_data_dir
         self.browser = None
         self.page = None
-        self.base_url = "https://classroom.google.com"
+        # Se pueden cambiar para apuntar el bot a un servidor de pruebas (servidor_mock.py)
+        self.base_url = (base_url or "https://classroom.google.com").rstrip('/')
+        self.hosts_exportacion = dict(HOSTS_EXPORTACION, **(hosts_exportacion or {}))
+        # Timeouts por condición de espera (ver TIMEOUTS_ESPERA)
+        self.timeouts = dict(TIMEOUTS_ESPERA)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        # Estadísticas de esperas: nombre -> {veces, real, fijo, timeouts}
+        self.estadisticas_espera = {}
+        # Manifiesto para reanudar ejecuciones (ruta o Manifiesto; None = desactivado)
+        if isinstance(manifiesto, str):
+            manifiesto = Manifiesto(manifiesto)
+        self.manifiesto = manifiesto
+        # Leer el DOM con un page.evaluate por vista (False = elemento a elemento)
+        self.dom_por_lotes = dom_por_lotes
+        # Contador de llamadas al navegador (None = sin medir)
+        self.ipc = ContadorIPC() if medir_ipc else None
+        # Leer las entregas de las respuestas XHR de la página de entregas
+        self.captura_red = captura_red
+        # Ruta donde guardar lo capturado (para reproducirlo con servidor_mock.py)
+        self.grabar_red = grabar_red
+        # Bloqueo de imágenes, fuentes, analítica... (PoliticaRecursos o None)
+        self.politica_recursos = politica_recursos
+        # Instantánea de la sesión (cookies + localStorage) para no repetir login()
+        self.ruta_sesion = ruta_sesion or self.user_data_dir.rstrip(os.sep) + "_sesion.json"
+        # Cómo se consiguió la sesión: 'perfil', 'instantanea' o 'login'
+        self.tipo_arranque = None
+        # Tiempos de arranque (perf_counter)
+        self.t_arranque = None
+        self.t_primera_extraccion = None
+        # Tramos de tiempo por fase (ruta del JSON de trazas; None = desactivado)
+        self.ruta_trazas = trazas
+        self.trazas = Trazador() if trazas else None
+        # Ritmo de peticiones compartido por navegaciones y descargas
+        self.ritmo = ritmo or ControlRitmo()
+        # Almacén de descargas por contenido (ruta o AlmacenContenido; None = desactivado)
+        if isinstance(almacen, str):
+            almacen = AlmacenContenido(almacen)
+        self.almacen = almacen
+        # Cambiar de alumno dentro de la app (#u=) y recargar solo si el panel
+        # no cambia; False = goto + reload por alumno como antes
+        self.navegacion_spa = navegacion_spa
+        # Cómo se llegó a cada alumno: 'carga' completa, 'spa' verificada o 'recarga' de respaldo
+        self.estadisticas_spa = {'carga': 0, 'spa': 0, 'recarga': 0, 'por': {}}
+        # Caché de clases/tareas/alumnos (ruta o CacheListados; None = desactivada)
+        if isinstance(cache, str):
+            cache = CacheListados(cache)
+        self.cache = cache
+        # Base SQLite con entregas y descargas de todas las ejecuciones (ruta o BaseEntregas; None = sin base)
+        if isinstance(base_datos, str):
+            base_datos = BaseEntregas(base_datos)
+        self.base_datos = base_datos
+        # Reciclaje de pestañas por navegaciones/memoria y recuperación de caídas
+        self.ciclo = ciclo or CicloPaginas()
+        self.headless = False
     
     def iniciar_navegador(self, headless=False):
         """Inicia el navegador con perfil persistente"""
+        self.t_arranque = time.perf_counter()
+        self.headless = headless
+        # Import diferido: los comandos sin navegador no cargan Playwright
+        from playwright.sync_api import sync_playwright
         self.playwright = sync_playwright().start()
         
         print(f"📁 Usando perfil en: {self.user_data_dir}")
@@ -52,7 +230,7 @@ class ClassroomEntregasBot:
             if os.path.exists(self.user_data_dir):
                 try:
                     shutil.rmtree(self.user_data_dir)
-                    print("✓ Perfil limpiado")
+                    print("✓ Perfil limpiado (la sesión se restaurará desde la instantánea si existe)")
                 except:
                     pass
             
@@ -74,40 +252,209 @@ class ClassroomEntregasBot:
             self.page = self.browser.pages[0]
         else:
             self.page = self.browser.new_page()
+        if self.ipc:
+            self.page = self.ipc.envolver(self.page)
+        
+        if self.politica_recursos:
+            self.politica_recursos.instalar(self.browser)
         
-        self.page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-        """)
+        self.page.add_init_script(JS_OCULTAR_WEBDRIVER)
+        self.ciclo.vigilar(self.page)
+        if self.trazas:
+            self.trazas.registrar('iniciar_navegador', self.t_arranque)
         print("✓ Navegador iniciado")
     
+    def _fase(self, nombre):
+        """Indica en qué fase está el bot (para los contadores de recursos)"""
+        if self.politica_recursos:
+            self.politica_recursos.fase = nombre
+        if self.trazas:
+            self.trazas.fase = nombre
+    
+    def informe_recursos(self):
+        """Muestra las peticiones permitidas/bloqueadas por fase"""
+        if self.politica_recursos:
+            self.politica_recursos.informe()
+    
+    def _medir_ipc(self, vista):
+        """Cuenta las llamadas al navegador del bloque (si la medición está activa)"""
+        return self.ipc.medir(vista) if self.ipc else contextlib.nullcontext()
+    
+    def informe_ipc(self):
+        """Muestra las idas y vueltas al navegador por vista"""
+        if self.ipc:
+            self.ipc.informe()
+    
+    def _tramo(self, nombre, **datos):
+        """Mide el bloque como un tramo de la traza (si las trazas están activas)"""
+        return self.trazas.tramo(nombre, **datos) if self.trazas else contextlib.nullcontext(datos)
+    
+    def informe_ritmo(self):
+        """Ritmo de peticiones alcanzado y frenados de Google"""
+        if self.ritmo.peticiones:
+            self.ritmo.informe()
+    
+    def informe_spa(self):
+        """Cambios de alumno dentro de la app frente a recargas de respaldo"""
+        est = self.estadisticas_spa
+        cambios = est['spa'] + est['recarga']
+        if not cambios:
+            return
+        print("\n🔀 NAVEGACIÓN ENTRE ALUMNOS:")
+        print("-" * 50)
+        print(f"  {est['carga']} carga(s) completas, {cambios} cambio(s) dentro de la app")
+        print(f"  {est['spa']} verificados ({', '.join(f'{k}: {v}' for k, v in est['por'].items()) or '-'}), "
+              f"{est['recarga']} con recarga de respaldo ({est['recarga'] / cambios:.0%})")
+    
+    def informe_ciclo(self):
+        """Pestañas recicladas o caídas y memoria JS medida"""
+        self.ciclo.informe()
+    
+    def informe_cache(self):
+        """Listados servidos desde la caché frente a cargados"""
+        if self.cache:
+            self.cache.informe()
+    
+    def informe_almacen(self):
+        """Descargas y disco ahorrados por el almacén"""
+        if self.almacen:
+            self.almacen.informe()
+    
+    def informe_trazas(self):
+        """Tabla p50/p95 por fase y exportación de la línea de tiempo"""
+        if self.trazas:
+            self.trazas.informe()
+            self.trazas.exportar(self.ruta_trazas)
+    
+    def _ir(self, page, url, wait_until="domcontentloaded"):
+        """page.goto con control de ritmo, medido como tramo"""
+        return self._navegar(page, 'goto', url, lambda: page.goto(url, wait_until=wait_until))
+    
+    def _recargar(self, page, wait_until="domcontentloaded"):
+        """page.reload con control de ritmo, medido como tramo"""
+        return self._navegar(page, 'reload', page.url, lambda: page.reload(wait_until=wait_until))
+    
+    def _navegar(self, page, nombre, url, navegacion):
+        """
+        Pide ficha al control de ritmo, navega y mira si Google nos frena
+        (429/503, página de tráfico inusual, login a mitad de ejecución).
+        Si frena, el control baja el ritmo y pausa; los frenados reintentables
+        se repiten hasta REINTENTOS_FRENADO veces.
+        """
+        for intento in range(REINTENTOS_FRENADO + 1):
+            self.ritmo.adquirir()
+            self.ciclo.anotar(page)
+            with self._tramo(nombre, url=url) as tramo:
+                respuesta = navegacion()
+                motivo = motivo_frenado(respuesta.status if respuesta else None, page.url, url)
+                # Antes de la primera extracción el login es el paso normal de iniciar_sesion()
+                if motivo == 'login' and self.t_primera_extraccion is None:
+                    motivo = None
+                if motivo:
+                    tramo['ok'] = False
+                    tramo['frenado'] = motivo
+            if not motivo:
+                self.ritmo.exito()
+                return respuesta
+            self.ritmo.frenado(motivo)
+            if motivo not in REINTENTABLES:
+                break
+        return respuesta
+    
     def esperar(self, segundos=2):
         """Espera simple"""
-        time.sleep(segundos)
+        with self._tramo('esperar', segundos=segundos):
+            time.sleep(segundos)
+    
+    def esperar_listo(self, nombre, selector=None, url=None, url_distinta=None, fijo=0, page=None):
+        """
+        Espera a que la página esté lista en lugar de dormir un tiempo fijo.
+        Termina en cuanto se cumple CUALQUIERA de las condiciones: el selector
+        existe en el DOM, la URL contiene alguno de los textos de `url`, o la
+        URL ya es distinta de `url_distinta`.
+        El timeout sale de self.timeouts[nombre]. `fijo` son los segundos que
+        antes se esperaban a ciegas (solo se usa para el informe).
+        Devuelve True si la condición se cumplió y False si saltó el timeout.
+        """
+        page = page or self.page
+        if isinstance(url, str):
+            url = [url]
+        argumentos = {'selector': selector, 'urls': url or [], 'distinta': url_distinta}
+        timeout = self.timeouts.get(nombre, 10)
+        
+        inicio = time.perf_counter()
+        limite = inicio + timeout
+        listo = False
+        while True:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                page.wait_for_function(JS_PAGINA_LISTA, arg=argumentos, polling=100, timeout=restante * 1000)
+                listo = True
+                break
+            except Exception as e:
+                if 'Timeout' in type(e).__name__ or 'Timeout' in str(e):
+                    break
+                # El contexto se destruyó por una navegación: reintentar
+                time.sleep(0.1)
+        
+        self._registrar_espera(nombre, time.perf_counter() - inicio, fijo, listo)
+        return listo
+    
+    def _registrar_espera(self, nombre, segundos, fijo, listo):
+        """Acumula el tiempo real esperado frente a la espera fija antigua"""
+        est = self.estadisticas_espera.setdefault(nombre, {'veces': 0, 'real': 0.0, 'fijo': 0.0, 'timeouts': 0})
+        est['veces'] += 1
+        est['real'] += segundos
+        est['fijo'] += fijo
+        if not listo:
+            est['timeouts'] += 1
+        if self.trazas:
+            self.trazas.registrar(f"espera:{nombre}", time.perf_counter() - segundos, ok=listo)
+    
+    def informe_esperas(self):
+        """Muestra el tiempo esperado por condición comparado con las esperas fijas"""
+        if not self.estadisticas_espera:
+            return
+        print("\n⏱ TIEMPO DE ESPERA (real vs. fijo anterior):")
+        print("-" * 60)
+        total_real = total_fijo = 0.0
+        for nombre, est in self.estadisticas_espera.items():
+            print(f"  {nombre:<18} x{est['veces']:<4} {est['real']:7.1f}s vs {est['fijo']:7.1f}s"
+                  f"  (timeouts: {est['timeouts']})")
+            total_real += est['real']
+            total_fijo += est['fijo']
+        print(f"  {'TOTAL':<18}       {total_real:7.1f}s vs {total_fijo:7.1f}s"
+              f"  → ahorro {total_fijo - total_real:.1f}s")
     
     def login(self):
         """Login en Google"""
         print("Navegando a login...")
-        self.page.goto("https://accounts.google.com/signin", wait_until="domcontentloaded")
-        self.esperar(3)
+        self._fase('login')
+        self._ir(self.page, "https://accounts.google.com/signin")
+        self.esperar_listo('login', selector='input[type="email"], input[type="password"]',
+                           url=['myaccount.google.com', 'classroom.google.com'], fijo=3)
         
         if "myaccount.google.com" in self.page.url or "classroom.google.com" in self.page.url:
             print("✓ Ya estás logueado")
             return True
+        if not self._pedir_credenciales():
+            return False
         
         try:
             campo_email = self.page.wait_for_selector('input[type="email"]', timeout=5000)
             if campo_email:
                 campo_email.fill(self.email)
-                self.esperar(1)
                 self.page.click('#identifierNext')
-                self.esperar(3)
+                self.esperar_listo('login_email', selector='input[type="password"]', fijo=1 + 3)
             
             campo_password = self.page.wait_for_selector('input[type="password"]:visible', timeout=5000)
             if campo_password:
                 campo_password.fill(self.password)
-                self.esperar(1)
+                url_login = self.page.url
                 self.page.click('#passwordNext')
-                self.esperar(5)
+                self.esperar_listo('login_password', url_distinta=url_login, fijo=1 + 5)
             
             print("✓ Login completado")
             return True
@@ -116,43 +463,93 @@ class ClassroomEntregasBot:
             print(f"Error en login: {e}")
             return False
     
+    def _pedir_credenciales(self):
+        """Pide por teclado el email y la contraseña que no vinieron en el entorno"""
+        try:
+            if not self.email:
+                self.email = input("📧 Email de Google: ")
+            if not self.password:
+                self.password = input("🔑 Contraseña: ")
+        except EOFError:
+            print("✗ Hace falta hacer login y no hay terminal: define GOOGLE_EMAIL y GOOGLE_PASSWORD")
+            return False
+        return True
+    
+    def iniciar_sesion(self):
+        """
+        Deja el navegador con sesión iniciada y en el inicio de Classroom.
+        Arranque en caliente: si el perfil no conserva la sesión se restaura
+        la instantánea guardada, y solo si Classroom redirige al login se hace
+        el login() completo (guardando después una instantánea nueva).
+        """
+        if tiene_sesion(self.browser.cookies()):
+            self.tipo_arranque = 'perfil'
+        else:
+            estado = cargar_sesion(self.ruta_sesion)
+            if estado:
+                restaurar_sesion(self.browser, estado)
+                self.tipo_arranque = 'instantanea'
+        
+        if self.tipo_arranque:
+            self.ir_a_classroom()
+            if "accounts.google.com" not in self.page.url:
+                print(f"✓ Sesión recuperada sin login ({self.tipo_arranque})")
+                self._guardar_instantanea()
+                return True
+            print("⚠ La sesión ha caducado, haciendo login completo")
+        
+        self.tipo_arranque = 'login'
+        with self._tramo('login') as tramo:
+            tramo['ok'] = self.login()
+        if not tramo['ok']:
+            return False
+        self._guardar_instantanea()
+        self.ir_a_classroom()
+        return True
+    
+    def _guardar_instantanea(self):
+        """Guarda la sesión actual; un fallo aquí no debe parar la ejecución"""
+        try:
+            guardar_sesion(self.browser, self.ruta_sesion)
+        except Exception as e:
+            print(f"⚠ No se pudo guardar la instantánea de sesión: {e}")
+    
+    def _marcar_primera_extraccion(self):
+        if self.t_primera_extraccion is None:
+            self.t_primera_extraccion = time.perf_counter()
+    
+    def informe_arranque(self):
+        """Tiempo desde el arranque del navegador hasta la primera extracción"""
+        if self.t_arranque and self.t_primera_extraccion:
+            print(f"\n🚀 Arranque hasta la primera extracción: "
+                  f"{self.t_primera_extraccion - self.t_arranque:.1f}s ({self.tipo_arranque or 'sin sesión'})")
+    
     def ir_a_classroom(self):
         """Navega a Classroom"""
         print("Navegando a Classroom...")
-        self.page.goto(self.base_url, wait_until="domcontentloaded")
-        self.esperar(3)
+        self._fase('clases')
+        self._ir(self.page, self.base_url)
+        # Si nos manda al login no tiene sentido esperar a las clases
+        self.esperar_listo('classroom', selector='a[href*="/c/"]', url='accounts.google.com', fijo=3)
     
     def listar_clases(self):
         """Lista las clases disponibles"""
-        clases = []
-        html = self.page.content()
-        
-        # Buscar enlaces a clases /c/ID
-        patron = r'href="(/c/([A-Za-z0-9]+))"[^>]*>.*?YVvGBb[^>]*>([^<]+)<'
-        matches = re.findall(patron, html, re.DOTALL)
-        
-        vistas = set()
-        for href, clase_id, nombre in matches:
-            nombre = nombre.strip()
-            if clase_id not in vistas and nombre not in ['Inicio', 'Calendar', 'Para revisar', 'Ajustes', 'Clases archivadas']:
-                clases.append({
-                    'id': clase_id,
-                    'nombre': nombre,
-                    'url': f"{self.base_url}/c/{clase_id}"
-                })
-                vistas.add(clase_id)
-        
-        # Método alternativo
-        if not clases:
-            enlaces = self.page.query_selector_all('a[href*="/c/"]')
-            for enlace in enlaces:
-                try:
-                    href = enlace.get_attribute('href')
+        self._marcar_primera_extraccion()
+        with self._tramo('listar_clases'), self._medir_ipc('listar_clases'):
+            html = self.page.content()
+            
+            # Buscar enlaces a clases /c/ID (una sola pasada por el HTML)
+            clases = extraer_clases(html, self.base_url)
+            vistas = {c['id'] for c in clases}
+            
+            # Método alternativo
+            if not clases:
+                for href, texto in self._enlaces_clases():
                     match = re.search(r'/c/([A-Za-z0-9]+)', href)
                     if match:
                         clase_id = match.group(1)
                         if clase_id not in vistas:
-                            texto = enlace.inner_text().strip()
+                            texto = texto.strip()
                             if texto and texto not in ['Inicio', 'Calendar']:
                                 clases.append({
                                     'id': clase_id,
@@ -160,11 +557,76 @@ class ClassroomEntregasBot:
                                     'url': f"{self.base_url}/c/{clase_id}"
                                 })
                                 vistas.add(clase_id)
-                except:
-                    continue
         
         return clases
     
+    def _enlaces_clases(self):
+        """Pares (href, texto) de los enlaces a /c/ de la página"""
+        if self.dom_por_lotes:
+            try:
+                return [(e['href'], e['texto']) for e in self.page.evaluate(JS_ENLACES_CLASES)]
+            except Exception as e:
+                print(f"⚠ Lectura en lote fallida, elemento a elemento: {e}")
+        
+        enlaces = []
+        for enlace in self.page.query_selector_all('a[href*="/c/"]'):
+            try:
+                enlaces.append((enlace.get_attribute('href') or '', enlace.inner_text()))
+            except:
+                continue
+        return enlaces
+    
+    # ---------------- Listados con caché ----------------
+    
+    def _cuenta(self):
+        """Parte de la clave de caché que separa cuentas (y servidores de prueba)"""
+        return f"{urllib.parse.urlsplit(self.base_url).netloc}/{self.email or '-'}"
+    
+    def _listado(self, clave, cargar, refrescar=False, que="listado"):
+        """Listado desde la caché si está vigente; si no, cargar() (y se guarda)"""
+        if not self.cache:
+            return cargar()
+        valor, edad = self.cache.obtener((self._cuenta(),) + clave, cargar, refrescar)
+        if edad:
+            print(f"🗄 {que} de la caché ({edad_legible(edad)})")
+        return valor
+    
+    def lista_clases(self, refrescar=False):
+        """Clases de la cuenta (caché o inicio de Classroom)"""
+        def cargar():
+            # iniciar_sesion() ya suele dejar el navegador en el inicio
+            if urllib.parse.urlsplit(self.page.url).path not in ('', '/', '/h'):
+                self.ir_a_classroom()
+            return self.listar_clases()
+        return self._listado(('clases',), cargar, refrescar, "Clases")
+    
+    def lista_tareas(self, clase_id, refrescar=False):
+        """Tareas de una clase (caché o página de Trabajo de clase)"""
+        def cargar():
+            self.ir_a_trabajo_de_clase(clase_id)
+            return self.listar_tareas()
+        return self._listado(('tareas', clase_id), cargar, refrescar, "Tareas")
+    
+    def lista_estudiantes(self, clase_id, tarea_id, refrescar=False):
+        """Alumnos de una tarea (caché o página de entregas)"""
+        return self._listado(('alumnos', clase_id, tarea_id),
+                             lambda: self.obtener_lista_estudiantes(clase_id, tarea_id), refrescar, "Alumnos")
+    
+    def invalidar_listados(self, clase_id=None):
+        """Olvida los listados de la cuenta (o solo los de una clase)"""
+        if not self.cache:
+            return 0
+        if clase_id is None:
+            return self.cache.invalidar(self._cuenta())
+        return self.cache.invalidar(self._cuenta(), 'tareas', clase_id) + \
+            self.cache.invalidar(self._cuenta(), 'alumnos', clase_id)
+    
+    def refrescar_listados(self):
+        """Recarga los listados caducados que se sirvieron en esta ejecución"""
+        if self.cache and self.cache.pendientes:
+            print(f"\n🔄 Refrescando {len(self.cache.pendientes)} listado(s) caducados de la caché...")
+            self.cache.refrescar_pendientes()
+    
     def ir_a_trabajo_de_clase(self, clase_id):
         """
         Navega a la sección de Trabajo de clase
@@ -172,29 +634,52 @@ class ClassroomEntregasBot:
         """
         url = f"{self.base_url}/w/{clase_id}/t/all"
         print(f"Navegando a: {url}")
-        self.page.goto(url, wait_until="domcontentloaded")
-        self.esperar(3)
+        self._fase('tareas')
+        self._ir(self.page, url)
+        self.esperar_listo('trabajo_de_clase', selector=SELECTOR_TAREAS, fijo=3)
     
     def listar_tareas(self):
         """
         Lista las tareas disponibles en la página actual.
         Busca elementos con enlaces a tareas /a/ID
         """
-        tareas = []
-        self.esperar(2)
-        html = self.page.content()
+        self.esperar_listo('listar_tareas', selector=SELECTOR_TAREAS, fijo=2)
+        self._marcar_primera_extraccion()
         
-        # Buscar elementos que son tareas (tienen href con /a/ seguido de ID largo)
-        # El patrón ACg8oc... es típico de tareas
-        patron = r'href="[^"]*?/a/(ACg8oc[A-Za-z0-9_-]+)[^"]*"'
-        ids_tareas = list(set(re.findall(patron, html)))
+        with self._tramo('listar_tareas'), self._medir_ipc('listar_tareas'):
+            html = self.page.content()
+            
+            # Buscar elementos que son tareas (tienen href con /a/ seguido de ID largo)
+            # El patrón ACg8oc... es típico de tareas; también hay IDs numéricos
+            ids_tareas = extraer_ids_tareas(html)
+            
+            # Obtener nombres de las tareas buscando en el DOM
+            tareas = self._tareas_del_dom()
         
-        # Buscar IDs numéricos también
-        patron2 = r'href="[^"]*?/a/(\d{15,})[^"]*"'
-        ids_tareas.extend(list(set(re.findall(patron2, html))))
+        # Último recurso: solo los IDs de los enlaces /a/
+        if not tareas:
+            tareas = [{'id': t, 'nombre': f'Tarea_{t[:8]}'} for t in ids_tareas]
         
-        # Obtener nombres de las tareas buscando en el DOM
-        elementos = self.page.query_selector_all('[data-item-id], [data-coursework-id]')
+        # Eliminar duplicados
+        vistos = set()
+        tareas_unicas = []
+        for t in tareas:
+            if t['id'] not in vistos:
+                vistos.add(t['id'])
+                tareas_unicas.append(t)
+        
+        return tareas_unicas
+    
+    def _tareas_del_dom(self):
+        """Lista [{'id', 'nombre'}] de los elementos [data-item-id]/[data-coursework-id]"""
+        if self.dom_por_lotes:
+            try:
+                return [t for t in self.page.evaluate(JS_TAREAS, SELECTOR_TAREAS) if t['id'] and t['nombre']]
+            except Exception as e:
+                print(f"⚠ Lectura en lote fallida, elemento a elemento: {e}")
+        
+        tareas = []
+        elementos = self.page.query_selector_all(SELECTOR_TAREAS)
         
         for elem in elementos:
             try:
@@ -231,15 +716,7 @@ class ClassroomEntregasBot:
                 except:
                     continue
         
-        # Eliminar duplicados
-        vistos = set()
-        tareas_unicas = []
-        for t in tareas:
-            if t['id'] not in vistos:
-                vistos.add(t['id'])
-                tareas_unicas.append(t)
-        
-        return tareas_unicas
+        return tareas
     
     def ir_a_entregas_tarea(self, clase_id, tarea_id):
         """
@@ -248,8 +725,9 @@ class ClassroomEntregasBot:
         """
         url = f"{self.base_url}/c/{clase_id}/a/{tarea_id}/submissions/by-status/and-sort-name/all"
         print(f"Navegando a entregas: {url}")
-        self.page.goto(url, wait_until="domcontentloaded")
-        self.esperar(3)
+        self._fase('entregas')
+        self._ir(self.page, url)
+        self.esperar_listo('entregas', selector='a[href*="/student/"], [data-student-id]', fijo=3)
     
     def obtener_lista_estudiantes(self, clase_id, tarea_id):
         """
@@ -257,128 +735,269 @@ class ClassroomEntregasBot:
         Retorna lista de diccionarios: [{'id': '...', 'nombre': '...'}]
         """
         self.ir_a_entregas_tarea(clase_id, tarea_id)
-        html = self.page.content()
-        
-        estudiantes = []
-        vistos = set()
-        
-        # Método 1: Buscar patrón ID + nombre en span.YVvGBb
-        # Formato: /student/ID" ... <span class="YVvGBb">Nombre</span>
-        patron = r'/student/([A-Za-z0-9]{16,})"[^>]*>.*?<span[^>]*class="YVvGBb"[^>]*>([^<]+)</span>'
-        matches = re.findall(patron, html, re.DOTALL)
-        
-        for est_id, nombre in matches:
-            nombre = nombre.strip()
-            if est_id not in vistos and nombre:
-                estudiantes.append({'id': est_id, 'nombre': nombre})
-                vistos.add(est_id)
-        
-        # Método 2: Si no encontramos con el patrón, usar data-student-id
-        if not estudiantes:
-            # Buscar en filas de la tabla
-            patron2 = r'data-student-id="(\d+)".*?<span[^>]*class="YVvGBb"[^>]*>([^<]+)</span>'
-            matches2 = re.findall(patron2, html, re.DOTALL)
-            for est_id, nombre in matches2:
-                nombre = nombre.strip()
-                if est_id not in vistos and nombre:
-                    # Convertir ID numérico a base64 si es necesario
-                    estudiantes.append({'id': est_id, 'nombre': nombre})
-                    vistos.add(est_id)
-        
-        # Método 3: Fallback - solo IDs
-        if not estudiantes:
-            patron_simple = r'/student/([A-Za-z0-9]{16,})'
-            ids = list(set(re.findall(patron_simple, html)))
-            for est_id in ids:
-                if est_id not in vistos:
-                    estudiantes.append({'id': est_id, 'nombre': f'Estudiante_{est_id[:8]}'})
-                    vistos.add(est_id)
-        
+        self._marcar_primera_extraccion()
+        with self._tramo('lista_estudiantes') as tramo:
+            html = self.page.content()
+            
+            # Enlaces /student/ID + nombre en span.YVvGBb; si no hay, data-student-id
+            # y como último recurso solo los IDs (todo en una pasada por el HTML)
+            estudiantes = extraer_estudiantes(html)
+            tramo['alumnos'] = len(estudiantes)
         return estudiantes
     
-    def extraer_archivos_de_estudiante(self, clase_id, tarea_id, estudiante_id):
+    def leer_estado_entregas(self, clase_id, tarea_id):
+        """
+        Una sola carga de la página de entregas: (alumnos, texto de la fila de
+        cada alumno, respuestas capturadas o None). La fila lleva el estado
+        ("Entregado", "Asignado", "Devuelto"...) y sirve para ver qué cambió.
+        """
+        captura = CapturaRespuestas(self.browser).iniciar() if self.captura_red else None
+        try:
+            estudiantes = self.lista_estudiantes(clase_id, tarea_id, refrescar=True)
+            with self._medir_ipc('entregas'):
+                filas = self.page.evaluate(JS_FILAS_ALUMNOS)
+        finally:
+            capturas = captura.parar() if captura else None
+        return estudiantes, filas, capturas
+    
+    def extraer_archivos_de_estudiante(self, clase_id, tarea_id, estudiante_id, page=None, nombre=None):
         """
         Navega a la entrega de un estudiante específico y extrae sus archivos.
-        CORREGIDO: Fuerza la recarga para evitar duplicar el archivo del primer alumno.
+        CORREGIDO: comprueba que el panel es del alumno pedido (o recarga) para
+        evitar duplicar el archivo del alumno anterior.
+        """
+        page = page or self.page
+        pendiente = self._cargar_entrega_estudiante(page, clase_id, tarea_id, estudiante_id, nombre=nombre)
+        if pendiente:
+            self._confirmar_alumno(page, pendiente)
+        # Esperar a que aparezcan los adjuntos (el icono del ojo); como máximo
+        # lo mismo que la antigua espera fija, por si el alumno no entregó nada
+        self.esperar_listo('adjuntos', selector=SELECTOR_ADJUNTOS, fijo=5, page=page)
+        return self._leer_archivos_pagina(page)
+    
+    def _cargar_entrega_estudiante(self, page, clase_id, tarea_id, estudiante_id, wait_until="domcontentloaded",
+                                   nombre=None):
+        """
+        Abre la vista de calificación de un estudiante.
+        Si la pestaña ya está en la vista de calificación de esta tarea, solo
+        cambia el alumno del fragmento (#u=...) sin recargar la app y devuelve
+        lo necesario para _confirmar_alumno(); si no, la carga entera y
+        devuelve None.
         """
         # 1. Construir URL con el ID del estudiante en el fragmento (#u=...)
         url = f"{self.base_url}/g/tg/{clase_id}/{tarea_id}#u={estudiante_id}&t=f"
+        self._fase('alumnos')
         
-        # 2. Navegar
-        self.page.goto(url, wait_until="domcontentloaded")
+        if self.navegacion_spa and self._en_calificacion(page, clase_id, tarea_id):
+            # 2a. Cambio dentro de la SPA: la app solo pide los datos del alumno
+            self.ritmo.adquirir()
+            self.ciclo.anotar(page)
+            antes = page.evaluate(JS_CAMBIAR_ALUMNO, {'hash': f"u={estudiante_id}&t=f", 'selector': SELECTOR_ADJUNTOS})
+            return {'id': estudiante_id, 'nombre': nombre, 'antes': antes, 'wait_until': wait_until}
         
-        # --- FIX CRÍTICO: FORZAR RECARGA ---
-        # Classroom es una SPA (Single Page App). Si solo cambiamos el #hash, 
-        # a veces no actualiza el DOM y seguimos viendo al alumno anterior.
-        # El reload obliga a traer los datos nuevos.
-        self.page.reload(wait_until="domcontentloaded")
-        self.esperar(5) # Espera generosa para que aparezcan los adjuntos (el icono del ojo)
+        # 2b. Carga completa (otra página u otra tarea): el DOM ya es el del alumno
+        self.estadisticas_spa['carga'] += 1
+        self._ir(page, url, wait_until)
+        return None
+    
+    def _en_calificacion(self, page, clase_id, tarea_id):
+        """True si la pestaña ya tiene abierta la vista de calificación de la tarea"""
+        ruta = urllib.parse.urlsplit(page.url).path.rstrip('/')
+        return ruta.endswith(f"/g/tg/{clase_id}/{tarea_id}")
+    
+    def _confirmar_alumno(self, page, pendiente):
+        """
+        Tras un cambio de alumno dentro de la app, espera a que el panel sea
+        del alumno nuevo (JS_ALUMNO_VISIBLE). Classroom a veces no actualiza el
+        DOM al cambiar solo el #hash y seguiríamos viendo al alumno anterior:
+        si no se confirma a tiempo, se recarga la página como respaldo.
+        """
+        argumentos = {'id': pendiente['id'], 'nombre': pendiente['nombre'], 'antes': pendiente['antes'],
+                      'selector': SELECTOR_ADJUNTOS}
+        inicio = time.perf_counter()
+        por = None
+        with self._tramo('cambio_alumno') as tramo:
+            try:
+                por = page.wait_for_function(JS_ALUMNO_VISIBLE, arg=argumentos, polling=50,
+                                             timeout=self.timeouts['cambio_alumno'] * 1000).json_value()
+            except Exception:
+                pass
+            tramo['ok'] = bool(por)
+            tramo['por'] = por
+        self._registrar_espera('cambio_alumno', time.perf_counter() - inicio, 0, bool(por))
         
-        archivos = []
-        ids_vistos = set()
+        est = self.estadisticas_spa
+        if por:
+            est['spa'] += 1
+            est['por'][por] = est['por'].get(por, 0) + 1
+            return True
+        est['recarga'] += 1
+        self._recargar(page, pendiente['wait_until'])
+        return False
+    
+    def _leer_archivos_pagina(self, page):
+        """Extrae los adjuntos (div.clmEye) de una vista de estudiante ya cargada"""
+        with self._tramo('leer_adjuntos') as tramo:
+            with self._medir_ipc('adjuntos_estudiante'):
+                urls_ojo, urls_docs = self._urls_adjuntos(page)
+            
+            archivos = self._archivos_desde_urls(urls_ojo)
+            
+            # Si no encontró nada con clmEye, intentamos un escaneo general por seguridad
+            if not archivos:
+                archivos = self._archivos_desde_urls(urls_docs)
+            tramo['archivos'] = len(archivos)
+        
+        return archivos
+    
+    def _urls_adjuntos(self, page):
+        """
+        Devuelve (urls de div.clmEye[data-url], urls data-url de docs.google.com).
+        En lote es una sola llamada al navegador; si no, una por elemento.
+        """
+        if self.dom_por_lotes:
+            try:
+                datos = page.evaluate(JS_ADJUNTOS, SELECTOR_ADJUNTOS)
+                return datos['ojo'], datos['docs']
+            except Exception as e:
+                print(f"⚠ Lectura en lote fallida, elemento a elemento: {e}")
         
         # Buscar el div específico que encontraste (clmEye)
         # Este div contiene el data-url con el enlace al archivo
+        urls_ojo = []
         try:
-            elementos_ojo = self.page.query_selector_all('div.clmEye[data-url]')
-            
-            for elem in elementos_ojo:
+            for elem in page.query_selector_all(SELECTOR_ADJUNTOS):
                 try:
                     url_archivo = elem.get_attribute('data-url')
                     if url_archivo:
-                        # Limpieza básica de la URL
-                        url_archivo = url_archivo.replace('&amp;', '&')
-                        
-                        # Extraemos el ID del fichero (lo que va después de /d/)
-                        id_match = re.search(r'/d/([A-Za-z0-9_-]+)', url_archivo)
-                        
-                        if id_match:
-                            file_id = id_match.group(1)
-                            
-                            if file_id not in ids_vistos:
-                                ids_vistos.add(file_id)
-                                archivos.append({
-                                    'id': file_id,
-                                    'url': url_archivo,
-                                    'url_pdf': f"https://drive.google.com/uc?export=download&id={file_id}"
-                                })
+                        urls_ojo.append(url_archivo)
                 except:
                     continue
         except Exception as e:
             print(f"Error buscando clmEye: {e}")
-
-        # Si no encontró nada con clmEye, intentamos un escaneo general por seguridad
-        if not archivos:
-            html = self.page.content()
+        
+        urls_docs = []
+        if not self._archivos_desde_urls(urls_ojo):
+            html = page.content()
             # Patrón para documentos de google
-            patron_data_url = r'data-url="(https://docs\.google\.com/[^"]+)"'
-            matches = re.findall(patron_data_url, html)
+            urls_docs = re.findall(r'data-url="(https://docs\.google\.com/[^"]+)"', html)
+        
+        return urls_ojo, urls_docs
+    
+    def _archivos_desde_urls(self, urls):
+        """Convierte URLs de adjuntos en [{'id', 'url', 'url_pdf'}] sin duplicados"""
+        archivos = []
+        ids_vistos = set()
+        
+        for url_archivo in urls:
+            # Limpieza básica de la URL
+            url_archivo = url_archivo.replace('&amp;', '&')
             
-            for url_archivo in matches:
-                url_archivo = url_archivo.replace('&amp;', '&')
-                id_match = re.search(r'/d/([A-Za-z0-9_-]+)', url_archivo)
-                if id_match and id_match.group(1) not in ids_vistos:
-                    file_id = id_match.group(1)
-                    ids_vistos.add(file_id)
-                    archivos.append({
-                        'id': file_id,
-                        'url': url_archivo,
-                        'url_pdf': f"https://drive.google.com/uc?export=download&id={file_id}"
-                    })
-
+            # Extraemos el ID del fichero (lo que va después de /d/)
+            id_match = re.search(r'/d/([A-Za-z0-9_-]+)', url_archivo)
+            
+            if id_match and id_match.group(1) not in ids_vistos:
+                file_id = id_match.group(1)
+                ids_vistos.add(file_id)
+                archivos.append({
+                    'id': file_id,
+                    'url': url_archivo,
+                    'url_pdf': f"{self.hosts_exportacion['drive']}/uc?export=download&id={file_id}"
+                })
+        
         return archivos
     
-    def extraer_todas_entregas(self, clase_id, tarea_id, nombre_tarea=""):
+    def extraer_todas_entregas(self, clase_id, tarea_id, nombre_tarea="", concurrencia=1, estudiantes=None,
+                               flujo=None, nombre_clase="", revisitar=False, capturas=None):
         """
         Extrae todas las entregas de todos los estudiantes de una tarea.
         Incluye nombre del alumno y URLs para descargar.
+        Con concurrencia > 1 reparte los alumnos entre varias pestañas.
+        Si hay manifiesto, los alumnos ya extraídos con archivos no se vuelven
+        a visitar (los que no tenían, sí: pueden entregar tarde).
+        Con captura_red, los alumnos resueltos con los datos que Classroom
+        carga en la página de entregas tampoco se visitan.
+        `estudiantes` permite reutilizar una lista ya obtenida (p. ej. la de
+        otra tarea de la misma clase) y ahorrarse la página de entregas.
+        Con `flujo` (EscritorEntregas) cada entrega se escribe en disco en
+        cuanto se resuelve. Con base de datos, al terminar se guardan todas
+        (también las recuperadas del manifiesto) en una transacción por lote.
+        `revisitar` ignora el manifiesto (la entrega cambió) y `capturas` son
+        respuestas ya capturadas de la página de entregas (no se vuelve a cargar).
         """
         print(f"\n📥 Extrayendo entregas de tarea: {nombre_tarea or tarea_id[:15]}...")
         
-        # Obtener lista de estudiantes con nombres
-        estudiantes = self.obtener_lista_estudiantes(clase_id, tarea_id)
+        # Obtener lista de estudiantes con nombres (capturando la red si procede)
+        captura = CapturaRespuestas(self.browser).iniciar() if self.captura_red and capturas is None else None
+        try:
+            if estudiantes is None or captura:
+                # Con captura hay que cargar la página igualmente (y se actualiza la caché)
+                estudiantes = self.lista_estudiantes(clase_id, tarea_id, refrescar=bool(captura))
+        finally:
+            if captura:
+                capturas = captura.parar()
         print(f"✓ Encontrados {len(estudiantes)} estudiantes")
         
+        if captura and self.grabar_red:
+            captura.guardar_grabacion(self.grabar_red)
+        
+        # Entregas que no hace falta visitar: estudiante_id -> entrega
+        resueltas = {}
+        
+        # Reanudar: solo se visitan los alumnos que faltan en el manifiesto
+        if self.manifiesto and not revisitar:
+            for est in estudiantes:
+                entrega = self.manifiesto.entrega_guardada(clase_id, tarea_id, est['id'])
+                if entrega:
+                    resueltas[est['id']] = entrega
+                    if flujo:
+                        flujo.escribir(entrega)
+            if resueltas:
+                print(f"↩ {len(resueltas)} ya extraídos en el manifiesto")
+        
+        if capturas is not None:
+            self._resolver_por_red(clase_id, tarea_id, capturas, estudiantes, resueltas, flujo)
+        
+        pendientes = [est for est in estudiantes if est['id'] not in resueltas]
+        if resueltas:
+            print(f"👣 {len(pendientes)} alumno(s) pendientes de visitar")
+        
+        nuevas = self._extraer_entregas(clase_id, tarea_id, pendientes, concurrencia, flujo)
+        resueltas.update((e['estudiante_id'], e) for e in nuevas)
+        if self.manifiesto:
+            self.manifiesto.volcar()
+        
+        # Mismo orden que la lista de estudiantes
+        entregas = [resueltas[est['id']] for est in estudiantes]
+        if self.base_datos:
+            self.base_datos.registrar_tarea(clase_id, tarea_id, nombre_tarea, nombre_clase)
+            for entrega in entregas:
+                self.base_datos.anotar_entrega(clase_id, tarea_id, entrega)
+            self.base_datos.volcar()
+        return entregas
+    
+    def _resolver_por_red(self, clase_id, tarea_id, capturas, estudiantes, resueltas, flujo=None):
+        """Añade a `resueltas` las entregas reconstruidas de las respuestas capturadas"""
+        por_red = entregas_desde_capturas(capturas, estudiantes)
+        n = 0
+        for est in estudiantes:
+            if est['id'] in resueltas or est['id'] not in por_red:
+                continue
+            entrega = {
+                'estudiante_id': est['id'],
+                'nombre_alumno': est['nombre'],
+                'archivos': self._archivos_desde_urls(por_red[est['id']])
+            }
+            self._anotar_entrega(clase_id, tarea_id, [], entrega, flujo)
+            resueltas[est['id']] = entrega
+            n += 1
+        print(f"📡 {n} alumno(s) resueltos con la captura de red ({len(capturas)} respuestas)")
+    
+    def _extraer_entregas(self, clase_id, tarea_id, estudiantes, concurrencia=1, flujo=None):
+        """Visita a cada estudiante de la lista y devuelve sus entregas"""
+        if concurrencia > 1 and len(estudiantes) > 1:
+            return self._extraer_entregas_concurrente(clase_id, tarea_id, estudiantes, concurrencia, flujo)
+        
         todas_entregas = []
         
         for i, est in enumerate(estudiantes, 1):
@@ -386,104 +1005,424 @@ class ClassroomEntregasBot:
             nombre = est['nombre']
             print(f"  [{i}/{len(estudiantes)}] 👤 {nombre}")
             
-            archivos = self.extraer_archivos_de_estudiante(clase_id, tarea_id, est_id)
+            paginas = self._revisar_paginas([self.page])
+            archivos = self._extraer_con_recuperacion(clase_id, tarea_id, est, paginas, 0)
             
             if archivos:
                 print(f"              📎 {len(archivos)} archivo(s)")
             
-            todas_entregas.append({
+            self._anotar_entrega(clase_id, tarea_id, todas_entregas, {
                 'estudiante_id': est_id,
                 'nombre_alumno': nombre,
                 'archivos': archivos
-            })
-            
-            # Pequeña pausa para no sobrecargar
-            self.esperar(1)
+            }, flujo)
         
         return todas_entregas
     
-    def descargar_como_pdf(self, entregas, carpeta_destino="descargas_TArea_manual"):
+    def _anotar_entrega(self, clase_id, tarea_id, entregas, entrega, flujo=None):
+        """Añade una entrega al resultado y la registra en el manifiesto y en el flujo"""
+        entregas.append(entrega)
+        if flujo:
+            flujo.escribir(entrega)
+        if self.manifiesto:
+            self.manifiesto.marcar_extraido(clase_id, tarea_id, entrega)
+    
+    def abrir_pestanas(self, n):
+        """
+        Devuelve n páginas del mismo contexto persistente (misma sesión).
+        La primera es siempre self.page; el resto se crean nuevas.
+        """
+        paginas = [self.page]
+        while len(paginas) < n:
+            paginas.append(self._nueva_pagina())
+        return paginas
+    
+    def _nueva_pagina(self):
+        """Pestaña nueva del contexto, preparada como self.page y vigilada por el ciclo"""
+        page = self.browser.new_page()
+        page.add_init_script(JS_OCULTAR_WEBDRIVER)
+        if self.ipc:
+            page = self.ipc.envolver(page)
+        self.ciclo.vigilar(page)
+        return page
+    
+    def _revisar_paginas(self, paginas):
+        """
+        Sustituye las pestañas caídas o que pasaron los umbrales del ciclo
+        (navegaciones o memoria JS). Si con ellas toca reiniciar el navegador,
+        lo reinicia y abre de nuevo tantas pestañas como había.
+        """
+        motivos = [self.ciclo.motivo(self.browser, page) for page in paginas]
+        if not any(motivos):
+            return paginas
+        reiniciar = False
+        for motivo in motivos:
+            if motivo:
+                reiniciar = self.ciclo.reciclada(motivo) or reiniciar
+        if reiniciar:
+            self._reiniciar_navegador()
+            return self.abrir_pestanas(len(paginas))
+        for j, motivo in enumerate(motivos):
+            if motivo:
+                paginas[j] = self._reemplazar_pagina(paginas[j], motivo)
+        return paginas
+    
+    def _reemplazar_pagina(self, page, motivo):
+        """Cierra la pestaña y abre otra en el mismo contexto (o reinicia el navegador si el contexto cayó)"""
+        if motivo == 'caida':
+            print("   💥 Pestaña caída: se abre una nueva")
+        self.ciclo.olvidar(page)
+        try:
+            page.close()
+        except Exception:
+            pass
+        try:
+            nueva = self._nueva_pagina()
+        except Exception as e:
+            # Se cayó el navegador entero: el perfil persistente conserva la sesión
+            print(f"   💥 El navegador no responde ({e}); se reinicia")
+            self._reiniciar_navegador()
+            return self.page
+        if page is self.page:
+            self.page = nueva
+        return nueva
+    
+    def _reiniciar_navegador(self):
+        """Cierra Chromium y lo vuelve a abrir con el mismo perfil (libera toda su memoria)"""
+        t_arranque = self.t_arranque
+        for cerrar in (lambda: self.browser.close(), lambda: self.playwright.stop()):
+            try:
+                cerrar()
+            except Exception:
+                pass
+        self.iniciar_navegador(self.headless)
+        # El arranque que cuenta en el informe es el primero
+        self.t_arranque = t_arranque
+        self.ciclo.reiniciado()
+        self.ciclo.vigilar(self.page)
+    
+    def _extraer_con_recuperacion(self, clase_id, tarea_id, est, paginas, j):
+        """
+        extraer_archivos_de_estudiante en paginas[j]; si la pestaña se cae a
+        mitad, la sustituye por una nueva y repite el alumno (hasta
+        ciclo.reintentos veces).
+        """
+        intentos = 0
+        while True:
+            try:
+                return self.extraer_archivos_de_estudiante(clase_id, tarea_id, est['id'], page=paginas[j],
+                                                           nombre=est['nombre'])
+            except Exception as e:
+                if intentos >= self.ciclo.reintentos or not pagina_caida(paginas[j], e):
+                    raise
+                intentos += 1
+                print(f"   ⚠ {est['nombre']}: {e}")
+                self.ciclo.reciclada('caida')
+                paginas[j] = self._reemplazar_pagina(paginas[j], 'caida')
+    
+    def _extraer_entregas_concurrente(self, clase_id, tarea_id, estudiantes, concurrencia, flujo=None):
+        """
+        Procesa los alumnos en tandas de `concurrencia` pestañas.
+        
+        La API síncrona de Playwright no se puede usar desde varios hilos, así que
+        en cada tanda se lanzan todas las navegaciones seguidas (sin esperar a que
+        carguen) y después se hace UNA sola espera compartida: las cargas y la
+        espera de adjuntos se solapan entre pestañas. El resultado mantiene el
+        orden de la lista de estudiantes.
+        """
+        paginas = self.abrir_pestanas(min(concurrencia, len(estudiantes)))
+        print(f"🗂 Usando {len(paginas)} pestañas en paralelo")
+        
+        todas_entregas = []
+        total = len(estudiantes)
+        
+        try:
+            for inicio in range(0, total, len(paginas)):
+                paginas = self._revisar_paginas(paginas)
+                tanda = estudiantes[inicio:inicio + len(paginas)]
+                
+                # 1. Lanzar todas las navegaciones (o cambios de alumno) de la tanda
+                pendientes = []
+                for page, est in zip(paginas, tanda):
+                    pendiente = None
+                    try:
+                        pendiente = self._cargar_entrega_estudiante(page, clase_id, tarea_id, est['id'],
+                                                                    wait_until="commit", nombre=est['nombre'])
+                    except Exception as e:
+                        print(f"   ⚠ Error navegando a {est['nombre']}: {e}")
+                    pendientes.append(pendiente)
+                
+                # 2. Esperar a cada pestaña: mientras se espera a la primera,
+                #    las demás siguen cargando en paralelo
+                for page, pendiente in zip(paginas, pendientes):
+                    try:
+                        if pendiente:
+                            self._confirmar_alumno(page, pendiente)
+                        page.wait_for_load_state("domcontentloaded")
+                    except Exception as e:
+                        # Pestaña caída: el alumno se repite en una nueva en el paso 3
+                        if not pagina_caida(page, e):
+                            print(f"   ⚠ Error esperando la carga: {e}")
+                        continue
+                    self.esperar_listo('adjuntos', selector=SELECTOR_ADJUNTOS, fijo=5 / len(tanda), page=page)
+                
+                # 3. Leer los adjuntos de cada pestaña, en orden
+                for j, (page, est) in enumerate(zip(paginas, tanda)):
+                    print(f"  [{inicio + j + 1}/{total}] 👤 {est['nombre']}")
+                    try:
+                        archivos = self._leer_archivos_pagina(page)
+                    except Exception as e:
+                        if pagina_caida(page, e):
+                            print(f"   ⚠ {est['nombre']}: {e}")
+                            self.ciclo.reciclada('caida')
+                            paginas[j] = self._reemplazar_pagina(page, 'caida')
+                            archivos = self._extraer_con_recuperacion(clase_id, tarea_id, est, paginas, j)
+                        else:
+                            print(f"   ⚠ Error leyendo adjuntos: {e}")
+                            archivos = []
+                    
+                    if archivos:
+                        print(f"              📎 {len(archivos)} archivo(s)")
+                    
+                    self._anotar_entrega(clase_id, tarea_id, todas_entregas, {
+                        'estudiante_id': est['id'],
+                        'nombre_alumno': est['nombre'],
+                        'archivos': archivos
+                    }, flujo)
+        finally:
+            # Cerrar las pestañas auxiliares; self.page se conserva
+            for page in paginas:
+                if page is self.page:
+                    continue
+                try:
+                    page.close()
+                except:
+                    pass
+        
+        return todas_entregas
+    
+    def descargar_como_pdf(self, entregas, carpeta_destino="descargas_TArea_manual", concurrencia=4,
+                           clase_id=None, tarea_id=None):
         """
         Descarga los archivos convirtiendo Google Docs a PDF.
         Guarda todo en una única carpeta con el formato: "NombreAlumno_ID.pdf"
+        Con concurrencia > 0 descarga por HTTP en paralelo con las cookies de la
+        sesión; lo que falle (o concurrencia=0) se descarga navegando la pestaña.
+        Con manifiesto (y clase_id/tarea_id) se saltan los archivos ya descargados.
+        Con almacén cada archivo se descarga una vez y la carpeta se llena de enlaces.
+        Con base de datos (y tarea_id) las descargas se anotan en ella al terminar.
         """
         print(f"\n📥 Iniciando descargas en: '{carpeta_destino}'...")
+        self._fase('descargas')
         
         # Crear la carpeta si no existe
         if not os.path.exists(carpeta_destino):
             os.makedirs(carpeta_destino)
             print(f"✓ Carpeta creada: {carpeta_destino}")
         
+        plan = plan_descargas(entregas, carpeta_destino, self.hosts_exportacion)
         total_descargados = 0
         
-        for entrega in entregas:
-            nombre_alumno = entrega['nombre_alumno']
-            archivos = entrega['archivos']
+        usar_manifiesto = bool(self.manifiesto and clase_id and tarea_id)
+        usar_base = bool(self.base_datos and tarea_id)
+        # Descargas para la base de datos: se insertan juntas al terminar
+        anotadas = []
+        if usar_manifiesto:
+            vigentes = [item for item in plan if self.manifiesto.descarga_vigente(
+                clase_id, tarea_id, item['estudiante_id'], item['id'], item['ruta'])]
+            if vigentes:
+                print(f"↩ {len(vigentes)} archivo(s) ya descargados según el manifiesto")
+                plan = [item for item in plan if item not in vigentes]
+        
+        registrar = None
+        if usar_manifiesto or usar_base:
+            def registrar(item, sha256=None):
+                if usar_manifiesto:
+                    self.manifiesto.marcar_descargado(clase_id, tarea_id, item['estudiante_id'],
+                                                      item['id'], item['ruta'], sha256)
+                if usar_base:
+                    anotadas.append((item['estudiante_id'], item['id'], item['ruta'],
+                                     os.path.getsize(item['ruta']), sha256))
+        
+        def guardado(item, sha256=None, tipo=None, nombre_servidor=None):
+            """Archivo descargado: al almacén (y sus enlaces) o renombrado con su extensión"""
+            if self.almacen:
+                listos = self.almacen.guardar(item, sha256, tipo, nombre_servidor)
+            else:
+                listo = con_extension(item, extension_descarga(item['formato'], tipo, nombre_servidor))
+                if listo is not item:
+                    os.replace(item['ruta'], listo['ruta'])
+                listos = [dict(listo, sha256=sha256)]
+            if registrar:
+                for listo in listos:
+                    registrar(listo, listo['sha256'])
+            return len(listos)
+        
+        if self.almacen:
+            plan, servidos = self.almacen.servir(plan)
+            if servidos:
+                print(f"🗃 {len(servidos)} archivo(s) enlazados desde el almacén sin descargarlos")
+                total_descargados += len(servidos)
+                if registrar:
+                    for item in servidos:
+                        registrar(item, item['sha256'])
+            # Una descarga por archivo aunque lo tengan varios alumnos
+            plan = self.almacen.agrupar(plan)
+        
+        pendientes = plan
+        
+        if concurrencia > 0 and plan:
+            resultados = self.descargar_en_paralelo(plan, concurrencia)
+            for item, r in zip(plan, resultados):
+                if r['ok']:
+                    total_descargados += guardado(item, r['sha256'], r['tipo'], r['nombre_servidor'])
+            fallidos = {r['ruta'] for r in resultados if not r['ok']}
+            pendientes = [item for item in plan if item['ruta'] in fallidos]
+            if pendientes:
+                print(f"\n🔁 Reintentando {len(pendientes)} archivo(s) desde el navegador...")
+        
+        alumno_actual = None
+        for item in pendientes:
+            if item['alumno'] != alumno_actual:
+                alumno_actual = item['alumno']
+                print(f"⬇ Procesando: {alumno_actual}")
             
-            if not archivos:
-                continue
+            nombre_servidor = self._descargar_navegando(item['url'], item['ruta'])
+            if nombre_servidor:
+                print(f"   ✓ Guardado: {item['nombre']}")
+                total_descargados += guardado(item, nombre_servidor=nombre_servidor)
+            elif self.almacen:
+                self.almacen.descartar(item)
+        
+        if usar_manifiesto:
+            self.manifiesto.volcar()
+        if anotadas:
+            self.base_datos.anotar_descargas(tarea_id, anotadas)
+        print(f"\n✓ PROCESO TERMINADO. {total_descargados} archivos descargados en '{carpeta_destino}'")
+        return total_descargados
+    
+    def descargar_en_zip(self, entregas, ruta_zip, concurrencia=4, compresion='stored', tarea_id=None):
+        """
+        Como descargar_como_pdf, pero escribiendo cada archivo directamente
+        como entrada de un único ZIP (ver salida_zip), con un manifiesto.json
+        de las entregas. Lo que ya está en el almacén se copia de ahí.
+        En la base de datos la ruta de cada descarga es <ruta_zip>/<entrada>.
+        """
+        print(f"\n📦 Descargando en: '{ruta_zip}'...")
+        self._fase('descargas')
+        
+        plan = plan_descargas(entregas, '', self.hosts_exportacion)
+        resultados = {id(item): {} for item in plan}
+        
+        with ArchivoZip(ruta_zip, compresion) as archivo:
+            pendientes = []
+            for item in plan:
+                entrada = self.almacen.buscar(clave_descarga(item)) if self.almacen else None
+                if entrada:
+                    archivo.agregar_archivo(item, self.almacen.ruta_objeto(entrada['sha256'], entrada['ext']))
+                    resultados[id(item)] = {'bytes': entrada['bytes'], 'sha256': entrada['sha256']}
+                else:
+                    pendientes.append(item)
+            if len(pendientes) < len(plan):
+                print(f"🗃 {len(plan) - len(pendientes)} archivo(s) copiados desde el almacén sin descargarlos")
             
-            # Limpiar nombre del alumno para usarlo en el archivo
-            # Quitamos caracteres raros y espacios extra
-            nombre_clean = re.sub(r'[<>:"/\\|?*]', '', nombre_alumno).strip()
+            if concurrencia > 0 and pendientes:
+                for item, r in zip(pendientes, self.descargar_en_paralelo(pendientes, concurrencia,
+                                                                          destino=archivo)):
+                    resultados[id(item)] = r
+                pendientes = [item for item in pendientes if not resultados[id(item)].get('ok')]
+                if pendientes:
+                    print(f"\n🔁 Reintentando {len(pendientes)} archivo(s) desde el navegador...")
             
-            print(f"⬇ Procesando: {nombre_clean}")
+            for item in pendientes:
+                def escribir(ruta, nombre_servidor, item=item):
+                    archivo.agregar_archivo(item, ruta, nombre_servidor)
+                if self._descargar_navegando(item['url'], item['nombre'], escribir=escribir):
+                    print(f"   ✓ Guardado: {item['nombre']}")
             
-            for archivo in archivos:
-                file_id = archivo['id']
-                url_original = archivo['url']
+            archivo.agregar_json(MANIFIESTO_ZIP, manifiesto_zip(
+                entregas, plan, [resultados[id(item)] for item in plan], archivo.entradas))
+        
+        if self.base_datos and tarea_id and archivo.entradas:
+            self.base_datos.anotar_descargas(tarea_id, [
+                (item['estudiante_id'], item['id'], f"{ruta_zip}/{archivo.entradas[clave]}",
+                 resultados[id(item)].get('bytes'), resultados[id(item)].get('sha256'))
+                for item in plan
+                for clave in [(item['estudiante_id'], item['id'])] if clave in archivo.entradas
+            ])
+        
+        print(f"\n✓ PROCESO TERMINADO. {len(archivo.entradas)} archivos "
+              f"({archivo.bytes / 1e6:.1f} MB) en '{ruta_zip}'")
+        return len(archivo.entradas)
+    
+    def descargar_en_paralelo(self, plan, concurrencia=4, timeout=60, destino=None):
+        """
+        Descarga el plan por HTTP con las cookies del contexto, sin usar la pestaña.
+        Devuelve un resultado por archivo (ver MotorDescargas.descargar).
+        `destino` cambia dónde se escribe cada archivo (p. ej. un ArchivoZip).
+        """
+        motor = MotorDescargas(
+            self.browser.cookies(),
+            concurrencia=concurrencia,
+            timeout=timeout,
+            user_agent=self.page.evaluate("navigator.userAgent"),
+            ritmo=self.ritmo,
+            destino=destino,
+        )
+        print(f"🚀 Descargando {len(plan)} archivo(s) con {motor.concurrencia} conexiones en paralelo")
+        
+        def informar(r):
+            if self.trazas:
+                self.trazas.registrar('descarga', time.perf_counter() - r['segundos'], nombre=r['nombre'],
+                                      bytes=r['bytes'], ok=r['ok'], error=r['error'], mb_s=round(r['mb_s'], 2),
+                                      reanudado=r['reanudado'], cortes=r['cortes'])
+            if r['ok']:
+                extra = ''.join([f", reanudado en {r['reanudado'] / 1e6:.1f} MB" if r['reanudado'] else '',
+                                 f", {r['cortes']} corte(s)" if r['cortes'] else ''])
+                print(f"   ✓ Guardado: {r['nombre']} ({r['bytes'] / 1024:.0f} KB, {r['segundos']:.1f}s, "
+                      f"{r['mb_s']:.2f} MB/s{extra})")
+            else:
+                print(f"   ⚠ Error descargando {r['id']}: {r['error']}")
+        
+        return motor.descargar(plan, al_terminar=informar)
+    
+    def _descargar_navegando(self, url_export, ruta_completa, escribir=None):
+        """
+        Descarga un archivo navegando la pestaña y capturando el evento 'download'.
+        Devuelve el nombre que propone el servidor (o False si falla).
+        Con `escribir(ruta, nombre)` se le pasa el archivo que ya ha bajado el
+        navegador en lugar de guardarlo en ruta_completa.
+        """
+        self._fase('descargas')
+        with self._tramo('descarga_navegando', nombre=os.path.basename(ruta_completa)) as tramo:
+            try:
+                # Iniciamos la descarga esperando el evento 'download'
+                with self.page.expect_download(timeout=60000) as download_info:
+                    # Navegamos a la URL de exportación
+                    # Usamos try/except interno por si la navegación da timeout pero la descarga inicia
+                    try:
+                        self.ritmo.adquirir()
+                        self.page.goto(url_export, wait_until="commit")
+                    except:
+                        pass
                 
-                # 1. Determinar URL de exportación a PDF según el tipo
-                url_export = ""
+                download = download_info.value
                 
-                if 'docs.google.com/document' in url_original:
-                    # Es un documento de texto -> Exportar a PDF
-                    url_export = f"https://docs.google.com/document/d/{file_id}/export?format=pdf"
-                    
-                elif 'docs.google.com/presentation' in url_original:
-                    # Es una presentación -> Exportar a PDF
-                    url_export = f"https://docs.google.com/presentation/d/{file_id}/export/pdf"
-                    
-                elif 'docs.google.com/spreadsheets' in url_original:
-                    # Es una hoja de cálculo -> Exportar a PDF
-                    url_export = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=pdf"
-                    
-                else:
-                    # Es un PDF, imagen o archivo binario en Drive -> Descarga directa
-                    url_export = f"https://drive.google.com/uc?export=download&id={file_id}"
-
-                # 2. Definir nombre del archivo final
-                # Formato: NombreAlumno_ID.pdf
-                nombre_archivo_final = f"{nombre_clean}_{file_id[:6]}.pdf"
-                ruta_completa = os.path.join(carpeta_destino, nombre_archivo_final)
+                if escribir:
+                    escribir(download.path(), download.suggested_filename)
+                    tramo['bytes'] = os.path.getsize(download.path())
+                    return download.suggested_filename or ruta_completa
                 
-                # 3. Descargar
-                try:
-                    # Iniciamos la descarga esperando el evento 'download'
-                    with self.page.expect_download(timeout=60000) as download_info:
-                        # Navegamos a la URL de exportación
-                        # Usamos try/except interno por si la navegación da timeout pero la descarga inicia
-                        try:
-                            self.page.goto(url_export, wait_until="commit")
-                        except:
-                            pass
-                    
-                    download = download_info.value
-                    
-                    # Guardar el archivo en la ruta destino
-                    download.save_as(ruta_completa)
-                    
-                    print(f"   ✓ Guardado: {nombre_archivo_final}")
-                    total_descargados += 1
-                    
-                except Exception as e:
-                    print(f"   ⚠ Error descargando {file_id}: {e}")
-                    
-                # Pequeña pausa para no saturar
-                self.esperar(1)
-        
-        print(f"\n✓ PROCESO TERMINADO. {total_descargados} archivos descargados en '{carpeta_destino}'")
-        return total_descargados
+                # Guardar el archivo en la ruta destino
+                download.save_as(ruta_completa)
+                tramo['bytes'] = os.path.getsize(ruta_completa)
+                tramo['ok'] = True
+                return download.suggested_filename or os.path.basename(ruta_completa)
+                
+            except Exception as e:
+                print(f"   ⚠ Error descargando {os.path.basename(ruta_completa)}: {e}")
+                tramo['ok'] = False
+                return False
     
     def guardar_json(self, datos, archivo):
         """Guarda datos en JSON"""
@@ -493,48 +1432,178 @@ class ClassroomEntregasBot:
     
     def cerrar(self):
         """Cierra el navegador"""
+        if self.manifiesto:
+            self.manifiesto.volcar()
         if self.browser:
             self.browser.close()
         if hasattr(self, 'playwright'):
             self.playwright.stop()
+        if self.base_datos:
+            self.base_datos.cerrar()
 
 
 # ============================================================
 # PROGRAMA PRINCIPAL
 # ============================================================
 
-def main():
+def configuracion_entorno():
+    """Lee la configuración del bot de las variables de entorno"""
+    return {
+        'email': os.environ.get('GOOGLE_EMAIL', ''),
+        'password': os.environ.get('GOOGLE_PASSWORD', ''),
+        # Número de pestañas para extraer alumnos en paralelo (1 = secuencial)
+        'concurrencia': int(os.environ.get('CLASSROOM_CONCURRENCIA', '1') or 1),
+        # Contar las llamadas al navegador por vista ('1' = activado)
+        'medir_ipc': os.environ.get('CLASSROOM_MEDIR_IPC', '') == '1',
+        # Leer las entregas de la red en la página de entregas ('1' = activado)
+        'captura_red': os.environ.get('CLASSROOM_CAPTURA_RED', '') == '1',
+        # Bloquear imágenes/fuentes/analítica ('1' = sí, 'medir' = solo contar, '0' = no)
+        'bloquear': os.environ.get('CLASSROOM_BLOQUEAR_RECURSOS', '1'),
+        # Descargas HTTP simultáneas (0 = descargar navegando la pestaña, una a una)
+        'descargas': int(os.environ.get('CLASSROOM_DESCARGAS', '4') or 0),
+        # Manifiesto para reanudar ejecuciones ('' = desactivado)
+        'manifiesto': os.environ.get('CLASSROOM_MANIFIESTO', 'manifiesto_classroom.json'),
+        # Servidor de pruebas en lugar de Google (ver servidor_mock.py; '' = Google)
+        'base_url': os.environ.get('CLASSROOM_BASE_URL', ''),
+        'host_exportacion': os.environ.get('CLASSROOM_HOST_EXPORTACION', ''),
+        # Tramos de tiempo por fase: ruta del Chrome trace a generar ('' = desactivado)
+        'trazas': os.environ.get('CLASSROOM_TRAZAS', ''),
+        # Máximo de peticiones por segundo a Google (el ritmo se adapta por debajo)
+        'ritmo_max': float(os.environ.get('CLASSROOM_RITMO_MAX', '5') or 5),
+        # Almacén de descargas por contenido ('' = desactivado) y horas hasta
+        # volver a descargar un archivo ya guardado ('' = nunca)
+        'almacen': os.environ.get('CLASSROOM_ALMACEN', ALMACEN_POR_DEFECTO),
+        'almacen_horas': float(os.environ.get('CLASSROOM_ALMACEN_HORAS', '') or 0) or None,
+        # Descargar cada tarea en un .zip ('stored', 'deflate'; '' = archivos sueltos)
+        'zip': os.environ.get('CLASSROOM_ZIP', ''),
+        # Cambiar de alumno dentro de la app sin recargar ('0' = goto + reload por alumno)
+        'navegacion_spa': os.environ.get('CLASSROOM_NAVEGACION_SPA', '1') != '0',
+        # Caché de clases/tareas/alumnos ('' = desactivada), horas de vigencia y
+        # si se sirven caducadas para refrescarlas al final ('1')
+        'cache': os.environ.get('CLASSROOM_CACHE', CACHE_POR_DEFECTO),
+        'cache_horas': float(os.environ.get('CLASSROOM_CACHE_HORAS', '6') or 0),
+        'cache_fondo': os.environ.get('CLASSROOM_CACHE_FONDO', '') == '1',
+        # Base SQLite con los resultados de todas las ejecuciones ('' = desactivada)
+        'base_datos': os.environ.get('CLASSROOM_BASE_DATOS', BASE_POR_DEFECTO),
+        # Índice de texto de los archivos descargados ('' = desactivado; ver `bot.py indexar`)
+        'indice': os.environ.get('CLASSROOM_INDICE', INDICE_POR_DEFECTO),
+        # Reciclar cada pestaña tras N navegaciones o con más de N MB de heap JS
+        # (0 = sin límite) y reiniciar el navegador cada N pestañas recicladas (0 = nunca)
+        'reciclar_navegaciones': int(os.environ.get('CLASSROOM_RECICLAR_NAVEGACIONES', '150') or 0),
+        'reciclar_mb': float(os.environ.get('CLASSROOM_RECICLAR_MB', '400') or 0),
+        'reciclar_contexto': int(os.environ.get('CLASSROOM_RECICLAR_CONTEXTO', '0') or 0),
+    }
+
+
+def crear_bot(config, **opciones):
+    """
+    Crea el bot con la configuración dada. Las credenciales que falten se
+    piden más tarde, solo si hace falta el formulario de login.
+    `opciones` se pasan tal cual al constructor (p. ej. user_data_dir).
+    """
+    email = config['email']
+    password = config['password']
+    bloquear = config['bloquear']
+    
+    return ClassroomEntregasBot(
+        email, password,
+        manifiesto=config['manifiesto'] or None,
+        medir_ipc=config['medir_ipc'],
+        captura_red=config['captura_red'],
+        politica_recursos=None if bloquear == '0' else PoliticaRecursos(solo_medir=bloquear == 'medir'),
+        base_url=config['base_url'] or None,
+        hosts_exportacion={'docs': config['host_exportacion'], 'drive': config['host_exportacion']}
+        if config['host_exportacion'] else None,
+        trazas=config['trazas'] or None,
+        ritmo=ControlRitmo(tasa_max=config['ritmo_max']),
+        navegacion_spa=config['navegacion_spa'],
+        cache=CacheListados(config['cache'], ttl=config['cache_horas'], en_segundo_plano=config['cache_fondo'])
+        if config['cache'] else None,
+        almacen=AlmacenContenido(config['almacen'], vigencia=config['almacen_horas'] and config['almacen_horas'] * 3600)
+        if config['almacen'] else None,
+        base_datos=config['base_datos'] or None,
+        ciclo=CicloPaginas(max_navegaciones=config['reciclar_navegaciones'], max_heap_mb=config['reciclar_mb'],
+                           reciclar_contexto=config['reciclar_contexto']),
+        **opciones
+    )
+
+
+def nombre_json_tarea(tarea_nombre):
+    """Nombre del JSON de resultados de una tarea"""
+    # Limpiar nombre de tarea para nombre de archivo
+    tarea_nombre_limpio = re.sub(r'[<>:"/\\|?*]', '_', tarea_nombre)[:30]
+    return f"entregas_{tarea_nombre_limpio}.json"
+
+
+def cabecera_resumen(clase_nombre, clase_id, tarea_nombre, tarea_id):
+    """Datos de la tarea al principio del JSON (las estadísticas las añade escribir_resumen)"""
+    return {
+        'clase': clase_nombre,
+        'clase_id': clase_id,
+        'tarea': tarea_nombre,
+        'tarea_id': tarea_id,
+    }
+
+
+def extraer_y_guardar(bot, clase_nombre, clase_id, tarea_nombre, tarea_id, ruta_json, nuevo=False, **opciones):
+    """
+    Extrae las entregas escribiéndolas en entregas_X.jsonl según se resuelven
+    y al terminar genera entregas_X.json leyendo ese stream.
+    Sin manifiesto, el stream de una ejecución anterior (quizá caída a medias)
+    se conserva y se escribe detrás; `nuevo` lo empieza de cero.
+    Devuelve (resumen sin entregas, lista de entregas).
+    """
+    with EscritorEntregas(ruta_jsonl(ruta_json), continuar=not (nuevo or bot.manifiesto)) as flujo:
+        entregas = bot.extraer_todas_entregas(clase_id, tarea_id, tarea_nombre, flujo=flujo,
+                                              nombre_clase=clase_nombre, **opciones)
+    datos = escribir_resumen(flujo.ruta, ruta_json, cabecera_resumen(clase_nombre, clase_id, tarea_nombre, tarea_id),
+                             orden=[e['estudiante_id'] for e in entregas])
+    return datos, entregas
+
+
+def mostrar_informes(bot):
+    """Informes de fin de ejecución (arranque, esperas, IPC, recursos, ritmo, navegación, pestañas, caché, almacén, trazas)"""
+    bot.informe_arranque()
+    bot.informe_esperas()
+    bot.informe_ipc()
+    bot.informe_recursos()
+    bot.informe_ritmo()
+    bot.informe_spa()
+    bot.informe_ciclo()
+    bot.informe_cache()
+    bot.informe_almacen()
+    bot.informe_trazas()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        # Con argumentos: modo no interactivo (ver cli.py)
+        from cli import main_cli
+        return main_cli(argv)
+    
     print("=" * 60)
     print("   BOT DE ENTREGAS - GOOGLE CLASSROOM (v3)")
     print("   Extrae archivos entregados por alumnos CON NOMBRES")
     print("   Opción de descargar todo en PDF")
     print("=" * 60)
     
-    EMAIL = os.environ.get('GOOGLE_EMAIL', '')
-    PASSWORD = os.environ.get('GOOGLE_PASSWORD', '')
-    
-    if not EMAIL:
-        EMAIL = input("📧 Email de Google: ")
-    if not PASSWORD:
-        PASSWORD = input("🔑 Contraseña: ")
-    
-    bot = ClassroomEntregasBot(EMAIL, PASSWORD)
+    config = configuracion_entorno()
+    bot = crear_bot(config)
     
     try:
         bot.iniciar_navegador(headless=False)
         
-        if not bot.login():
+        if not bot.iniciar_sesion():
             print("✗ Error en login")
             return
         
-        bot.ir_a_classroom()
-        
         # 1. Listar clases
         print("\n" + "=" * 50)
         print("📚 CLASES DISPONIBLES")
         print("=" * 50)
         
-        clases = bot.listar_clases()
+        clases = bot.lista_clases()
         
         if not clases:
             print("✗ No se encontraron clases")
@@ -543,7 +1612,12 @@ def main():
         for i, c in enumerate(clases, 1):
             print(f"  {i}. {c['nombre']}")
         
-        sel = input("\nNúmero de clase: ")
+        sel = input("\nNúmero de clase ('r' = volver a leer la lista): ")
+        if sel.lower() == 'r':
+            clases = bot.lista_clases(refrescar=True)
+            for i, c in enumerate(clases, 1):
+                print(f"  {i}. {c['nombre']}")
+            sel = input("\nNúmero de clase: ")
         clase = clases[int(sel) - 1]
         clase_id = clase['id']
         clase_nombre = clase['nombre']
@@ -553,8 +1627,7 @@ def main():
         print(f"📝 TAREAS EN '{clase_nombre}'")
         print("=" * 50)
         
-        bot.ir_a_trabajo_de_clase(clase_id)
-        tareas = bot.listar_tareas()
+        tareas = bot.lista_tareas(clase_id)
         
         if not tareas:
             print("✗ No se encontraron tareas")
@@ -568,7 +1641,12 @@ def main():
             for i, t in enumerate(tareas, 1):
                 print(f"  {i}. {t['nombre']}")
             
-            sel = input("\nNúmero de tarea: ")
+            sel = input("\nNúmero de tarea ('r' = volver a leer la lista): ")
+            if sel.lower() == 'r':
+                tareas = bot.lista_tareas(clase_id, refrescar=True)
+                for i, t in enumerate(tareas, 1):
+                    print(f"  {i}. {t['nombre']}")
+                sel = input("\nNúmero de tarea: ")
             tarea = tareas[int(sel) - 1]
             tarea_id = tarea['id']
             tarea_nombre = tarea['nombre']
@@ -578,16 +1656,16 @@ def main():
         print("📥 EXTRAYENDO ENTREGAS DE ALUMNOS")
         print("=" * 50)
         
-        entregas = bot.extraer_todas_entregas(clase_id, tarea_id, tarea_nombre)
+        # Cada alumno se guarda en entregas_X.jsonl al momento; el JSON se genera al final
+        datos_json, entregas = extraer_y_guardar(bot, clase_nombre, clase_id, tarea_nombre, tarea_id,
+                                                 nombre_json_tarea(tarea_nombre),
+                                                 concurrencia=config['concurrencia'])
         
         # Estadísticas
-        total_alumnos = len(entregas)
-        alumnos_con_archivos = sum(1 for e in entregas if e['archivos'])
-        total_archivos = sum(len(e['archivos']) for e in entregas)
         
-        print(f"\n✓ Procesados {total_alumnos} estudiantes")
-        print(f"✓ {alumnos_con_archivos} con archivos entregados")
-        print(f"✓ Total de archivos: {total_archivos}")
+        print(f"\n✓ Procesados {datos_json['total_alumnos']} estudiantes")
+        print(f"✓ {datos_json['alumnos_con_archivos']} con archivos entregados")
+        print(f"✓ Total de archivos: {datos_json['total_archivos']}")
         
         # Mostrar resumen
         print("\n📋 RESUMEN DE ENTREGAS:")
@@ -598,23 +1676,6 @@ def main():
             estado = "✅" if n_archivos > 0 else "❌"
             print(f"  {estado} {nombre}: {n_archivos} archivo(s)")
         
-        # Guardar JSON
-        # Limpiar nombre de tarea para nombre de archivo
-        tarea_nombre_limpio = re.sub(r'[<>:"/\\|?*]', '_', tarea_nombre)[:30]
-        nombre_archivo = f"entregas_{tarea_nombre_limpio}.json"
-        
-        datos_json = {
-            'clase': clase_nombre,
-            'clase_id': clase_id,
-            'tarea': tarea_nombre,
-            'tarea_id': tarea_id,
-            'total_alumnos': total_alumnos,
-            'alumnos_con_archivos': alumnos_con_archivos,
-            'total_archivos': total_archivos,
-            'entregas': entregas
-        }
-        bot.guardar_json(datos_json, nombre_archivo)
-        
        # 4. Preguntar si descargar (o hacerlo directo)
         print("\n" + "=" * 50)
         descargar = input("¿Descargar archivos como PDF? (s/n): ").lower()
@@ -622,7 +1683,14 @@ def main():
         if descargar == 's':
             # FORZAMOS EL NOMBRE DE LA CARPETA QUE PEDISTE
             carpeta = "descargas_Tarea_manual"
-            bot.descargar_como_pdf(entregas, carpeta)
+            if config['zip']:
+                bot.descargar_en_zip(entregas, carpeta + ".zip", concurrencia=config['descargas'],
+                                     compresion=config['zip'], tarea_id=tarea_id)
+            else:
+                bot.descargar_como_pdf(entregas, carpeta, concurrencia=config['descargas'],
+                                       clase_id=clase_id, tarea_id=tarea_id)
+        
+        bot.refrescar_listados()
         
     except KeyboardInterrupt:
         print("\n\n⚠ Interrumpido")
@@ -631,9 +1699,10 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
+        mostrar_informes(bot)
         input("\nPulsa Enter para cerrar...")
         bot.cerrar()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Caché persistente de los listados que casi nunca cambian: clases de la
+cuenta, tareas de cada clase y alumnos de cada tarea. Con ella el menú y el
+modo lote arrancan sin cargar esas páginas.
+
+Claves: (cuenta, 'clases'), (cuenta, 'tareas', clase_id) y
+(cuenta, 'alumnos', clase_id, tarea_id). Cada entrada caduca a las `ttl`
+horas; si hay más de `max_entradas` se descartan las menos usadas.
+
+Con `en_segundo_plano`, una entrada caducada se devuelve igualmente y su
+clave queda pendiente de refrescar: la API síncrona de Playwright no admite
+otro hilo, así que "en segundo plano" es al final de la ejecución
+(ClassroomEntregasBot.refrescar_listados), cuando nadie espera el resultado.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+
+CACHE_POR_DEFECTO = "cache_classroom.json"
+
+
+def _texto_clave(clave):
+    return '|'.join(clave)
+
+
+def edad_legible(segundos):
+    """'hace 5 min', 'hace 3 h'..."""
+    if segundos < 90:
+        return f"hace {segundos:.0f} s"
+    if segundos < 90 * 60:
+        return f"hace {segundos / 60:.0f} min"
+    if segundos < 36 * 3600:
+        return f"hace {segundos / 3600:.0f} h"
+    return f"hace {segundos / 86400:.0f} días"
+
+
+class CacheListados:
+    """Entradas {'valor', 'guardado', 'usado'} en un JSON escrito de forma atómica"""
+
+    def __init__(self, ruta=CACHE_POR_DEFECTO, ttl=6, max_entradas=500, en_segundo_plano=False):
+        self.ruta = ruta
+        self.ttl = ttl * 3600 if ttl else None
+        self.max_entradas = max_entradas
+        self.en_segundo_plano = en_segundo_plano
+        # Claves caducadas servidas igualmente: clave -> función que las recarga
+        self.pendientes = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.RLock()
+        self.entradas = {}
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, encoding='utf-8') as f:
+                    self.entradas = json.load(f).get('entradas', {})
+            except (OSError, ValueError):
+                print(f"⚠ Caché ilegible, se empieza de cero: {ruta}")
+
+    # ---------------- Lectura ----------------
+
+    def leer(self, clave, caducadas=False):
+        """(valor, edad en segundos) o None si no está (o está caducada)"""
+        with self._lock:
+            entrada = self.entradas.get(_texto_clave(clave))
+            if not entrada:
+                return None
+            edad = time.time() - entrada['guardado']
+            if self.ttl is not None and edad > self.ttl and not caducadas:
+                return None
+            entrada['usado'] = time.time()
+            return entrada['valor'], edad
+
+    def obtener(self, clave, cargar, refrescar=False):
+        """
+        Devuelve (valor, edad): de la caché si está vigente o, si no, llamando
+        a cargar() y guardando el resultado (edad 0). Los listados vacíos no se
+        guardan: suelen ser una página que no cargó.
+        """
+        if not refrescar:
+            encontrado = self.leer(clave, caducadas=self.en_segundo_plano)
+            if encontrado:
+                self.aciertos += 1
+                if self.ttl is not None and encontrado[1] > self.ttl:
+                    self.pendientes[_texto_clave(clave)] = (clave, cargar)
+                return encontrado
+        self.fallos += 1
+        valor = cargar()
+        if valor:
+            self.guardar_valor(clave, valor)
+        return valor, 0.0
+
+    # ---------------- Escritura ----------------
+
+    def guardar_valor(self, clave, valor):
+        with self._lock:
+            ahora = time.time()
+            self.entradas[_texto_clave(clave)] = {'valor': valor, 'guardado': ahora, 'usado': ahora}
+            self.pendientes.pop(_texto_clave(clave), None)
+            self._recortar()
+            self.guardar()
+
+    def _recortar(self):
+        """Descarta las entradas menos usadas por encima de max_entradas"""
+        sobran = len(self.entradas) - self.max_entradas
+        if sobran > 0:
+            for texto, _ in sorted(self.entradas.items(), key=lambda e: e[1]['usado'])[:sobran]:
+                del self.entradas[texto]
+
+    def invalidar(self, *prefijo):
+        """
+        Borra las entradas cuya clave empieza por `prefijo` (todas si no se da).
+        Ej.: invalidar(cuenta, 'tareas', clase_id). Devuelve cuántas se borraron.
+        """
+        texto = _texto_clave(prefijo)
+        with self._lock:
+            borrar = [t for t in self.entradas if not prefijo or t == texto or t.startswith(texto + '|')]
+            for t in borrar:
+                del self.entradas[t]
+                self.pendientes.pop(t, None)
+            if borrar:
+                self.guardar()
+        return len(borrar)
+
+    def invalidar_clase(self, clase_id):
+        """Borra las tareas y alumnos de una clase en todas las cuentas"""
+        with self._lock:
+            borrar = [t for t in self.entradas if t.split('|')[1:3] in (['tareas', clase_id], ['alumnos', clase_id])]
+            for t in borrar:
+                del self.entradas[t]
+                self.pendientes.pop(t, None)
+            if borrar:
+                self.guardar()
+        return len(borrar)
+
+    def mostrar(self):
+        """Lista las entradas con su edad y tamaño"""
+        ahora = time.time()
+        for texto, e in sorted(self.entradas.items()):
+            caducada = " (caducada)" if self.ttl is not None and ahora - e['guardado'] > self.ttl else ""
+            print(f"  {texto:<70} {len(e['valor']):>5}  {edad_legible(ahora - e['guardado'])}{caducada}")
+        print(f"  {len(self.entradas)} entrada(s) en {self.ruta}")
+
+    def guardar(self):
+        """Escribe la caché de forma atómica"""
+        with self._lock:
+            carpeta = os.path.dirname(os.path.abspath(self.ruta))
+            fd, temporal = tempfile.mkstemp(prefix='.cache_', suffix='.tmp', dir=carpeta)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'entradas': self.entradas}, f, ensure_ascii=False)
+                os.replace(temporal, self.ruta)
+            except BaseException:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                raise
+
+    # ---------------- Refresco diferido ----------------
+
+    def refrescar_pendientes(self):
+        """Recarga las entradas caducadas que se sirvieron; devuelve cuántas"""
+        hechas = 0
+        for texto, (clave, cargar) in list(self.pendientes.items()):
+            try:
+                valor = cargar()
+            except Exception as e:
+                print(f"⚠ No se pudo refrescar {texto}: {e}")
+                continue
+            if valor:
+                self.guardar_valor(clave, valor)
+                hechas += 1
+            self.pendientes.pop(texto, None)
+        return hechas
+
+    def informe(self):
+        if not (self.aciertos or self.fallos):
+            return
+        print("\n🗄 CACHÉ DE LISTADOS:")
+        print("-" * 50)
+        print(f"  {self.aciertos} listado(s) desde la caché, {self.fallos} cargado(s) de Classroom")
@@ -0,0 +1,208 @@
+"""
+Modo captura de red: lee los datos de entregas que Classroom ya descarga por
+XHR al abrir la página de entregas de una tarea, en lugar de visitar la vista
+de calificación de cada alumno.
+
+Las respuestas de Google vienen con prefijo anti-XSSI ()]}'), a veces en
+formato batchexecute (bloques con longitud + ["wrb.fr", rpc, "<json>"]) o
+embebidas en el HTML como AF_initDataCallback({... data: [...] ...}).
+Aquí se decodifica todo eso y se buscan, dentro de cada registro, el ID de
+un alumno de la lista y las URLs de Drive/Docs que cuelgan de él.
+"""
+
+import re
+import json
+
+# Respuestas que merece la pena guardar (el resto: imágenes, fuentes, etc.)
+TIPOS_CAPTURADOS = ('xhr', 'fetch', 'document')
+
+RE_URL_ARCHIVO = re.compile(
+    r'https://(?:docs|drive)\.google\.com/[^\s"\'<>\\]*?(?:/d/|[?&]id=)[A-Za-z0-9_-]{10,}[^\s"\'<>\\]*'
+)
+RE_ID_ARCHIVO = re.compile(r'(?:/d/|[?&]id=)([A-Za-z0-9_-]{10,})')
+PREFIJO_XSSI = ")]}'"
+
+
+class CapturaRespuestas:
+    """
+    Escucha el evento 'response' del contexto mientras está activa.
+    Solo guarda referencias a las respuestas; los cuerpos se leen al parar,
+    fuera del manejador del evento.
+    """
+
+    def __init__(self, contexto, filtro_url=None):
+        self.contexto = contexto
+        self.filtro_url = filtro_url
+        self.respuestas = []
+        self.capturas = []   # [{'url', 'status', 'content_type', 'body'}]
+
+    def _al_responder(self, respuesta):
+        try:
+            if respuesta.request.resource_type not in TIPOS_CAPTURADOS:
+                return
+            if self.filtro_url and self.filtro_url not in respuesta.url:
+                return
+            self.respuestas.append(respuesta)
+        except Exception:
+            pass
+
+    def iniciar(self):
+        self.contexto.on('response', self._al_responder)
+        return self
+
+    def parar(self):
+        """Deja de escuchar y lee los cuerpos capturados"""
+        try:
+            self.contexto.remove_listener('response', self._al_responder)
+        except Exception:
+            pass
+        for respuesta in self.respuestas:
+            try:
+                self.capturas.append({
+                    'url': respuesta.url,
+                    'status': respuesta.status,
+                    'content_type': respuesta.headers.get('content-type', ''),
+                    'body': respuesta.text(),
+                })
+            except Exception:
+                # Redirecciones y respuestas sin cuerpo
+                continue
+        self.respuestas = []
+        return self.capturas
+
+    def guardar_grabacion(self, ruta):
+        """Guarda lo capturado para reproducirlo con servidor_mock.py"""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.capturas, f, ensure_ascii=False, indent=2)
+        print(f"✓ Grabación de red guardada en {ruta}")
+
+
+# ---------------- Decodificación de payloads ----------------
+
+def _json_desde(texto, inicio):
+    """Decodifica un valor JSON que empieza en `inicio`; None si no es JSON"""
+    try:
+        valor, _ = json.JSONDecoder().raw_decode(texto, inicio)
+        return valor
+    except ValueError:
+        return None
+
+
+def decodificar_payload(texto):
+    """
+    Devuelve la lista de estructuras JSON contenidas en una respuesta:
+    JSON normal, con prefijo XSSI, batchexecute o AF_initDataCallback en HTML.
+    """
+    texto = texto.lstrip()
+    if texto.startswith(PREFIJO_XSSI):
+        texto = texto[len(PREFIJO_XSSI):]
+
+    estructuras = []
+    valor = _json_desde(texto, 0) if texto[:1] in '[{' else None
+    if valor is not None:
+        estructuras.append(valor)
+    else:
+        # batchexecute: líneas con la longitud y después un array JSON
+        for m in re.finditer(r'^\s*\d+\s*\n(?=\[)', texto, re.MULTILINE):
+            valor = _json_desde(texto, m.end())
+            if valor is not None:
+                estructuras.append(valor)
+        # HTML: AF_initDataCallback({key: 'ds:1', ..., data: [...], ...})
+        for m in re.finditer(r'AF_initDataCallback\(\{[^\[]*?data:\s*', texto):
+            valor = _json_desde(texto, m.end())
+            if valor is not None:
+                estructuras.append(valor)
+
+    # Dentro de batchexecute el payload real es un string con JSON
+    resultado = []
+    for estructura in estructuras:
+        resultado.append(estructura)
+        resultado.extend(_json_anidado(estructura))
+    return resultado
+
+
+def _json_anidado(nodo):
+    """Busca strings que son a su vez JSON (["wrb.fr", "rpc", "[...]"])"""
+    encontrados = []
+    pila = [nodo]
+    while pila:
+        actual = pila.pop()
+        if isinstance(actual, list):
+            pila.extend(actual)
+        elif isinstance(actual, dict):
+            pila.extend(actual.values())
+        elif isinstance(actual, str) and len(actual) > 2 and actual[0] in '[{' and actual[-1] in ']}':
+            valor = _json_desde(actual, 0)
+            if valor is not None:
+                encontrados.append(valor)
+                encontrados.extend(_json_anidado(valor))
+    return encontrados
+
+
+def _agrupar(nodo, ids_alumnos, asignaciones):
+    """
+    Recorrido en post-orden. Devuelve (ids de alumnos, urls) del subárbol.
+    Cuando un nodo mezcla varios alumnos, cada hijo con UN solo alumno es su
+    registro: sus URLs se asignan a ese alumno.
+    """
+    if isinstance(nodo, str):
+        ids = {nodo} if nodo in ids_alumnos else set()
+        urls = RE_URL_ARCHIVO.findall(nodo) if 'google.com' in nodo else []
+        return ids, urls
+    if isinstance(nodo, dict):
+        hijos = list(nodo.values())
+    elif isinstance(nodo, list):
+        hijos = nodo
+    else:
+        return set(), []
+
+    resultados = [_agrupar(h, ids_alumnos, asignaciones) for h in hijos]
+    ids = set()
+    urls = []
+    for ids_hijo, urls_hijo in resultados:
+        ids |= ids_hijo
+        urls.extend(urls_hijo)
+
+    if len(ids) > 1:
+        for ids_hijo, urls_hijo in resultados:
+            if len(ids_hijo) == 1:
+                asignaciones.setdefault(next(iter(ids_hijo)), []).extend(urls_hijo)
+    return ids, urls
+
+
+def entregas_desde_capturas(capturas, estudiantes):
+    """
+    Reconstruye las entregas a partir de las respuestas capturadas.
+    Devuelve {estudiante_id: [urls de archivos]} solo con los alumnos resueltos.
+
+    Un alumno cuenta como resuelto si aparece como registro propio en un
+    payload en el que al menos un alumno tiene archivos (es decir, un payload
+    de entregas). Los alumnos sin resolver se visitan como siempre.
+    """
+    ids_alumnos = {e['id'] for e in estudiantes}
+    resueltos = {}
+
+    for captura in capturas:
+        cuerpo = captura.get('body') or ''
+        if not any(i in cuerpo for i in ids_alumnos):
+            continue
+        for estructura in decodificar_payload(cuerpo):
+            asignaciones = {}
+            ids, urls = _agrupar(estructura, ids_alumnos, asignaciones)
+            if len(ids) == 1 and urls:
+                asignaciones.setdefault(next(iter(ids)), []).extend(urls)
+            if not any(asignaciones.values()):
+                continue
+            for est_id, urls_est in asignaciones.items():
+                resueltos.setdefault(est_id, []).extend(urls_est)
+
+    # Quitar duplicados manteniendo el orden
+    return {est_id: list(dict.fromkeys(normalizar_url(u) for u in urls)) for est_id, urls in resueltos.items()}
+
+
+def normalizar_url(url):
+    """Pasa las URLs de Drive con ?id= al formato /d/ID que usa el resto del bot"""
+    if '/d/' in url:
+        return url
+    m = RE_ID_ARCHIVO.search(url)
+    return f"https://drive.google.com/file/d/{m.group(1)}/view" if m else url
@@ -0,0 +1,152 @@
+"""
+Ciclo de vida de las pestañas en ejecuciones largas.
+
+Con la misma pestaña para cientos de alumnos, la memoria del renderer de
+Chromium no para de crecer (la app de Classroom no suelta lo que va
+cargando) hasta que la máquina tira de swap o la pestaña se cae.
+
+CicloPaginas cuenta las navegaciones de cada pestaña (goto, reload y
+cambios de alumno dentro de la app) y, cuando lleva `cada` navegaciones o
+más desde la última muestra, lee la memoria JS del renderer por CDP (Performance.getMetrics). Cuando una
+pestaña pasa de `max_navegaciones` o de `max_heap_mb`, el bot la cierra y
+abre otra en el mismo contexto. Cada `reciclar_contexto` pestañas
+recicladas (0 = nunca) se reinicia el navegador entero: el perfil
+persistente conserva la sesión.
+
+Además recuerda las pestañas que emitieron 'crash', para que el bot las
+sustituya y repita el alumno en curso.
+"""
+
+# Mensajes de Playwright cuando la pestaña (o el navegador) ya no existe
+ERRORES_CAIDA = ('target crashed', 'page crashed', 'has been closed', 'target closed', 'browser closed')
+
+
+def _real(page):
+    """La Page de Playwright aunque venga envuelta por ContadorIPC (ObjetoMedido.sin_envolver)"""
+    return getattr(page, 'sin_envolver', page)
+
+
+def pagina_caida(page, error=None):
+    """True si el error (o el estado de la pestaña) indica que la pestaña ya no sirve"""
+    if error is not None and any(e in str(error).lower() for e in ERRORES_CAIDA):
+        return True
+    try:
+        return _real(page).is_closed()
+    except Exception:
+        return True
+
+
+class CicloPaginas:
+    """Navegaciones y memoria por pestaña, y cuándo toca reciclarla"""
+
+    def __init__(self, max_navegaciones=150, max_heap_mb=400, cada=10, reciclar_contexto=0, reintentos=2):
+        self.max_navegaciones = max_navegaciones
+        self.max_heap_mb = max_heap_mb
+        self.cada = max(1, cada)
+        self.reciclar_contexto = reciclar_contexto
+        # Veces que se repite un alumno cuya pestaña se cae
+        self.reintentos = reintentos
+        # id(página) -> navegaciones / navegaciones en la última muestra de heap / sesión CDP
+        self.navegaciones = {}
+        self._ultima_muestra = {}
+        self._cdp = {}
+        self._caidas = set()
+        self._desde_reinicio = 0
+        self.estadisticas = {'navegaciones': 0, 'memoria': 0, 'caida': 0, 'contextos': 0,
+                             'muestras': 0, 'heap_pico': 0.0, 'heap_ultimo': 0.0}
+
+    # ---------------- Registro ----------------
+
+    def vigilar(self, page):
+        """Empieza a seguir una pestaña nueva (escucha su evento 'crash')"""
+        real = _real(page)
+        self.navegaciones[id(real)] = 0
+        self._ultima_muestra[id(real)] = 0
+        try:
+            real.on('crash', lambda *_: self._caidas.add(id(real)))
+        except Exception:
+            pass
+
+    def olvidar(self, page):
+        real = _real(page)
+        self.navegaciones.pop(id(real), None)
+        self._ultima_muestra.pop(id(real), None)
+        self._caidas.discard(id(real))
+        sesion = self._cdp.pop(id(real), None)
+        if sesion:
+            try:
+                sesion.detach()
+            except Exception:
+                pass
+
+    def anotar(self, page):
+        """Una navegación más (goto, reload o cambio de alumno) en la pestaña"""
+        clave = id(_real(page))
+        self.navegaciones[clave] = self.navegaciones.get(clave, 0) + 1
+
+    # ---------------- Decisión ----------------
+
+    def heap_mb(self, contexto, page):
+        """Memoria JS en uso del renderer de la pestaña, en MB (CDP)"""
+        real = _real(page)
+        sesion = self._cdp.get(id(real))
+        if sesion is None:
+            sesion = contexto.new_cdp_session(real)
+            sesion.send('Performance.enable')
+            self._cdp[id(real)] = sesion
+        metricas = {m['name']: m['value'] for m in sesion.send('Performance.getMetrics')['metrics']}
+        mb = metricas.get('JSHeapUsedSize', 0) / 1e6
+        est = self.estadisticas
+        est['muestras'] += 1
+        est['heap_ultimo'] = mb
+        est['heap_pico'] = max(est['heap_pico'], mb)
+        return mb
+
+    def motivo(self, contexto, page):
+        """Por qué hay que reciclar la pestaña ('caida', 'navegaciones', 'memoria') o None"""
+        clave = id(_real(page))
+        if clave in self._caidas or pagina_caida(page):
+            return 'caida'
+        n = self.navegaciones.get(clave, 0)
+        if self.max_navegaciones and n >= self.max_navegaciones:
+            return 'navegaciones'
+        # El contador puede saltar varios múltiplos de `cada` entre dos consultas
+        # (varias navegaciones por alumno): se compara con la última muestra
+        if self.max_heap_mb and n - self._ultima_muestra.get(clave, 0) >= self.cada:
+            self._ultima_muestra[clave] = n
+            try:
+                if self.heap_mb(contexto, page) >= self.max_heap_mb:
+                    return 'memoria'
+            except Exception:
+                # Sin CDP (otro navegador) o pestaña a medio navegar: se mira la próxima vez
+                pass
+        return None
+
+    def reciclada(self, motivo):
+        """Cuenta una pestaña reciclada; True si con ella toca reiniciar el navegador"""
+        self.estadisticas[motivo] += 1
+        self._desde_reinicio += 1
+        return bool(self.reciclar_contexto) and self._desde_reinicio >= self.reciclar_contexto
+
+    def reiniciado(self):
+        self.estadisticas['contextos'] += 1
+        self._desde_reinicio = 0
+        self.navegaciones.clear()
+        self._ultima_muestra.clear()
+        self._cdp.clear()
+        self._caidas.clear()
+
+    def informe(self):
+        est = self.estadisticas
+        recicladas = est['navegaciones'] + est['memoria']
+        if not (recicladas or est['caida'] or est['muestras']):
+            return
+        print("\n♻ CICLO DE PESTAÑAS:")
+        print("-" * 50)
+        print(f"  {recicladas} pestaña(s) recicladas ({est['navegaciones']} por navegaciones, "
+              f"{est['memoria']} por memoria), {est['contextos']} reinicio(s) del navegador")
+        if est['caida']:
+            print(f"  {est['caida']} pestaña(s) caídas sustituidas repitiendo el alumno")
+        if est['muestras']:
+            print(f"  Heap JS: pico {est['heap_pico']:.0f} MB, último {est['heap_ultimo']:.0f} MB "
+                  f"({est['muestras']} muestras)")
@@ -0,0 +1,386 @@
+"""
+Línea de comandos no interactiva del bot.
+Sin argumentos, `python bot.py` sigue mostrando el menú interactivo.
+
+Ejemplos:
+    python bot.py lote --clases all --tareas all
+    python bot.py lote --clases "4º ESO*,abc123" --tareas "*práctica*" --sin-descargas
+    python bot.py lote --procesos 4 --trozo 50 --headless
+    python bot.py lote --clases "4º ESO*" --zip
+    python bot.py vigilar --clases "4º ESO*" --tareas "*práctica*" --intervalo 600 --headless
+
+Comandos sin navegador sobre los entregas_*.json guardados:
+    python bot.py resumen archivo_classroom/
+    python bot.py csv entregas_*.json --formato cuaderno -o cuaderno.csv
+    python bot.py faltan archivo_classroom/
+    python bot.py plan entregas_Tarea.json --carpeta descargas
+
+Base de datos con los resultados de todas las ejecuciones (classroom.sqlite3):
+    python bot.py consulta faltan --clase ID --desde 2024-09-01
+    python bot.py consulta alumno "garcía" -o alumno.csv
+    python bot.py consulta tareas
+    python bot.py consulta archivo 1AbC...
+    python bot.py consulta sql "SELECT COUNT(*) FROM archivos"
+    python bot.py importar archivo_classroom/
+
+Índice de texto de los archivos descargados (indice_classroom.sqlite3):
+    python bot.py indexar archivo_classroom/
+    python bot.py indexar entregas_Tarea.json --carpeta descargas_Tarea_manual
+    python bot.py buscar '"fotosíntesis" AND clorofila' --tarea práctica
+    python bot.py buscar 'NEAR(energía renovable, 5)' --alumno garcía -o coincidencias.csv
+
+Caché de clases/tareas/alumnos:
+    python bot.py cache
+    python bot.py cache --borrar [--clase ID]
+"""
+
+import argparse
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="bot.py", description="Bot de entregas de Google Classroom")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("lote", help="archiva varias clases/tareas en una sola sesión")
+    p.add_argument("--clases", default="all", help="all, IDs o patrones de nombre separados por comas")
+    p.add_argument("--tareas", default="all", help="all, IDs o patrones de nombre separados por comas")
+    p.add_argument("--carpeta", default="archivo_classroom", help="carpeta base (se crea <clase>/<tarea>)")
+    p.add_argument("--concurrencia", type=int, default=None, help="pestañas en paralelo por tarea")
+    p.add_argument("--descargas", type=int, default=None, help="descargas HTTP en paralelo (0 = navegador)")
+    p.add_argument("--sin-descargas", action="store_true", help="solo extraer y guardar el JSON")
+    p.add_argument("--zip", nargs="?", const="stored", default=None, choices=["stored", "deflate"],
+                   help="descargar cada tarea en un <tarea>.zip en lugar de archivos sueltos")
+    p.add_argument("--refrescar-alumnos", action="store_true",
+                   help="leer de la página (sin caché) la lista de alumnos de cada tarea")
+    p.add_argument("--refrescar-listados", action="store_true",
+                   help="no usar la caché de clases/tareas/alumnos (y actualizarla)")
+    p.add_argument("--rehacer", action="store_true",
+                   help="volver a extraer y descargar todo aunque esté en el manifiesto (reentregas)")
+    p.add_argument("--headless", action="store_true", help="navegador sin ventana")
+    p.add_argument("--procesos", type=int, default=1,
+                   help="procesos trabajadores, cada uno con su navegador (1 = todo en este proceso)")
+    p.add_argument("--trozo", type=int, default=0,
+                   help="con --procesos, repartir cada tarea en rangos de N alumnos (0 = tareas enteras)")
+    p.add_argument("--trazas", default=None, help="guardar la línea de tiempo (Chrome trace) en este JSON")
+    p.add_argument("--indexar", action="store_true", help="al terminar, indexar el texto de lo descargado")
+    p.set_defaults(funcion=comando_lote)
+
+    p = sub.add_parser("vigilar", help="revisa las tareas cada cierto tiempo y archiva solo lo nuevo")
+    p.add_argument("--clases", default="all", help="all, IDs o patrones de nombre separados por comas")
+    p.add_argument("--tareas", default="all", help="all, IDs o patrones de nombre separados por comas")
+    p.add_argument("--carpeta", default="archivo_classroom", help="carpeta base (se crea <clase>/<tarea>)")
+    p.add_argument("--intervalo", type=float, default=300, help="segundos entre rondas (por defecto 300)")
+    p.add_argument("--jitter", type=float, default=0.2,
+                   help="variación aleatoria del intervalo, en fracción (0.2 = ±20%%)")
+    p.add_argument("--rondas", type=int, default=0, help="parar tras N rondas (0 = hasta Ctrl-C)")
+    p.add_argument("--estado", default=None, help="JSON con el último estado visto de cada tarea")
+    p.add_argument("--concurrencia", type=int, default=None, help="pestañas en paralelo por tarea")
+    p.add_argument("--descargas", type=int, default=None, help="descargas HTTP en paralelo (0 = navegador)")
+    p.add_argument("--sin-descargas", action="store_true", help="solo extraer y guardar el JSON")
+    p.add_argument("--headless", action="store_true", help="navegador sin ventana")
+    p.set_defaults(funcion=comando_vigilar)
+
+    # Comandos sin navegador
+    def parser_offline(nombre, ayuda, funcion):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("json", nargs="+", help="entregas_*.json, comodines o carpetas")
+        p.set_defaults(funcion=funcion)
+        return p
+
+    parser_offline("resumen", "estadísticas de los JSON guardados", comando_resumen)
+    p = parser_offline("csv", "exporta a CSV (por filas o como cuaderno de notas)", comando_csv)
+    p.add_argument("--formato", choices=["filas", "cuaderno"], default="filas")
+    p.add_argument("-o", "--salida", default="-", help="archivo CSV (por defecto, la pantalla)")
+    parser_offline("faltan", "alumnos sin entregar", comando_faltan)
+    p = parser_offline("plan", "plan de descargas sin abrir el navegador", comando_plan)
+    p.add_argument("--carpeta", default="archivo_classroom", help="carpeta base de las descargas")
+    p.add_argument("-o", "--salida", default=None, help="guardar el plan en JSON")
+
+    parser_offline("importar", "carga los JSON guardados en la base de datos", comando_importar)
+    p = sub.add_parser("consulta", help="consultas sobre la base de datos de entregas")
+    p.add_argument("que", choices=["faltan", "alumno", "tareas", "archivo", "sql"])
+    p.add_argument("valor", nargs="?", default=None,
+                   help="nombre o ID del alumno, ID del archivo o la consulta SQL")
+    p.add_argument("--clase", default=None, help="solo esta clase (ID)")
+    p.add_argument("--desde", default=None, help="solo entregas extraídas desde esta fecha (AAAA-MM-DD)")
+    p.add_argument("-o", "--salida", default=None, help="exportar el resultado a CSV")
+    p.set_defaults(funcion=comando_consulta)
+
+    p = parser_offline("indexar", "indexa el texto de los archivos descargados (solo nuevos o cambiados)",
+                       comando_indexar)
+    p.add_argument("--carpeta", default=None,
+                   help="carpeta de las descargas (por defecto, la de cada JSON, como en el modo lote)")
+    p.add_argument("--procesos", type=int, default=None, help="procesos extrayendo texto (por defecto, uno por CPU)")
+    p = sub.add_parser("buscar", help="busca en el texto de los archivos indexados")
+    p.add_argument("consulta", help="palabras, \"frase exacta\", prefijo*, AND/OR/NOT, NEAR(a b, 5)")
+    p.add_argument("--clase", default=None, help="ID o parte del nombre de la clase")
+    p.add_argument("--tarea", default=None, help="ID o parte del nombre de la tarea")
+    p.add_argument("--alumno", default=None, help="ID o parte del nombre del alumno")
+    p.add_argument("-n", "--limite", type=int, default=50, help="máximo de resultados (por defecto 50)")
+    p.add_argument("-o", "--salida", default=None, help="exportar el resultado a CSV")
+    p.set_defaults(funcion=comando_buscar)
+
+    p = sub.add_parser("cache", help="muestra o borra la caché de clases, tareas y alumnos")
+    p.add_argument("--borrar", action="store_true", help="borrar la caché (o solo la de --clase)")
+    p.add_argument("--clase", default=None, help="ID de la clase cuyas tareas y alumnos se borran")
+    p.set_defaults(funcion=comando_cache)
+
+    return parser
+
+
+def _tareas(args):
+    from offline import cargar_tareas
+    tareas = cargar_tareas(args.json)
+    if not tareas:
+        print("✗ No se encontraron archivos entregas_*.json")
+    return tareas
+
+
+def comando_resumen(args):
+    from offline import resumen
+    tareas = _tareas(args)
+    if tareas:
+        resumen(tareas)
+    return 0 if tareas else 1
+
+
+def comando_csv(args):
+    from offline import exportar_csv
+    tareas = _tareas(args)
+    if tareas:
+        exportar_csv(tareas, args.salida, args.formato)
+    return 0 if tareas else 1
+
+
+def comando_faltan(args):
+    from offline import faltan
+    tareas = _tareas(args)
+    if tareas:
+        faltan(tareas)
+    return 0 if tareas else 1
+
+
+def comando_plan(args):
+    from offline import plan
+    tareas = _tareas(args)
+    if tareas:
+        plan(tareas, args.carpeta, args.salida)
+    return 0 if tareas else 1
+
+
+def _ruta_base():
+    from bot import configuracion_entorno
+    ruta = configuracion_entorno()['base_datos']
+    if not ruta:
+        print("✗ La base de datos está desactivada (CLASSROOM_BASE_DATOS vacío)")
+    return ruta
+
+
+def comando_importar(args):
+    from base_datos import BaseEntregas
+    ruta = _ruta_base()
+    tareas = _tareas(args) if ruta else None
+    if not tareas:
+        return 1
+    base = BaseEntregas(ruta)
+    try:
+        n = base.importar(tareas)
+    finally:
+        base.cerrar()
+    print(f"✓ {n} entrega(s) de {len(tareas)} tarea(s) importadas en {ruta}")
+    return 0
+
+
+def comando_consulta(args):
+    import os
+    from base_datos import BaseEntregas, CONSULTAS, mostrar_tabla, exportar_csv
+    ruta = _ruta_base()
+    if not ruta:
+        return 1
+    if not os.path.exists(ruta):
+        print(f"✗ No existe {ruta}: se crea al extraer entregas (o con `bot.py importar`)")
+        return 1
+    if args.que in ("alumno", "archivo", "sql") and not args.valor:
+        print(f"✗ Falta el valor para `consulta {args.que}`")
+        return 1
+    sql = args.valor if args.que == "sql" else CONSULTAS[args.que]
+    parametros = {} if args.que == "sql" else {'clase': args.clase, 'desde': args.desde,
+                                               'alumno': args.valor, 'archivo': args.valor}
+    base = BaseEntregas(ruta, solo_lectura=True)
+    try:
+        columnas, filas, segundos = base.consultar(sql, parametros)
+    except Exception as e:
+        print(f"✗ Error en la consulta: {e}")
+        return 1
+    finally:
+        base.cerrar()
+    if args.salida:
+        exportar_csv(columnas, filas, args.salida)
+    elif columnas:
+        mostrar_tabla(columnas, filas)
+    print(f"\n{len(filas)} fila(s) en {segundos * 1000:.1f} ms")
+    return 0
+
+
+def _ruta_indice():
+    from bot import configuracion_entorno
+    ruta = configuracion_entorno()['indice']
+    if not ruta:
+        print("✗ El índice de texto está desactivado (CLASSROOM_INDICE vacío)")
+    return ruta
+
+
+def indexar(rutas, carpeta=None, procesos=None):
+    """Actualiza el índice de texto con los archivos de las tareas guardadas en `rutas`"""
+    from indice_texto import IndiceTexto, archivos_de_tareas
+    from offline import cargar_tareas
+    ruta = _ruta_indice()
+    tareas = cargar_tareas(rutas) if ruta else None
+    if not tareas:
+        if ruta:
+            print("✗ No se encontraron archivos entregas_*.json")
+        return 1
+    indice = IndiceTexto(ruta)
+    try:
+        est = indice.actualizar(archivos_de_tareas(tareas, carpeta), procesos=procesos)
+        indice.informe()
+    finally:
+        indice.cerrar()
+    if est['pendientes_pdf']:
+        print(f"✗ {est['pendientes_pdf']} PDF sin indexar: no hay extractor de PDF. "
+              f"Instala pypdf (pip install pypdf) o poppler (pdftotext) y vuelve a ejecutar indexar")
+        return 1
+    return 0
+
+
+def comando_indexar(args):
+    return indexar(args.json, args.carpeta, args.procesos)
+
+
+def comando_buscar(args):
+    import os
+    import sqlite3
+    from indice_texto import IndiceTexto
+    from base_datos import mostrar_tabla, exportar_csv
+    ruta = _ruta_indice()
+    if not ruta:
+        return 1
+    if not os.path.exists(ruta):
+        print(f"✗ No existe {ruta}: se crea con `bot.py indexar`")
+        return 1
+    indice = IndiceTexto(ruta, solo_lectura=True)
+    try:
+        columnas, filas, segundos = indice.buscar(args.consulta, clase=args.clase, tarea=args.tarea,
+                                                  alumno=args.alumno, limite=args.limite)
+    except sqlite3.OperationalError as e:
+        print(f"✗ Consulta no válida ({e}); las frases van entre comillas dobles")
+        return 1
+    finally:
+        indice.cerrar()
+    if args.salida:
+        exportar_csv(columnas, filas, args.salida)
+    elif filas:
+        # La ruta completa solo va al CSV
+        mostrar_tabla(columnas[:-1], [f[:-1] for f in filas], ancho_max=70)
+    print(f"\n{len(filas)} resultado(s) en {segundos * 1000:.1f} ms")
+    return 0
+
+
+def comando_cache(args):
+    from bot import configuracion_entorno
+    from cache_listados import CacheListados
+
+    config = configuracion_entorno()
+    if not config['cache']:
+        print("✗ La caché está desactivada (CLASSROOM_CACHE vacío)")
+        return 1
+    cache = CacheListados(config['cache'], ttl=config['cache_horas'])
+    if args.borrar:
+        n = cache.invalidar_clase(args.clase) if args.clase else cache.invalidar()
+        print(f"🗑 {n} entrada(s) borradas")
+    else:
+        cache.mostrar()
+    return 0
+
+
+def comando_lote(args):
+    from bot import configuracion_entorno, crear_bot, mostrar_informes
+    from lote import LoteClassroom
+    from coordinador import Coordinador
+
+    config = configuracion_entorno()
+    if args.trazas:
+        config['trazas'] = args.trazas
+    bot = crear_bot(config)
+    opciones = dict(
+        carpeta_base=args.carpeta,
+        concurrencia=args.concurrencia if args.concurrencia is not None else config['concurrencia'],
+        descargas=args.descargas if args.descargas is not None else config['descargas'],
+        descargar=not args.sin_descargas,
+        zip=args.zip or config['zip'] or None,
+        reutilizar_alumnos=not args.refrescar_alumnos,
+        refrescar_listados=args.refrescar_listados,
+        rehacer=args.rehacer,
+    )
+    if args.procesos > 1:
+        lote = Coordinador(bot, config, procesos=args.procesos, trozo=args.trozo, headless=args.headless,
+                           **opciones)
+    else:
+        lote = LoteClassroom(bot, **opciones)
+    try:
+        bot.iniciar_navegador(headless=args.headless)
+        if not bot.iniciar_sesion():
+            print("✗ Error en login")
+            return 1
+        if not lote.planificar(args.clases, args.tareas):
+            print("✗ Ninguna tarea coincide con la selección")
+            return 1
+        lote.ejecutar()
+        bot.refrescar_listados()
+    except KeyboardInterrupt:
+        print("\n\n⚠ Interrumpido")
+    finally:
+        lote.resumen()
+        mostrar_informes(bot)
+        bot.cerrar()
+    ok = all(r['ok'] for r in lote.resultados)
+    if args.indexar and not args.sin_descargas and not opciones['zip']:
+        ok = indexar([args.carpeta]) == 0 and ok
+    return 0 if ok else 1
+
+
+def comando_vigilar(args):
+    from bot import configuracion_entorno, crear_bot, mostrar_informes
+    from vigilancia import VigilanciaClassroom, ESTADO_POR_DEFECTO
+
+    config = configuracion_entorno()
+    bot = crear_bot(config)
+    vigilancia = VigilanciaClassroom(
+        bot, intervalo=args.intervalo, jitter=min(max(args.jitter, 0.0), 1.0), rondas=args.rondas,
+        ruta_estado=args.estado or ESTADO_POR_DEFECTO,
+        carpeta_base=args.carpeta,
+        concurrencia=args.concurrencia if args.concurrencia is not None else config['concurrencia'],
+        descargas=args.descargas if args.descargas is not None else config['descargas'],
+        descargar=not args.sin_descargas,
+    )
+    try:
+        bot.iniciar_navegador(headless=args.headless)
+        if not bot.iniciar_sesion():
+            print("✗ Error en login")
+            return 1
+        if not vigilancia.planificar(args.clases, args.tareas):
+            print("✗ Ninguna tarea coincide con la selección")
+            return 1
+        vigilancia.ejecutar()
+    except KeyboardInterrupt:
+        print("\n\n⚠ Vigilancia detenida")
+    finally:
+        vigilancia.resumen()
+        mostrar_informes(bot)
+        bot.cerrar()
+    return 0
+
+
+def main_cli(argv):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
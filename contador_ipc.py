@@ -0,0 +1,81 @@
+"""
+Contador de idas y vueltas (IPC) entre Python y el navegador.
+Envuelve la página de Playwright y cuenta cada llamada a sus métodos y a los
+de los ElementHandle que devuelve (get_attribute, inner_text, ...), para
+comparar la extracción elemento a elemento con la de un único page.evaluate.
+"""
+
+import contextlib
+from collections import Counter
+
+
+def _es_elemento(obj):
+    """True para ElementHandle (y no para Page, que tiene goto)"""
+    return hasattr(obj, 'get_attribute') and hasattr(obj, 'query_selector') and not hasattr(obj, 'goto')
+
+
+class ContadorIPC:
+    """Cuenta llamadas al navegador: total, por método y por vista medida"""
+
+    def __init__(self):
+        self.total = 0
+        self.por_metodo = Counter()
+        # vista -> [veces medida, llamadas]
+        self.por_vista = {}
+
+    def sumar(self, metodo):
+        self.total += 1
+        self.por_metodo[metodo] += 1
+
+    @contextlib.contextmanager
+    def medir(self, vista):
+        """Acumula en `vista` las llamadas hechas dentro del bloque"""
+        inicio = self.total
+        try:
+            yield
+        finally:
+            est = self.por_vista.setdefault(vista, [0, 0])
+            est[0] += 1
+            est[1] += self.total - inicio
+
+    def envolver(self, obj):
+        """Envuelve páginas, elementos y listas de elementos"""
+        if isinstance(obj, list):
+            return [self.envolver(o) for o in obj]
+        if hasattr(obj, 'goto') or _es_elemento(obj):
+            return ObjetoMedido(obj, self)
+        return obj
+
+    def informe(self):
+        """Muestra las llamadas al navegador por vista y por método"""
+        print("\n🔁 IDAS Y VUELTAS AL NAVEGADOR:")
+        print("-" * 50)
+        for vista, (veces, llamadas) in self.por_vista.items():
+            print(f"  {vista:<22} {llamadas:>6} llamadas en {veces} vista(s)"
+                  f"  ({llamadas / veces:.1f} por vista)")
+        print(f"  {'TOTAL':<22} {self.total:>6}")
+        for metodo, n in self.por_metodo.most_common(8):
+            print(f"     · {metodo:<20} {n:>6}")
+
+
+class ObjetoMedido:
+    """Proxy de Page/ElementHandle que cuenta cada método invocado"""
+
+    def __init__(self, objetivo, contador):
+        self._objetivo = objetivo
+        self._contador = contador
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objetivo, nombre)
+        if not callable(atributo):
+            return atributo
+
+        def llamada(*args, **kwargs):
+            self._contador.sumar(nombre)
+            return self._contador.envolver(atributo(*args, **kwargs))
+        return llamada
+
+    @property
+    def sin_envolver(self):
+        """El objeto original de Playwright (para APIs que no aceptan el proxy)"""
+        return self._objetivo
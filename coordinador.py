@@ -0,0 +1,281 @@
+"""
+Modo lote repartido entre varios procesos, cada uno con su propio navegador.
+
+El coordinador (el bot ya logueado) planifica igual que LoteClassroom y
+parte el trabajo en unidades: una por tarea o, con `trozo`, rangos de
+`trozo` alumnos de cada tarea. Cada proceso trabajador tiene su propio
+ClassroomEntregasBot con un user_data_dir aparte y arranca con una copia de
+la instantánea de sesión del coordinador (sin login). Los trabajadores piden
+unidades de una en una; cada una escribe sus entregas en un .parte_NNNN.jsonl
+dentro de la carpeta de la tarea.
+
+Al terminar, las partes de cada tarea se unen en el orden de la
+planificación (no en el de llegada), así que el entregas_X.json resultante
+es el mismo con 1 o con N procesos. Si un trabajador muere, su unidad vuelve
+a la cola (hasta `reintentos` veces) y se lanza otro en su lugar.
+"""
+
+import os
+import queue
+import shutil
+import traceback
+import multiprocessing
+from collections import deque
+
+from lote import LoteClassroom
+from salida_jsonl import EscritorEntregas, leer_entregas, escribir_resumen, ruta_jsonl
+
+
+def procesar_unidad(bot, unidad):
+    """Extrae (y descarga) una unidad de trabajo en el proceso trabajador"""
+    clase, tarea = unidad['clase'], unidad['tarea']
+    with EscritorEntregas(unidad['ruta_parte']) as flujo:
+        entregas = bot.extraer_todas_entregas(clase['id'], tarea['id'], tarea['nombre'],
+                                              concurrencia=unidad['concurrencia'],
+                                              estudiantes=unidad['estudiantes'], flujo=flujo,
+                                              nombre_clase=clase['nombre'])
+    descargados = 0
+    if unidad['descargar'] and unidad['ruta_zip'] and any(e['archivos'] for e in entregas):
+        descargados = bot.descargar_en_zip(entregas, unidad['ruta_zip'], concurrencia=unidad['descargas'],
+                                           compresion=unidad['zip'], tarea_id=tarea['id'])
+    elif unidad['descargar'] and any(e['archivos'] for e in entregas):
+        descargados = bot.descargar_como_pdf(entregas, unidad['carpeta'], concurrencia=unidad['descargas'],
+                                             clase_id=clase['id'], tarea_id=tarea['id'])
+    return {'orden': [e['estudiante_id'] for e in entregas], 'descargados': descargados}
+
+
+def trabajador(wid, config, user_data_dir, headless, entrada, salida):
+    """
+    Proceso trabajador: abre su navegador, recupera la sesión y procesa las
+    unidades que le manda el coordinador hasta recibir None.
+    Mensajes a `salida`: (tipo, wid, id de unidad, dato).
+    """
+    from bot import crear_bot
+
+    bot = crear_bot(config, user_data_dir=user_data_dir)
+    try:
+        bot.iniciar_navegador(headless=headless)
+        if not bot.iniciar_sesion():
+            salida.put(('sin_sesion', wid, None, None))
+            return
+        salida.put(('listo', wid, None, None))
+        while True:
+            unidad = entrada.get()
+            if unidad is None:
+                break
+            try:
+                salida.put(('hecho', wid, unidad['id'], procesar_unidad(bot, unidad)))
+            except Exception as e:
+                traceback.print_exc()
+                salida.put(('error', wid, unidad['id'], str(e)))
+    finally:
+        bot.cerrar()
+
+
+class Coordinador(LoteClassroom):
+    """LoteClassroom que reparte las unidades de trabajo entre procesos"""
+
+    def __init__(self, bot, config, procesos=2, trozo=0, headless=True, reintentos=2, **opciones):
+        super().__init__(bot, **opciones)
+        self.config = config
+        self.procesos = max(1, procesos)
+        self.trozo = trozo
+        self.headless = headless
+        self.reintentos = reintentos
+        self.trabajadores = {}   # wid -> {'proceso', 'entrada', 'unidad', 'caidas'}
+        self.pendientes = deque()
+        self.terminadas = {}     # id de unidad -> resultado o {'error'}
+
+    # ---------------- Planificación ----------------
+
+    def _unidades(self):
+        """Convierte la cola de (clase, tarea) en unidades de trabajo"""
+        unidades = []
+        for trabajo in self.cola:
+            clase, tarea = trabajo['clase'], trabajo['tarea']
+            carpeta = self.carpeta_tarea(clase, tarea)
+            rangos = [None]
+            if self.trozo:
+                alumnos = self._alumnos(clase, tarea)
+                rangos = [alumnos[i:i + self.trozo] for i in range(0, len(alumnos), self.trozo)] or [None]
+            for parte, estudiantes in enumerate(rangos):
+                unidades.append({
+                    'id': len(unidades), 'clase': clase, 'tarea': tarea, 'carpeta': carpeta,
+                    'estudiantes': estudiantes, 'intentos': 0,
+                    'ruta_parte': os.path.join(carpeta, f".parte_{parte:04d}.jsonl"),
+                    'concurrencia': self.concurrencia, 'descargas': self.descargas, 'descargar': self.descargar,
+                    # Un ZIP por unidad: con `trozo` la tarea queda en <tarea>_NNNN.zip
+                    'zip': self.zip, 'ruta_zip': self.zip and self.ruta_zip(carpeta, tarea,
+                                                                        parte if estudiantes else None),
+                })
+        self.cola.clear()
+        return unidades
+
+    # ---------------- Procesos ----------------
+
+    def _config_trabajador(self, wid):
+        config = dict(self.config, email=self.bot.email, password=self.bot.password,
+                      # Un manifiesto (o caché) compartido entre procesos se pisaría:
+                      # la recuperación la lleva el coordinador por unidades.
+                      # La base SQLite sí se comparte (WAL + espera por el bloqueo)
+                      manifiesto='', cache='',
+                      # El límite de ritmo es de la cuenta: se reparte entre procesos
+                      ritmo_max=self.config['ritmo_max'] / self.procesos)
+        if config.get('trazas'):
+            config['trazas'] = f"{os.path.splitext(config['trazas'])[0]}_w{wid}.json"
+        return config
+
+    def _lanzar(self, wid, caidas=0):
+        user_data_dir = f"{self.bot.user_data_dir.rstrip(os.sep)}_w{wid}"
+        # Sesión clonada: el perfil del trabajador arranca desde la instantánea
+        if os.path.exists(self.bot.ruta_sesion):
+            shutil.copy2(self.bot.ruta_sesion, user_data_dir + "_sesion.json")
+        entrada = self._contexto.Queue()
+        proceso = self._contexto.Process(
+            target=trabajador, name=f"trabajador-{wid}",
+            args=(wid, self._config_trabajador(wid), user_data_dir, self.headless, entrada, self.salida),
+        )
+        proceso.start()
+        self.trabajadores[wid] = {'proceso': proceso, 'entrada': entrada, 'unidad': None, 'caidas': caidas}
+        print(f"🧵 Trabajador {wid} lanzado (pid {proceso.pid})")
+
+    def _asignar(self, wid):
+        """Manda al trabajador la siguiente unidad (o None si no quedan)"""
+        t = self.trabajadores[wid]
+        if self.pendientes:
+            unidad = self.pendientes.popleft()
+            unidad['intentos'] += 1
+            t['unidad'] = unidad
+            t['entrada'].put(unidad)
+        else:
+            t['unidad'] = None
+            t['parado'] = True
+            t['entrada'].put(None)
+
+    def _fallo_unidad(self, unidad, error):
+        """Reintenta la unidad o la da por fallida"""
+        if unidad['intentos'] <= self.reintentos:
+            print(f"🔁 Reintentando {unidad['tarea']['nombre']} (parte {unidad['id']}): {error}")
+            self.pendientes.appendleft(unidad)
+        else:
+            self.terminadas[unidad['id']] = {'error': error}
+
+    def _retirar(self, wid):
+        """Quita un trabajador ya terminado y lanza otro en su hueco si queda trabajo"""
+        t = self.trabajadores.pop(wid)
+        t['proceso'].join()
+        if self.pendientes and t['caidas'] <= self.reintentos:
+            self._lanzar(wid, t['caidas'])
+
+    def _revisar(self):
+        """Recupera las unidades de los trabajadores muertos y los relanza si hace falta"""
+        for wid, t in list(self.trabajadores.items()):
+            if t['proceso'].is_alive():
+                continue
+            codigo = t['proceso'].exitcode
+            if codigo == 0 and t['unidad'] is None and not t.get('parado'):
+                # Salió por su cuenta sin unidad: su 'sin_sesion' está aún en la cola
+                continue
+            if codigo != 0 or t['unidad'] is not None:
+                t['caidas'] += 1
+                print(f"💥 El trabajador {wid} terminó inesperadamente (código {codigo})")
+            if t['unidad'] is not None:
+                self._fallo_unidad(t['unidad'], f"trabajador caído (código {codigo})")
+            self._retirar(wid)
+        if not self.trabajadores:
+            for unidad in self.pendientes:
+                self.terminadas[unidad['id']] = {'error': "no quedan trabajadores"}
+            self.pendientes.clear()
+
+    def ejecutar(self):
+        """Procesa todas las unidades con `procesos` trabajadores y une los resultados"""
+        unidades = self._unidades()
+        if not unidades:
+            return self.resultados
+        self.pendientes = deque(unidades)
+        self.terminadas = {}
+        # spawn: Playwright no sobrevive a un fork
+        self._contexto = multiprocessing.get_context('spawn')
+        self.salida = self._contexto.Queue()
+        self.bot._guardar_instantanea()
+        print(f"\n🏭 {len(unidades)} unidad(es) de trabajo para {min(self.procesos, len(unidades))} proceso(s)")
+
+        for wid in range(min(self.procesos, len(unidades))):
+            self._lanzar(wid)
+
+        try:
+            while len(self.terminadas) < len(unidades):
+                # En cada vuelta, no solo cuando la cola está en silencio: si los
+                # demás siguen mandando 'hecho', la unidad de un caído volvería tarde
+                self._revisar()
+                try:
+                    tipo, wid, unidad_id, dato = self.salida.get(timeout=2)
+                except queue.Empty:
+                    continue
+
+                t = self.trabajadores.get(wid)
+                if t is None:
+                    continue
+                if tipo == 'sin_sesion':
+                    print(f"✗ El trabajador {wid} no pudo iniciar sesión")
+                    t['caidas'] += 1
+                    self._retirar(wid)
+                    continue
+                if tipo in ('hecho', 'error') and (t['unidad'] is None or t['unidad']['id'] != unidad_id):
+                    # De un trabajador anterior con el mismo número, caído tras enviarlo:
+                    # su unidad ya volvió a la cola
+                    continue
+                if tipo == 'hecho':
+                    self.terminadas[unidad_id] = dato
+                    print(f"✅ [{len(self.terminadas)}/{len(unidades)}] {t['unidad']['tarea']['nombre']} "
+                          f"(trabajador {wid}, {len(dato['orden'])} alumnos)")
+                elif tipo == 'error':
+                    self._fallo_unidad(t['unidad'], dato)
+                self._asignar(wid)
+        finally:
+            for t in self.trabajadores.values():
+                t['entrada'].put(None)
+            for t in self.trabajadores.values():
+                t['proceso'].join(timeout=60)
+                if t['proceso'].is_alive():
+                    t['proceso'].terminate()
+
+        self._unir(unidades)
+        return self.resultados
+
+    # ---------------- Resultado ----------------
+
+    def _unir(self, unidades):
+        """Une las partes de cada tarea en entregas_X.jsonl/json, en orden de planificación"""
+        from bot import cabecera_resumen, nombre_json_tarea
+
+        por_tarea = {}
+        for unidad in unidades:
+            por_tarea.setdefault((unidad['clase']['id'], unidad['tarea']['id']), []).append(unidad)
+
+        for partes in por_tarea.values():
+            clase, tarea, carpeta = partes[0]['clase'], partes[0]['tarea'], partes[0]['carpeta']
+            resultados = [self.terminadas.get(u['id'], {'error': "sin terminar"}) for u in partes]
+            errores = [r['error'] for r in resultados if 'error' in r]
+
+            ruta_json = os.path.join(carpeta, nombre_json_tarea(tarea['nombre']))
+            orden = []
+            with EscritorEntregas(ruta_jsonl(ruta_json), sincronizar_cada=1000) as flujo:
+                for unidad, resultado in zip(partes, resultados):
+                    orden.extend(resultado.get('orden', []))
+                    if os.path.exists(unidad['ruta_parte']):
+                        for entrega in leer_entregas(unidad['ruta_parte']):
+                            flujo.escribir(entrega)
+            datos = escribir_resumen(flujo.ruta, ruta_json, cabecera_resumen(clase['nombre'], clase['id'],
+                                                                            tarea['nombre'], tarea['id']),
+                                     orden=orden)
+            for unidad in partes:
+                if os.path.exists(unidad['ruta_parte']):
+                    os.remove(unidad['ruta_parte'])
+
+            self.resultados.append({
+                'clase': clase['nombre'], 'tarea': tarea['nombre'], 'ok': not errores,
+                'alumnos': datos['total_alumnos'], 'archivos': datos['total_archivos'],
+                'descargados': sum(r.get('descargados', 0) for r in resultados),
+                'error': '; '.join(dict.fromkeys(errores)),
+            })
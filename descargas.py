@@ -0,0 +1,496 @@
+"""
+Motor de descargas en paralelo para los archivos entregados en Classroom.
+Usa las cookies de la sesión del navegador (mismo login) pero descarga por
+HTTP directamente, sin navegar la pestaña, con varios hilos a la vez.
+
+Los archivos grandes (vídeos, ZIP) se transfieren por bloques: si la
+conexión se corta y el servidor admite Range, se continúa desde el último
+byte escrito. El .part de una descarga a archivo se conserva entre
+ejecuciones junto a un .part.json con la URL y el validador (ETag o
+Last-Modified) para reanudarlo con If-Range. Antes de renombrar el .part se
+comprueba el tamaño y, si Google manda X-Goog-Hash, el MD5.
+"""
+
+import os
+import re
+import json
+import time
+import html
+import glob
+import base64
+import hashlib
+import threading
+import mimetypes
+import contextlib
+import http.client
+import http.cookiejar
+import urllib.error
+import urllib.request
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from ritmo import Frenado, REINTENTABLES, REINTENTOS_FRENADO, motivo_frenado, segundos_retry_after
+
+# Hosts a los que se piden las exportaciones (se cambian para apuntar el bot
+# a un servidor de pruebas, ver servidor_mock.ClassroomSintetico)
+HOSTS_EXPORTACION = {
+    'docs': "https://docs.google.com",
+    'drive': "https://drive.google.com",
+}
+
+# Cortes de red tras los que se reanuda la transferencia con Range
+CORTES = (ConnectionError, TimeoutError, http.client.HTTPException, urllib.error.URLError)
+
+
+def url_exportacion(file_id, url_original, hosts=None):
+    """Devuelve la URL de exportación a PDF (o descarga directa) según el tipo"""
+    hosts = hosts or HOSTS_EXPORTACION
+    if 'docs.google.com/document' in url_original:
+        # Es un documento de texto -> Exportar a PDF
+        return f"{hosts['docs']}/document/d/{file_id}/export?format=pdf"
+    elif 'docs.google.com/presentation' in url_original:
+        # Es una presentación -> Exportar a PDF
+        return f"{hosts['docs']}/presentation/d/{file_id}/export/pdf"
+    elif 'docs.google.com/spreadsheets' in url_original:
+        # Es una hoja de cálculo -> Exportar a PDF
+        return f"{hosts['docs']}/spreadsheets/d/{file_id}/export?format=pdf"
+    # Es un PDF, imagen o archivo binario en Drive -> Descarga directa
+    return f"{hosts['drive']}/uc?export=download&id={file_id}"
+
+
+def formato_exportacion(url_original):
+    """'pdf' para Docs/Slides/Sheets (se exportan) u 'original' para archivos subidos a Drive"""
+    if re.search(r'docs\.google\.com/(document|presentation|spreadsheets)', url_original):
+        return 'pdf'
+    return 'original'
+
+
+def extension_descarga(formato, tipo=None, nombre_servidor=None):
+    """Extensión del archivo descargado: .pdf si se exportó; si no, la del nombre o tipo MIME"""
+    if formato == 'pdf':
+        return '.pdf'
+    ext = os.path.splitext(nombre_servidor or '')[1]
+    if ext:
+        return ext.lower()
+    return mimetypes.guess_extension((tipo or '').split(';')[0].strip()) or ''
+
+
+def limpiar_nombre(nombre):
+    """Quita caracteres no válidos en nombres de archivo"""
+    return re.sub(r'[<>:"/\\|?*]', '', nombre).strip()
+
+
+def plan_descargas(entregas, carpeta_destino, hosts=None):
+    """
+    Construye la lista de descargas a partir de las entregas, sin navegador.
+    Cada elemento: {'id', 'estudiante_id', 'alumno', 'url', 'formato', 'nombre', 'ruta'}
+    `hosts` sustituye a HOSTS_EXPORTACION. Los archivos en formato 'original'
+    no llevan extensión: se decide al descargarlos (extension_descarga).
+    """
+    plan = []
+    for entrega in entregas:
+        nombre_clean = limpiar_nombre(entrega['nombre_alumno'])
+        for archivo in entrega['archivos']:
+            file_id = archivo['id']
+            formato = formato_exportacion(archivo['url'])
+            # Formato: NombreAlumno_ID.pdf (ID completo: los prefijos pueden coincidir)
+            nombre_archivo_final = f"{nombre_clean}_{file_id}" + ('.pdf' if formato == 'pdf' else '')
+            plan.append({
+                'id': file_id,
+                'estudiante_id': entrega['estudiante_id'],
+                'alumno': nombre_clean,
+                'url': url_exportacion(file_id, archivo['url'], hosts),
+                'formato': formato,
+                'nombre': nombre_archivo_final,
+                'ruta': os.path.join(carpeta_destino, nombre_archivo_final),
+            })
+    return plan
+
+
+def rutas_descargadas(item):
+    """
+    Archivos ya en disco para un elemento del plan. Los de formato 'original'
+    llevan la extensión que se decidió al descargarlos, así que se buscan
+    como <ruta>.* (o <ruta> tal cual si no tenían extensión).
+    """
+    if item['formato'] == 'pdf':
+        rutas = [item['ruta']]
+    else:
+        rutas = glob.glob(glob.escape(item['ruta']) + '.*') + [item['ruta']]
+    return [r for r in rutas if not r.endswith(('.part', '.part.json')) and os.path.isfile(r)]
+
+
+def cookiejar_desde_playwright(cookies):
+    """Convierte las cookies de context.cookies() en un CookieJar de urllib"""
+    jar = http.cookiejar.CookieJar()
+    for c in cookies:
+        dominio = c.get('domain', '')
+        expira = c.get('expires')
+        jar.set_cookie(http.cookiejar.Cookie(
+            version=0,
+            name=c['name'],
+            value=c['value'],
+            port=None,
+            port_specified=False,
+            domain=dominio,
+            domain_specified=bool(dominio),
+            domain_initial_dot=dominio.startswith('.'),
+            path=c.get('path', '/'),
+            path_specified=True,
+            secure=c.get('secure', False),
+            expires=int(expira) if expira and expira > 0 else None,
+            discard=not expira or expira <= 0,
+            comment=None,
+            comment_url=None,
+            rest={'HttpOnly': None} if c.get('httpOnly') else {},
+        ))
+    return jar
+
+
+def rango_respuesta(respuesta):
+    """
+    (primer byte, tamaño total) del cuerpo de una respuesta: el de Content-Range
+    en un 206 o 0 y Content-Length en un 200. Total None si no se sabe.
+    """
+    if respuesta.status == 206:
+        m = re.match(r'bytes (\d+)-\d+/(\d+|\*)', respuesta.headers.get('Content-Range') or '')
+        if not m:
+            raise ValueError("respuesta 206 sin Content-Range válido")
+        return int(m.group(1)), None if m.group(2) == '*' else int(m.group(2))
+    longitud = respuesta.headers.get('Content-Length') or ''
+    return 0, int(longitud) if longitud.isdigit() else None
+
+
+def md5_google(cabeceras):
+    """MD5 (hex) del archivo según la cabecera X-Goog-Hash, o None si no viene"""
+    for valor in cabeceras.get_all('X-Goog-Hash') or []:
+        for parte in valor.split(','):
+            nombre, _, codificado = parte.strip().partition('=')
+            if nombre == 'md5':
+                try:
+                    return base64.b64decode(codificado).hex()
+                except ValueError:
+                    return None
+    return None
+
+
+def _bloquear(f):
+    """Bloqueo exclusivo sin espera (True si se obtiene; sin fcntl, siempre True)"""
+    try:
+        import fcntl
+    except ImportError:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class ParcialDescarga:
+    """
+    El .part de una descarga a archivo (item['parcial'] o <ruta>.part). Si ya
+    existe con la misma URL y un validador, la descarga continúa desde su
+    tamaño. Lo bloquea mientras escribe: si otro hilo o proceso descarga lo
+    mismo, esta copia va a un .part propio que no se reanuda.
+    """
+
+    def __init__(self, item):
+        self.url = item['url']
+        self.final = item['ruta']
+        self.ruta = item.get('parcial') or item['ruta'] + '.part'
+        carpeta = os.path.dirname(self.ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.reanudable = True
+        self.f = open(self.ruta, 'a+b')
+        if not _bloquear(self.f):
+            self.f.close()
+            self.ruta = f"{self.final}.{os.getpid()}.{threading.get_ident()}.part"
+            self.f = open(self.ruta, 'w+b')
+            self.reanudable = False
+        self.meta = self.ruta + '.json'
+        self.desde = 0
+        self.validador = None
+        datos = {}
+        if self.reanudable and os.path.exists(self.meta):
+            try:
+                with open(self.meta, encoding='utf-8') as f:
+                    datos = json.load(f)
+            except (OSError, ValueError):
+                pass
+        tam = self.f.seek(0, os.SEEK_END)
+        if tam and datos.get('url') == self.url and datos.get('validador'):
+            self.desde, self.validador = tam, datos['validador']
+        elif tam:
+            self.vaciar()
+
+    def vaciar(self):
+        """Empieza de cero (el servidor no continúa o el archivo cambió)"""
+        self.f.truncate(0)
+        self.desde = 0
+
+    def hash_previo(self, *hashes):
+        """Pasa por los hashes lo que ya había en el .part"""
+        self.f.seek(0)
+        while True:
+            bloque = self.f.read(1024 * 1024)
+            if not bloque:
+                break
+            for h in hashes:
+                h.update(bloque)
+        self.f.seek(0, os.SEEK_END)
+
+    def anotar(self, validador, total):
+        """Guarda lo necesario para reanudar en otra ejecución (si se puede)"""
+        self.validador = validador
+        if self.reanudable and validador:
+            with open(self.meta, 'w', encoding='utf-8') as f:
+                json.dump({'url': self.url, 'validador': validador, 'total': total}, f)
+
+    @contextlib.contextmanager
+    def abrir(self, item, tipo=None, nombre_servidor=None):
+        """Mismo papel que destino.abrir(): al salir sin error, el .part pasa a su ruta"""
+        yield self.f
+        self.f.close()
+        os.replace(self.ruta, self.final)
+        if os.path.exists(self.meta):
+            os.remove(self.meta)
+
+    def cerrar(self):
+        """Tras un fallo: conserva el .part solo si se podrá reanudar"""
+        if self.f.closed:
+            return
+        tam = self.f.seek(0, os.SEEK_END)
+        self.f.close()
+        if tam and self.reanudable and os.path.exists(self.meta):
+            return
+        for ruta in (self.ruta, self.meta):
+            if os.path.exists(ruta):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+
+class MotorDescargas:
+    """
+    Descarga en paralelo con un pool de hilos acotado.
+    Cada archivo se escribe por bloques en un .part y se renombra al terminar.
+    """
+
+    def __init__(self, cookies, concurrencia=4, timeout=60, tam_bloque=64 * 1024, user_agent=None, ritmo=None,
+                 destino=None, reanudaciones=3, velocidad_minima=64 * 1024):
+        self.concurrencia = max(1, concurrencia)
+        # Dónde se escribe cada archivo: None = en item['ruta']; o un objeto con
+        # abrir(item, tipo, nombre_servidor) como salida_zip.ArchivoZip
+        self.destino = destino
+        # ControlRitmo compartido con las navegaciones (None = sin control)
+        self.ritmo = ritmo
+        # `timeout` es por conexión y lectura; el plazo de cada archivo crece
+        # con su tamaño a razón de `velocidad_minima` bytes/s
+        self.timeout = timeout
+        self.velocidad_minima = velocidad_minima
+        self.tam_bloque = tam_bloque
+        # Cortes seguidos que se reanudan con Range dentro de una misma descarga
+        self.reanudaciones = reanudaciones
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(cookiejar_desde_playwright(cookies))
+        )
+        self.cabeceras = {'User-Agent': user_agent or 'Mozilla/5.0'}
+
+    def descargar(self, plan, al_terminar=None):
+        """
+        Descarga todos los elementos del plan (ver plan_descargas).
+        Devuelve un resultado por archivo, en el mismo orden del plan:
+        {'id', 'nombre', 'ruta', 'ok', 'bytes', 'sha256', 'tipo', 'nombre_servidor', 'segundos', 'error',
+         'reanudado', 'cortes', 'mb_s'}
+        ('reanudado': bytes que ya estaban en el .part; 'cortes': conexiones reanudadas;
+        'mb_s': velocidad de lo transferido en esta ejecución).
+        `al_terminar(resultado)` se llama en cuanto acaba cada archivo.
+        """
+        def tarea(item):
+            resultado = self.descargar_uno(item)
+            if al_terminar:
+                al_terminar(resultado)
+            return resultado
+
+        with ThreadPoolExecutor(max_workers=self.concurrencia) as pool:
+            return list(pool.map(tarea, plan))
+
+    def descargar_uno(self, item):
+        """Descarga un único archivo y devuelve su resultado"""
+        inicio = time.perf_counter()
+        resultado = {'id': item['id'], 'nombre': item['nombre'], 'ruta': item['ruta'],
+                     'ok': False, 'bytes': 0, 'sha256': None, 'tipo': None, 'nombre_servidor': None,
+                     'segundos': 0.0, 'error': None, 'reanudado': 0, 'cortes': 0, 'mb_s': 0.0}
+        parcial = None
+        try:
+            # En un destino (ZIP) no hay .part: solo se reanudan los cortes de esta ejecución
+            parcial = None if self.destino else ParcialDescarga(item)
+            respuesta = self._abrir_desde(item['url'], parcial)
+            # Para decidir la extensión de los archivos en formato original
+            resultado['tipo'] = respuesta.headers.get('Content-Type')
+            resultado['nombre_servidor'] = respuesta.headers.get_filename()
+            destino = self.destino.abrir if self.destino else parcial.abrir
+            with destino(item, resultado['tipo'], resultado['nombre_servidor']) as f:
+                self._transferir(item['url'], respuesta, f, parcial, resultado)
+            resultado['ok'] = True
+        except Exception as e:
+            resultado['error'] = str(e) or type(e).__name__
+        finally:
+            if parcial:
+                parcial.cerrar()
+        resultado['segundos'] = time.perf_counter() - inicio
+        if resultado['segundos'] > 0:
+            resultado['mb_s'] = (resultado['bytes'] - resultado['reanudado']) / 1e6 / resultado['segundos']
+        return resultado
+
+    def _abrir_desde(self, url, parcial):
+        """Primera petición: con Range/If-Range si hay un .part que continuar"""
+        if not (parcial and parcial.desde):
+            return self._abrir_con_ritmo(url)
+        try:
+            return self._abrir_con_ritmo(url, self._cabeceras_rango(parcial.desde, parcial.validador))
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # El .part ya no encaja con el archivo del servidor: de cero
+            parcial.vaciar()
+            return self._abrir_con_ritmo(url)
+
+    @staticmethod
+    def _cabeceras_rango(desde, validador):
+        cabeceras = {'Range': f"bytes={desde}-"}
+        if validador:
+            # Si el archivo cambió, el servidor manda el nuevo entero (200)
+            cabeceras['If-Range'] = validador
+        return cabeceras
+
+    def _transferir(self, url, respuesta, f, parcial, resultado):
+        """
+        Copia el cuerpo en `f` por bloques. Si la conexión se corta y el
+        servidor admite rangos, vuelve a pedir desde el último byte escrito
+        (hasta self.reanudaciones veces). Al final comprueba tamaño y MD5.
+        """
+        desde, total = rango_respuesta(respuesta)
+        validador = respuesta.headers.get('ETag') or respuesta.headers.get('Last-Modified')
+        acepta_rangos = respuesta.status == 206 or respuesta.headers.get('Accept-Ranges') == 'bytes'
+        md5_esperado = md5_google(respuesta.headers)
+        h = hashlib.sha256()
+        md5 = hashlib.md5() if md5_esperado else None
+        if parcial:
+            if desde != parcial.desde:
+                # 200 en lugar de 206: el servidor no continúa o el archivo cambió
+                parcial.vaciar()
+            parcial.hash_previo(*[x for x in (h, md5) if x])
+            parcial.anotar(validador if acepta_rangos else None, total)
+        escrito = resultado['reanudado'] = desde
+        try:
+            while True:
+                # El plazo cuenta desde que se puede escribir (en un ZIP se espera turno)
+                pendiente = (total - escrito) if total else 0
+                limite = time.perf_counter() + self.timeout + pendiente / self.velocidad_minima
+                try:
+                    while True:
+                        bloque = respuesta.read(self.tam_bloque)
+                        if not bloque:
+                            break
+                        f.write(bloque)
+                        h.update(bloque)
+                        if md5:
+                            md5.update(bloque)
+                        escrito += len(bloque)
+                        resultado['bytes'] = escrito
+                        if time.perf_counter() > limite:
+                            raise TimeoutError(f"por debajo de {self.velocidad_minima / 1024:.0f} KB/s")
+                    # read(n) no avisa si la conexión se cierra antes de tiempo
+                    if total is not None and escrito < total:
+                        raise ConnectionError(f"conexión cortada en {escrito} de {total} bytes")
+                    break
+                except CORTES:
+                    if not acepta_rangos or resultado['cortes'] >= self.reanudaciones:
+                        raise
+                    resultado['cortes'] += 1
+                    respuesta.close()
+                    respuesta = self._abrir_con_ritmo(url, self._cabeceras_rango(escrito, validador))
+                    if rango_respuesta(respuesta)[0] != escrito:
+                        raise ValueError("el servidor no continuó la descarga donde se cortó")
+        finally:
+            respuesta.close()
+        resultado['bytes'] = escrito
+        if total is not None and escrito != total:
+            raise ValueError(f"tamaño incorrecto: {escrito} de {total} bytes")
+        if md5 and md5.hexdigest() != md5_esperado:
+            raise ValueError("el MD5 no coincide con el de Google")
+        resultado['sha256'] = h.hexdigest()
+
+    def _abrir_con_ritmo(self, url, cabeceras=None):
+        """
+        _abrir() pasando por el control de ritmo. Si Google frena (429, 503,
+        página de tráfico inusual) se avisa al control y se reintenta.
+        """
+        if not self.ritmo:
+            return self._abrir(url, cabeceras)
+        for intento in range(REINTENTOS_FRENADO + 1):
+            self.ritmo.adquirir()
+            try:
+                respuesta = self._abrir(url, cabeceras)
+            except urllib.error.HTTPError as e:
+                motivo = motivo_frenado(e.code)
+                if not motivo:
+                    raise
+                error = Frenado(motivo, segundos_retry_after(e.headers))
+            except Frenado as e:
+                error = e
+            else:
+                self.ritmo.exito()
+                return respuesta
+            self.ritmo.frenado(error.motivo, error.espera)
+            if error.motivo not in REINTENTABLES or intento == REINTENTOS_FRENADO:
+                raise error
+
+    def _abrir(self, url, cabeceras=None):
+        """
+        Abre la URL y devuelve la respuesta con el contenido del archivo.
+        Si Drive responde con la página de "no se puede analizar en busca de
+        virus", sigue el formulario de confirmación una vez.
+        """
+        respuesta = self._get(url, cabeceras)
+        if not self._es_html(respuesta):
+            return respuesta
+
+        pagina = respuesta.read(512 * 1024).decode('utf-8', 'replace')
+        respuesta.close()
+        # Página de "tráfico inusual" o redirección al login
+        motivo = motivo_frenado(url_final=respuesta.geturl(), url_pedida=url)
+        if motivo:
+            raise Frenado(motivo)
+        url_confirmacion = self._url_confirmacion(pagina, respuesta.geturl())
+        if url_confirmacion:
+            respuesta = self._get(url_confirmacion, cabeceras)
+            if not self._es_html(respuesta):
+                return respuesta
+            respuesta.close()
+        raise ValueError("respuesta HTML en lugar del archivo (¿sesión caducada o sin permiso?)")
+
+    def _get(self, url, cabeceras=None):
+        peticion = urllib.request.Request(url, headers=dict(self.cabeceras, **(cabeceras or {})))
+        return self.opener.open(peticion, timeout=self.timeout)
+
+    @staticmethod
+    def _es_html(respuesta):
+        return 'text/html' in (respuesta.headers.get('Content-Type') or '')
+
+    @staticmethod
+    def _url_confirmacion(pagina, url_pagina):
+        """Extrae la URL de descarga del formulario de confirmación de Drive"""
+        form = re.search(r'<form[^>]*id="download-form"[^>]*action="([^"]+)"[^>]*>(.*?)</form>', pagina, re.DOTALL)
+        if form:
+            accion = urllib.parse.urljoin(url_pagina, html.unescape(form.group(1)))
+            campos = re.findall(r'<input[^>]*type="hidden"[^>]*name="([^"]+)"[^>]*value="([^"]*)"', form.group(2))
+            return accion + '?' + urllib.parse.urlencode([(n, html.unescape(v)) for n, v in campos])
+        enlace = re.search(r'href="(/uc\?export=download[^"]*confirm=[^"]+)"', pagina)
+        if enlace:
+            return urllib.parse.urljoin(url_pagina, html.unescape(enlace.group(1)))
+        return None
@@ -0,0 +1,141 @@
+"""
+Extractor de datos de las páginas de Classroom en una sola pasada.
+Sustituye a las expresiones regulares con re.DOTALL sobre page.content(),
+que en las páginas de alumnos de clases grandes hacen mucho backtracking
+(cada enlace sin nombre detrás recorría el resto del documento).
+
+Recorre el HTML una única vez con un solo patrón compilado (tiempo lineal)
+y saca:
+  - clases:      enlaces /c/ID seguidos del nombre en un elemento .YVvGBb
+  - tareas:      IDs de /a/ID (formato ACg8oc... y numérico)
+  - estudiantes: enlaces /student/ID o data-student-id + nombre en .YVvGBb
+"""
+
+import re
+import html as html_lib
+
+# Un único patrón con todo lo que interesa, en orden de aparición.
+# Ninguna alternativa cruza etiquetas: no hay backtracking entre líneas.
+RE_TOKENS = re.compile(
+    r'href="(?P<href>[^"]*)"'
+    r'|data-student-id="(?P<data_id>\d+)"'
+    r'|YVvGBb[^>]*>(?P<nombre>[^<]*)'
+    r'|/student/(?P<estudiante>[A-Za-z0-9]{16,})'
+)
+RE_CLASE = re.compile(r'/c/([A-Za-z0-9]+)')
+RE_TAREA = re.compile(r'/a/(ACg8oc[A-Za-z0-9_-]+|\d{15,})')
+RE_ESTUDIANTE = re.compile(r'/student/([A-Za-z0-9]{16,})')
+
+# Entradas del menú lateral que también son enlaces /c/
+NO_SON_CLASES = ['Inicio', 'Calendar', 'Para revisar', 'Ajustes', 'Clases archivadas']
+
+
+class ExtractorClassroom:
+    """
+    Resultado de una pasada. Cada enlace de clase o alumno queda "pendiente"
+    hasta que aparece el siguiente texto de un elemento .YVvGBb, igual que
+    hacían las regex (enlace ... .*? ... YVvGBb>Nombre<).
+    """
+
+    def __init__(self):
+        self.clases = []                # [(id, nombre)]
+        self.tareas = []                # [id] en orden de aparición
+        self.estudiantes = []           # [(id, nombre)] por enlace /student/
+        self.estudiantes_data_id = []   # [(id, nombre)] por data-student-id
+        self.ids_estudiante = []        # [id] cualquier /student/ID del HTML
+
+    def feed(self, html):
+        clase_pendiente = estudiante_pendiente = data_id_pendiente = None
+
+        for m in RE_TOKENS.finditer(html):
+            tipo = m.lastgroup
+            valor = m.group(tipo)
+
+            if tipo == 'nombre':
+                if not valor.strip():
+                    continue
+                nombre = html_lib.unescape(valor)
+                if clase_pendiente is not None:
+                    self.clases.append((clase_pendiente, nombre))
+                    clase_pendiente = None
+                if estudiante_pendiente is not None:
+                    self.estudiantes.append((estudiante_pendiente, nombre))
+                    estudiante_pendiente = None
+                if data_id_pendiente is not None:
+                    self.estudiantes_data_id.append((data_id_pendiente, nombre))
+                    data_id_pendiente = None
+
+            elif tipo == 'href':
+                m_clase = RE_CLASE.fullmatch(valor)
+                if m_clase and clase_pendiente is None:
+                    clase_pendiente = m_clase.group(1)
+                m_tarea = RE_TAREA.search(valor)
+                if m_tarea:
+                    self.tareas.append(m_tarea.group(1))
+                if '/student/' in valor:
+                    ids = RE_ESTUDIANTE.findall(valor)
+                    self.ids_estudiante.extend(ids)
+                    # Solo cuenta si el href termina en el ID (como /student/ID")
+                    if ids and valor.endswith(ids[-1]) and estudiante_pendiente is None:
+                        estudiante_pendiente = ids[-1]
+
+            elif tipo == 'data_id':
+                if data_id_pendiente is None:
+                    data_id_pendiente = valor
+
+            else:
+                # /student/ID fuera de un href (scripts, otros atributos)
+                self.ids_estudiante.append(valor)
+
+
+def analizar(html):
+    """Recorre el HTML una vez y devuelve el extractor con todo lo encontrado"""
+    extractor = ExtractorClassroom()
+    extractor.feed(html)
+    return extractor
+
+
+def extraer_clases(html, base_url="https://classroom.google.com", extractor=None):
+    """Lista de clases [{'id', 'nombre', 'url'}] sin duplicados"""
+    extractor = extractor or analizar(html)
+    clases = []
+    vistas = set()
+    for clase_id, nombre in extractor.clases:
+        nombre = nombre.strip()
+        if clase_id not in vistas and nombre not in NO_SON_CLASES:
+            clases.append({
+                'id': clase_id,
+                'nombre': nombre,
+                'url': f"{base_url}/c/{clase_id}"
+            })
+            vistas.add(clase_id)
+    return clases
+
+
+def extraer_ids_tareas(html, extractor=None):
+    """IDs de tareas (ACg8oc... y numéricos) sin duplicados, en orden de aparición"""
+    extractor = extractor or analizar(html)
+    return list(dict.fromkeys(extractor.tareas))
+
+
+def extraer_estudiantes(html, extractor=None):
+    """
+    Lista de estudiantes [{'id', 'nombre'}].
+    Mismo orden de preferencia que antes: enlaces /student/ con nombre,
+    después data-student-id con nombre y, como último recurso, solo IDs.
+    """
+    extractor = extractor or analizar(html)
+    for pares in (extractor.estudiantes, extractor.estudiantes_data_id):
+        estudiantes = []
+        vistos = set()
+        for est_id, nombre in pares:
+            nombre = nombre.strip()
+            if est_id not in vistos and nombre:
+                estudiantes.append({'id': est_id, 'nombre': nombre})
+                vistos.add(est_id)
+        if estudiantes:
+            return estudiantes
+
+    # Fallback - solo IDs
+    return [{'id': est_id, 'nombre': f'Estudiante_{est_id[:8]}'}
+            for est_id in dict.fromkeys(extractor.ids_estudiante)]
@@ -0,0 +1,319 @@
+"""
+Índice de texto completo de los archivos descargados.
+
+`bot.py indexar` recorre las tareas guardadas (entregas_*.json), localiza en
+disco cada archivo descargado con el mismo plan que usa descargar_como_pdf
+(NombreAlumno_ID.ext) y extrae su texto en un pool de procesos. El texto va
+a una tabla FTS5 de SQLite (índice invertido en disco) enlazada con el
+alumno, la tarea, la clase y el ID del archivo. `bot.py buscar` responde en
+milisegundos, con los fragmentos donde aparece cada coincidencia.
+
+Es incremental: un archivo solo se vuelve a leer si cambió su tamaño o su
+fecha de modificación, y los que ya no están en disco se quitan del índice.
+
+Extracción: PDF con pypdf si está instalado o con `pdftotext` (poppler) si
+está en el PATH; docx/pptx/xlsx/odt/odp/ods con zipfile; texto plano y HTML
+directamente. Los PDF sin extractor disponible no se anotan, así que se
+indexan en cuanto se instale uno.
+"""
+
+import os
+import re
+import time
+import shutil
+import sqlite3
+import zipfile
+import subprocess
+from html import unescape
+
+from descargas import plan_descargas, rutas_descargadas
+from base_datos import ahora
+
+INDICE_POR_DEFECTO = "indice_classroom.sqlite3"
+
+# Texto máximo que se guarda por archivo (un PDF de 500 páginas no aporta más a una búsqueda)
+MAX_CARACTERES = 2_000_000
+
+EXTENSIONES_TEXTO = {'.txt', '.md', '.csv', '.tsv', '.json', '.xml', '.py', '.java', '.c', '.cpp', '.h',
+                     '.js', '.css', '.sql', '.r', '.m', '.ipynb', '.tex', '.rtf'}
+EXTENSIONES_HTML = {'.html', '.htm'}
+# Partes con texto de cada formato de oficina (dentro del zip)
+PARTES_OFIMATICA = {
+    '.docx': r'word/(document|footnotes|endnotes|header\d*|footer\d*)\.xml$',
+    '.pptx': r'ppt/(slides/slide|notesSlides/notesSlide)\d+\.xml$',
+    '.xlsx': r'xl/(sharedStrings|worksheets/sheet\d+)\.xml$',
+    '.odt': r'content\.xml$',
+    '.odp': r'content\.xml$',
+    '.ods': r'content\.xml$',
+}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT UNIQUE NOT NULL,
+    bytes INTEGER,
+    mtime INTEGER,
+    file_id TEXT,
+    estudiante_id TEXT,
+    alumno TEXT,
+    tarea_id TEXT,
+    tarea TEXT,
+    clase_id TEXT,
+    clase TEXT,
+    caracteres INTEGER,
+    error TEXT,
+    indexado TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_documentos_file ON documentos (file_id);
+CREATE INDEX IF NOT EXISTS ix_documentos_estudiante ON documentos (estudiante_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS textos USING fts5(texto, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+# Parámetros :consulta (sintaxis FTS5), :clase, :tarea, :alumno (ID o parte del nombre), :limite
+CONSULTA_BUSCAR = """
+    SELECT d.clase, d.tarea, d.alumno, d.file_id,
+           replace(snippet(textos, 0, '[', ']', '…', 12), char(10), ' ') AS fragmento, d.ruta
+    FROM textos
+    JOIN documentos d ON d.id = textos.rowid
+    WHERE textos MATCH :consulta
+      AND (:clase IS NULL OR d.clase_id = :clase OR d.clase LIKE '%' || :clase || '%')
+      AND (:tarea IS NULL OR d.tarea_id = :tarea OR d.tarea LIKE '%' || :tarea || '%')
+      AND (:alumno IS NULL OR d.estudiante_id = :alumno OR d.alumno LIKE '%' || :alumno || '%')
+    ORDER BY bm25(textos)
+    LIMIT :limite
+"""
+
+
+# ---------------- Extracción (se ejecuta en los procesos del pool) ----------------
+
+_extractor_pdf = None
+
+
+def extractor_pdf():
+    """'pypdf', 'pdftotext' o '' según lo que haya instalado"""
+    global _extractor_pdf
+    if _extractor_pdf is None:
+        try:
+            import pypdf  # noqa: F401
+            _extractor_pdf = 'pypdf'
+        except ImportError:
+            _extractor_pdf = 'pdftotext' if shutil.which('pdftotext') else ''
+    return _extractor_pdf
+
+
+def _texto_pdf(ruta):
+    if extractor_pdf() == 'pypdf':
+        from pypdf import PdfReader
+        return '\n'.join(pagina.extract_text() or '' for pagina in PdfReader(ruta).pages)
+    salida = subprocess.run(['pdftotext', '-q', '-enc', 'UTF-8', ruta, '-'],
+                            capture_output=True, timeout=300, check=True)
+    return salida.stdout.decode('utf-8', 'replace')
+
+
+def _texto_xml(xml):
+    """Texto de un XML de oficina: un salto por párrafo/fila, sin etiquetas"""
+    xml = re.sub(r'</(w:p|a:p|text:p|text:h|row|table:table-row)>', '\n', xml)
+    xml = re.sub(r'<(w:tab|text:tab|c)\b[^>]*>', ' ', xml)
+    return unescape(re.sub(r'<[^>]+>', '', xml))
+
+
+def _texto_ofimatica(ruta, patron):
+    with zipfile.ZipFile(ruta) as z:
+        partes = sorted(n for n in z.namelist() if re.search(patron, n))
+        return '\n'.join(_texto_xml(z.read(n).decode('utf-8', 'replace')) for n in partes)
+
+
+def _texto_plano(ruta):
+    with open(ruta, 'rb') as f:
+        datos = f.read(MAX_CARACTERES * 4)
+    try:
+        return datos.decode('utf-8')
+    except UnicodeDecodeError:
+        return datos.decode('latin-1')
+
+
+def extraer_texto(ruta):
+    """
+    (ruta, texto, error) de un archivo; texto None si el formato no tiene
+    texto o no hay extractor. No lanza excepciones (se usa desde el pool).
+    """
+    ext = os.path.splitext(ruta)[1].lower()
+    try:
+        if ext == '.pdf':
+            if not extractor_pdf():
+                return ruta, None, 'sin extractor de PDF'
+            texto = _texto_pdf(ruta)
+        elif ext in PARTES_OFIMATICA:
+            texto = _texto_ofimatica(ruta, PARTES_OFIMATICA[ext])
+        elif ext in EXTENSIONES_HTML:
+            texto = unescape(re.sub(r'<[^>]+>', ' ', re.sub(r'(?is)<(script|style).*?</\1>', ' ',
+                                                            _texto_plano(ruta))))
+        elif ext in EXTENSIONES_TEXTO:
+            texto = _texto_plano(ruta)
+        else:
+            return ruta, None, None
+    except Exception as e:
+        return ruta, None, f"{type(e).__name__}: {e}"
+    return ruta, re.sub(r'[ \t\r\f\v]+', ' ', texto)[:MAX_CARACTERES], None
+
+
+# ---------------- Índice ----------------
+
+def archivos_de_tareas(tareas, carpeta=None):
+    """
+    Archivos descargados de cada tarea que están en disco, con los datos de
+    su entrega. Se buscan en `carpeta` o, si no se indica, junto al JSON de
+    la tarea (como los deja el modo lote).
+    """
+    encontrados = []
+    for t in tareas:
+        destino = carpeta or os.path.dirname(t['_ruta'])
+        for item in plan_descargas(t.get('entregas', []), destino):
+            for ruta in rutas_descargadas(item):
+                encontrados.append({
+                    'ruta': os.path.abspath(ruta), 'file_id': item['id'],
+                    'estudiante_id': item['estudiante_id'], 'alumno': item['alumno'],
+                    'tarea_id': t.get('tarea_id'), 'tarea': t.get('tarea'),
+                    'clase_id': t.get('clase_id'), 'clase': t.get('clase'),
+                })
+    return encontrados
+
+
+class IndiceTexto:
+    """Índice FTS5 de los archivos descargados, actualizado de forma incremental"""
+
+    def __init__(self, ruta=INDICE_POR_DEFECTO, solo_lectura=False):
+        self.ruta = ruta
+        if solo_lectura:
+            self.conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, timeout=30)
+        else:
+            self.conexion = sqlite3.connect(ruta, timeout=30)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("PRAGMA synchronous=NORMAL")
+            self.conexion.executescript(ESQUEMA)
+        self.estadisticas = {'nuevos': 0, 'cambiados': 0, 'iguales': 0, 'sin_texto': 0, 'errores': 0,
+                             'pendientes_pdf': 0, 'quitados': 0, 'caracteres': 0, 'segundos': 0.0}
+
+    def actualizar(self, archivos, procesos=None, lote=100):
+        """
+        Indexa los archivos nuevos o cambiados (tamaño o fecha) de la lista de
+        archivos_de_tareas() en `procesos` procesos (None = uno por CPU) y
+        quita del índice los que ya no existen.
+        """
+        inicio = time.perf_counter()
+        est = self.estadisticas
+        previos = {ruta: (id_, n, m) for id_, ruta, n, m in
+                   self.conexion.execute("SELECT id, ruta, bytes, mtime FROM documentos")}
+        pendientes = []
+        with self.conexion:
+            for a in archivos:
+                st = os.stat(a['ruta'])
+                a['bytes'], a['mtime'] = st.st_size, st.st_mtime_ns
+                previo = previos.get(a['ruta'])
+                if previo and previo[1:] == (a['bytes'], a['mtime']):
+                    est['iguales'] += 1
+                    # El alumno o la tarea pueden haber cambiado de nombre
+                    self.conexion.execute(
+                        "UPDATE documentos SET file_id = :file_id, estudiante_id = :estudiante_id, "
+                        "alumno = :alumno, tarea_id = :tarea_id, tarea = :tarea, clase_id = :clase_id, "
+                        "clase = :clase WHERE ruta = :ruta", a)
+                else:
+                    a['nuevo'] = previo is None
+                    a['inodo'] = (st.st_dev, st.st_ino)
+                    pendientes.append(a)
+        est['quitados'] += self.podar()
+
+        if pendientes:
+            # Los enlaces del almacén (misma plantilla para toda la clase) se leen una vez
+            por_inodo = {}
+            for a in pendientes:
+                por_inodo.setdefault(a.pop('inodo'), []).append(a)
+            grupos = {g[0]['ruta']: g for g in por_inodo.values()}
+            procesos = min(procesos or os.cpu_count() or 1, len(grupos))
+            print(f"🔍 Indexando {len(pendientes)} archivo(s) ({len(grupos)} distintos) en {procesos} proceso(s)...")
+            if procesos > 1:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=procesos) as pool:
+                    self._guardar(grupos, pool.map(extraer_texto, list(grupos), chunksize=4), lote)
+            else:
+                self._guardar(grupos, map(extraer_texto, list(grupos)), lote)
+        est['segundos'] += time.perf_counter() - inicio
+        return est
+
+    def _guardar(self, grupos, resultados, lote):
+        """Escribe los textos según llegan del pool, en transacciones de `lote` archivos"""
+        est = self.estadisticas
+        fecha = ahora()
+        n = 0
+        for ruta, texto, error in resultados:
+            if texto is None and error == 'sin extractor de PDF':
+                # Sin anotar: se indexará cuando haya pypdf o pdftotext
+                est['pendientes_pdf'] += len(grupos[ruta])
+                continue
+            if error:
+                print(f"   ⚠ {os.path.basename(ruta)}: {error}")
+            for a in grupos[ruta]:
+                self._anotar(a, texto, error, fecha)
+                n += 1
+                if n % lote == 0:
+                    self.conexion.commit()
+        self.conexion.commit()
+
+    def _anotar(self, a, texto, error, fecha):
+        """Inserta o sustituye un documento y su texto (dentro de la transacción en curso)"""
+        est = self.estadisticas
+        if error:
+            est['errores'] += 1
+        elif texto is None:
+            est['sin_texto'] += 1
+        else:
+            est['nuevos' if a['nuevo'] else 'cambiados'] += 1
+            est['caracteres'] += len(texto)
+        self.conexion.execute(
+            "INSERT INTO documentos (ruta, bytes, mtime, file_id, estudiante_id, alumno, tarea_id, tarea, "
+            "clase_id, clase, caracteres, error, indexado) VALUES (:ruta, :bytes, :mtime, :file_id, "
+            ":estudiante_id, :alumno, :tarea_id, :tarea, :clase_id, :clase, :caracteres, :error, :indexado) "
+            "ON CONFLICT (ruta) DO UPDATE SET bytes = excluded.bytes, mtime = excluded.mtime, "
+            "file_id = excluded.file_id, estudiante_id = excluded.estudiante_id, alumno = excluded.alumno, "
+            "tarea_id = excluded.tarea_id, tarea = excluded.tarea, clase_id = excluded.clase_id, "
+            "clase = excluded.clase, caracteres = excluded.caracteres, error = excluded.error, "
+            "indexado = excluded.indexado",
+            dict(a, caracteres=len(texto or ''), error=error, indexado=fecha))
+        id_ = self.conexion.execute("SELECT id FROM documentos WHERE ruta = ?", (a['ruta'],)).fetchone()[0]
+        self.conexion.execute("DELETE FROM textos WHERE rowid = ?", (id_,))
+        if texto:
+            self.conexion.execute("INSERT INTO textos (rowid, texto) VALUES (?, ?)", (id_, texto))
+
+    def podar(self):
+        """Quita del índice los archivos que ya no están en disco; devuelve cuántos"""
+        desaparecidos = [(id_,) for id_, ruta in self.conexion.execute("SELECT id, ruta FROM documentos")
+                         if not os.path.exists(ruta)]
+        with self.conexion:
+            self.conexion.executemany("DELETE FROM textos WHERE rowid = ?", desaparecidos)
+            self.conexion.executemany("DELETE FROM documentos WHERE id = ?", desaparecidos)
+        return len(desaparecidos)
+
+    def buscar(self, consulta, clase=None, tarea=None, alumno=None, limite=50):
+        """(columnas, filas, segundos) de una búsqueda con la sintaxis de FTS5"""
+        inicio = time.perf_counter()
+        cursor = self.conexion.execute(CONSULTA_BUSCAR, {'consulta': consulta, 'clase': clase, 'tarea': tarea,
+                                                         'alumno': alumno, 'limite': limite})
+        filas = cursor.fetchall()
+        return [d[0] for d in cursor.description], filas, time.perf_counter() - inicio
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def informe(self):
+        est = self.estadisticas
+        indexados = est['nuevos'] + est['cambiados']
+        total = self.conexion.execute("SELECT COUNT(*) FROM textos").fetchone()[0]
+        print("\n🔍 ÍNDICE DE TEXTO:")
+        print("-" * 50)
+        print(f"  {indexados} archivo(s) indexados ({est['nuevos']} nuevos, {est['cambiados']} cambiados), "
+              f"{est['iguales']} sin cambios, {est['quitados']} quitados")
+        if est['sin_texto'] or est['errores']:
+            print(f"  {est['sin_texto']} sin texto extraíble, {est['errores']} con error")
+        velocidad = indexados / est['segundos'] if est['segundos'] else 0
+        print(f"  {est['caracteres'] / 1e6:.1f} M caracteres en {est['segundos']:.1f}s ({velocidad:.0f} archivos/s); "
+              f"{total} documento(s) en {self.ruta}")
@@ -0,0 +1,157 @@
+"""
+Modo lote (no interactivo): archiva las tareas seleccionadas de las clases
+seleccionadas en una sola sesión del navegador, sin volver a arrancar ni a
+hacer login por cada tarea.
+
+Selectores (separados por comas):
+    all / todas        -> todo
+    ID exacto          -> esa clase o tarea
+    patrón             -> nombre con comodines, sin distinguir mayúsculas
+                          (p. ej. "4º ESO*", "*práctica*")
+"""
+
+import os
+import fnmatch
+import traceback
+from collections import deque
+
+from descargas import limpiar_nombre
+
+
+def seleccionar(elementos, selector):
+    """Filtra [{'id', 'nombre'}] con un selector de IDs/patrones/all"""
+    if not selector:
+        return list(elementos)
+    partes = [p.strip() for p in selector.split(',') if p.strip()]
+    if any(p.lower() in ('all', 'todas', 'todos', '*') for p in partes):
+        return list(elementos)
+    elegidos = []
+    for elem in elementos:
+        for p in partes:
+            if elem['id'] == p or fnmatch.fnmatch(elem['nombre'].lower(), p.lower()):
+                elegidos.append(elem)
+                break
+    return elegidos
+
+
+class LoteClassroom:
+    """
+    Cola de trabajo (clase, tarea) procesada con un único bot ya logueado.
+    Reutiliza entre tareas lo que no cambia: la lista de clases (nombres).
+    La lista de alumnos es de cada tarea (una tarea puede estar asignada solo
+    a parte de la clase) y sale de la caché de listados del bot si está vigente.
+    """
+
+    def __init__(self, bot, carpeta_base="archivo_classroom", concurrencia=1, descargas=4,
+                 descargar=True, reutilizar_alumnos=True, zip=None, refrescar_listados=False, rehacer=False):
+        self.bot = bot
+        self.carpeta_base = carpeta_base
+        self.concurrencia = concurrencia
+        self.descargas = descargas
+        self.descargar = descargar
+        # False = leer siempre de la página la lista de alumnos de cada tarea (sin caché)
+        self.reutilizar_alumnos = reutilizar_alumnos
+        # Ignorar la caché de listados del bot (y actualizarla)
+        self.refrescar_listados = refrescar_listados
+        # Olvidar lo que dice el manifiesto de cada tarea y visitar a todos los alumnos
+        self.rehacer = rehacer
+        # Compresión del <tarea>.zip ('stored' o 'deflate'; None = archivos sueltos)
+        self.zip = zip
+        self.cola = deque()
+        self.clases = []
+        self.resultados = []
+
+    def planificar(self, sel_clases='all', sel_tareas='all'):
+        """Llena la cola con las tareas seleccionadas de las clases seleccionadas"""
+        if not self.clases:
+            self.clases = self.bot.lista_clases(refrescar=self.refrescar_listados)
+        clases = seleccionar(self.clases, sel_clases)
+        print(f"📚 {len(clases)} clase(s) seleccionadas de {len(self.clases)}")
+
+        for clase in clases:
+            tareas = seleccionar(self.bot.lista_tareas(clase['id'], refrescar=self.refrescar_listados), sel_tareas)
+            print(f"   📝 {clase['nombre']}: {len(tareas)} tarea(s)")
+            for tarea in tareas:
+                self.cola.append({'clase': clase, 'tarea': tarea})
+        return len(self.cola)
+
+    def ejecutar(self):
+        """Procesa la cola; un fallo en una tarea no detiene el resto"""
+        total = len(self.cola)
+        hechas = 0
+        while self.cola:
+            trabajo = self.cola.popleft()
+            hechas += 1
+            clase, tarea = trabajo['clase'], trabajo['tarea']
+            print("\n" + "=" * 60)
+            print(f"[{hechas}/{total}] {clase['nombre']} → {tarea['nombre']}")
+            print("=" * 60)
+            try:
+                self.resultados.append(self.procesar(clase, tarea))
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"✗ Error en la tarea: {e}")
+                traceback.print_exc()
+                self.resultados.append({'clase': clase['nombre'], 'tarea': tarea['nombre'],
+                                        'ok': False, 'error': str(e)})
+        return self.resultados
+
+    def carpeta_tarea(self, clase, tarea):
+        """<carpeta_base>/<clase>/<tarea> (se crea si no existe)"""
+        carpeta = os.path.join(self.carpeta_base, limpiar_nombre(clase['nombre']) or clase['id'],
+                               limpiar_nombre(tarea['nombre']) or tarea['id'])
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    def ruta_zip(self, carpeta, tarea, parte=None):
+        """<carpeta>/<tarea>.zip (o <tarea>_NNNN.zip si la tarea va por partes)"""
+        nombre = limpiar_nombre(tarea['nombre']) or tarea['id']
+        if parte is not None:
+            nombre = f"{nombre}_{parte:04d}"
+        return os.path.join(carpeta, nombre + '.zip')
+
+    def _alumnos(self, clase, tarea):
+        """Alumnos a los que está asignada la tarea: [{'id', 'nombre'}]"""
+        return self.bot.lista_estudiantes(clase['id'], tarea['id'],
+                                          refrescar=self.refrescar_listados or not self.reutilizar_alumnos)
+
+    def procesar(self, clase, tarea):
+        """Extracción + JSON + descarga de una tarea"""
+        from bot import extraer_y_guardar, nombre_json_tarea
+
+        carpeta = self.carpeta_tarea(clase, tarea)
+        if self.rehacer and self.bot.manifiesto:
+            self.bot.manifiesto.olvidar_tarea(clase['id'], tarea['id'])
+
+        # Sin lista, extraer_todas_entregas la toma de la caché o de la página de entregas
+        alumnos = None
+        if self.refrescar_listados or not self.reutilizar_alumnos:
+            alumnos = self._alumnos(clase, tarea)
+        datos, entregas = extraer_y_guardar(self.bot, clase['nombre'], clase['id'], tarea['nombre'], tarea['id'],
+                                            os.path.join(carpeta, nombre_json_tarea(tarea['nombre'])),
+                                            concurrencia=self.concurrencia, estudiantes=alumnos,
+                                            nuevo=self.rehacer)
+
+        descargados = 0
+        if self.descargar and datos['total_archivos'] and self.zip:
+            descargados = self.bot.descargar_en_zip(entregas, self.ruta_zip(carpeta, tarea),
+                                                    concurrencia=self.descargas, compresion=self.zip,
+                                                    tarea_id=tarea['id'])
+        elif self.descargar and datos['total_archivos']:
+            descargados = self.bot.descargar_como_pdf(entregas, carpeta, concurrencia=self.descargas,
+                                                      clase_id=clase['id'], tarea_id=tarea['id'])
+        return {'clase': clase['nombre'], 'tarea': tarea['nombre'], 'ok': True,
+                'alumnos': datos['total_alumnos'], 'archivos': datos['total_archivos'],
+                'descargados': descargados}
+
+    def resumen(self):
+        print("\n📦 RESUMEN DEL LOTE:")
+        print("-" * 60)
+        for r in self.resultados:
+            if r['ok']:
+                print(f"  ✅ {r['clase']} / {r['tarea']}: {r['alumnos']} alumnos, "
+                      f"{r['archivos']} archivos, {r['descargados']} descargados")
+            else:
+                print(f"  ❌ {r['clase']} / {r['tarea']}: {r['error']}")
+        print(f"  {sum(1 for r in self.resultados if r['ok'])}/{len(self.resultados)} tareas completadas")
@@ -0,0 +1,162 @@
+"""
+Manifiesto persistente de extracciones y descargas.
+Permite reanudar una ejecución interrumpida y que las siguientes solo
+procesen los alumnos y archivos que faltan o han cambiado.
+
+Estructura del JSON:
+    clases/<clase_id>/tareas/<tarea_id>/estudiantes/<estudiante_id>
+        -> {'nombre', 'archivos', 'extraido', 'descargas': {<file_id>: {...}}}
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+MANIFIESTO_POR_DEFECTO = "manifiesto_classroom.json"
+
+
+def sha256_archivo(ruta, tam_bloque=1024 * 1024):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def ahora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class Manifiesto:
+    """
+    Estado de extracción/descarga por clase, tarea, alumno y archivo.
+    Los cambios se escriben en disco cada `guardar_cada` (y con volcar(), al
+    terminar cada fase), de forma atómica (archivo temporal + rename): un
+    Ctrl-C o un fallo nunca deja el manifiesto a medias y como mucho se
+    pierden los últimos `guardar_cada` alumnos o archivos.
+    """
+
+    def __init__(self, ruta=MANIFIESTO_POR_DEFECTO, guardar_cada=50):
+        self.ruta = ruta
+        self.guardar_cada = guardar_cada
+        # Cambios aún sin escribir
+        self._sin_guardar = 0
+        # Las descargas paralelas marcan archivos desde varios hilos
+        self._lock = threading.RLock()
+        self.datos = {'version': 1, 'clases': {}}
+        if os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as f:
+                self.datos = json.load(f)
+
+    # ---------------- Acceso ----------------
+
+    def _tarea(self, clase_id, tarea_id):
+        clase = self.datos['clases'].setdefault(clase_id, {'tareas': {}})
+        return clase['tareas'].setdefault(tarea_id, {'estudiantes': {}})
+
+    def _estudiante(self, clase_id, tarea_id, estudiante_id):
+        return self._tarea(clase_id, tarea_id)['estudiantes'].get(estudiante_id)
+
+    def entrega_guardada(self, clase_id, tarea_id, estudiante_id):
+        """
+        Devuelve la entrega ya extraída de un alumno (mismo formato que
+        extraer_todas_entregas) o None si hay que visitarlo. Los alumnos que
+        no tenían archivos se vuelven a visitar: pueden haber entregado tarde.
+        """
+        with self._lock:
+            est = self._estudiante(clase_id, tarea_id, estudiante_id)
+            if not est or not est.get('extraido') or not est.get('archivos'):
+                return None
+            return {
+                'estudiante_id': estudiante_id,
+                'nombre_alumno': est['nombre'],
+                'archivos': est['archivos'],
+            }
+
+    def descarga_vigente(self, clase_id, tarea_id, estudiante_id, file_id, ruta):
+        """
+        True si el archivo ya se descargó y sigue en disco con el mismo tamaño.
+        `ruta` es la del plan: en los archivos subidos no lleva extensión (se
+        decide al descargarlos), así que vale la anotada con su extensión.
+        """
+        with self._lock:
+            est = self._estudiante(clase_id, tarea_id, estudiante_id)
+            if not est:
+                return False
+            info = est.get('descargas', {}).get(file_id)
+        if not info:
+            return False
+        anotada = info.get('ruta', '')
+        if anotada != ruta and os.path.splitext(anotada)[0] != ruta:
+            return False
+        try:
+            return os.path.getsize(anotada) == info['bytes']
+        except OSError:
+            return False
+
+    # ---------------- Registro ----------------
+
+    def marcar_extraido(self, clase_id, tarea_id, entrega):
+        """Registra la entrega de un alumno y guarda el manifiesto"""
+        with self._lock:
+            estudiantes = self._tarea(clase_id, tarea_id)['estudiantes']
+            est = estudiantes.setdefault(entrega['estudiante_id'], {'descargas': {}})
+            ids_nuevos = {a['id'] for a in entrega['archivos']}
+            # Olvidar descargas de archivos que el alumno ya no tiene entregados
+            est['descargas'] = {fid: d for fid, d in est.get('descargas', {}).items() if fid in ids_nuevos}
+            est['nombre'] = entrega['nombre_alumno']
+            est['archivos'] = entrega['archivos']
+            est['extraido'] = ahora()
+            self._cambio()
+
+    def marcar_descargado(self, clase_id, tarea_id, estudiante_id, file_id, ruta, sha256=None):
+        """Registra un archivo descargado (tamaño, hash y fecha) y guarda el manifiesto"""
+        info = {
+            'ruta': ruta,
+            'bytes': os.path.getsize(ruta),
+            'sha256': sha256 or sha256_archivo(ruta),
+            'fecha': ahora(),
+        }
+        with self._lock:
+            estudiantes = self._tarea(clase_id, tarea_id)['estudiantes']
+            est = estudiantes.setdefault(estudiante_id, {'descargas': {}})
+            est.setdefault('descargas', {})[file_id] = info
+            self._cambio()
+
+    def olvidar_tarea(self, clase_id, tarea_id):
+        """Elimina el estado de una tarea para forzar un rastreo completo"""
+        with self._lock:
+            self.datos['clases'].get(clase_id, {}).get('tareas', {}).pop(tarea_id, None)
+            self.guardar()
+
+    def _cambio(self):
+        self._sin_guardar += 1
+        if self._sin_guardar >= self.guardar_cada:
+            self.guardar()
+
+    def volcar(self):
+        """Escribe los cambios pendientes (si los hay)"""
+        with self._lock:
+            if self._sin_guardar:
+                self.guardar()
+
+    def guardar(self):
+        """Escribe el manifiesto de forma atómica"""
+        with self._lock:
+            self._sin_guardar = 0
+            carpeta = os.path.dirname(os.path.abspath(self.ruta))
+            fd, temporal = tempfile.mkstemp(prefix='.manifiesto_', suffix='.tmp', dir=carpeta)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.datos, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporal, self.ruta)
+            except BaseException:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                raise
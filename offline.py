@@ -0,0 +1,144 @@
+"""
+Comandos sin navegador sobre los entregas_*.json ya guardados:
+resumen, exportación CSV (filas o cuaderno de notas), informe de entregas
+que faltan y plan de descargas. No importa Playwright ni abre Chromium.
+"""
+
+import os
+import sys
+import csv
+import json
+import glob
+import contextlib
+
+from descargas import plan_descargas, limpiar_nombre, rutas_descargadas
+from salida_jsonl import leer_entregas
+
+
+def buscar_json(rutas):
+    """Expande archivos, comodines y carpetas (busca entregas_*.json dentro)"""
+    encontrados = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            encontrados.extend(sorted(glob.glob(os.path.join(ruta, '**', 'entregas_*.json'), recursive=True)))
+        elif any(c in ruta for c in '*?['):
+            encontrados.extend(sorted(glob.glob(ruta, recursive=True)))
+        else:
+            encontrados.append(ruta)
+    return list(dict.fromkeys(encontrados))
+
+
+def cargar_tareas(rutas):
+    """Lee los JSON de resultados (o sus .jsonl); cada uno es una tarea con sus entregas"""
+    tareas = []
+    for ruta in buscar_json(rutas):
+        if ruta.endswith('.jsonl'):
+            # Stream de una ejecución a medias (o caída): solo hay entregas
+            nombre = os.path.splitext(os.path.basename(ruta))[0]
+            if nombre.startswith('entregas_'):
+                nombre = nombre[len('entregas_'):]
+            datos = {'tarea': nombre, 'entregas': list(leer_entregas(ruta))}
+        else:
+            with open(ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+        datos['_ruta'] = ruta
+        tareas.append(datos)
+    return tareas
+
+
+def _salida(ruta):
+    """Abre el archivo de salida (o stdout con '-')"""
+    if ruta in (None, '-'):
+        return contextlib.nullcontext(sys.stdout)
+    # utf-8-sig para que Excel reconozca los acentos
+    return open(ruta, 'w', encoding='utf-8-sig', newline='')
+
+
+# ---------------- Comandos ----------------
+
+def resumen(tareas):
+    """Estadísticas por tarea y totales"""
+    print(f"{'tarea':<40} {'alumnos':>8} {'con arch.':>9} {'archivos':>9}")
+    print("-" * 70)
+    totales = [0, 0, 0]
+    for t in tareas:
+        entregas = t.get('entregas', [])
+        fila = [len(entregas), sum(1 for e in entregas if e['archivos']), sum(len(e['archivos']) for e in entregas)]
+        nombre = f"{t.get('clase', '')} / {t.get('tarea', '')}"[:40]
+        print(f"{nombre:<40} {fila[0]:>8} {fila[1]:>9} {fila[2]:>9}")
+        totales = [a + b for a, b in zip(totales, fila)]
+    print("-" * 70)
+    print(f"{f'TOTAL ({len(tareas)} tareas)':<40} {totales[0]:>8} {totales[1]:>9} {totales[2]:>9}")
+
+
+def exportar_csv(tareas, salida=None, formato='filas'):
+    """
+    formato='filas':    una fila por alumno y tarea (con las URLs)
+    formato='cuaderno': una fila por alumno y una columna por tarea (nº de archivos)
+    """
+    with _salida(salida) as f:
+        escritor = csv.writer(f, delimiter=';')
+        if formato == 'cuaderno':
+            columnas = [(t.get('clase_id'), t.get('tarea_id'), t.get('tarea', '')) for t in tareas]
+            alumnos = {}
+            for i, t in enumerate(tareas):
+                for e in t.get('entregas', []):
+                    fila = alumnos.setdefault(e['estudiante_id'], {'nombre': e['nombre_alumno'], 'n': {}})
+                    fila['n'][i] = len(e['archivos'])
+            escritor.writerow(['alumno', 'estudiante_id'] + [c[2] for c in columnas] + ['entregadas'])
+            for est_id, fila in sorted(alumnos.items(), key=lambda x: x[1]['nombre'].lower()):
+                celdas = [fila['n'].get(i, '') for i in range(len(columnas))]
+                entregadas = sum(1 for n in fila['n'].values() if n)
+                escritor.writerow([fila['nombre'], est_id] + celdas + [entregadas])
+        else:
+            escritor.writerow(['clase', 'tarea', 'tarea_id', 'alumno', 'estudiante_id', 'archivos', 'urls'])
+            for t in tareas:
+                for e in t.get('entregas', []):
+                    escritor.writerow([t.get('clase', ''), t.get('tarea', ''), t.get('tarea_id', ''),
+                                       e['nombre_alumno'], e['estudiante_id'], len(e['archivos']),
+                                       ' '.join(a['url'] for a in e['archivos'])])
+    if salida not in (None, '-'):
+        print(f"✓ CSV guardado en {salida}")
+
+
+def faltan(tareas):
+    """Alumnos sin archivos entregados, por tarea y por alumno"""
+    por_alumno = {}
+    for t in tareas:
+        sin_entregar = [e for e in t.get('entregas', []) if not e['archivos']]
+        print(f"\n❌ {t.get('clase', '')} / {t.get('tarea', '')}: "
+              f"{len(sin_entregar)} de {len(t.get('entregas', []))} sin entregar")
+        for e in sin_entregar:
+            print(f"   - {e['nombre_alumno']}")
+            por_alumno.setdefault(e['nombre_alumno'], []).append(t.get('tarea', ''))
+    if len(tareas) > 1 and por_alumno:
+        print("\n📋 TAREAS PENDIENTES POR ALUMNO:")
+        for nombre, pendientes in sorted(por_alumno.items(), key=lambda x: (-len(x[1]), x[0].lower())):
+            print(f"  {len(pendientes):>3}  {nombre}: {', '.join(pendientes)}")
+
+
+def plan(tareas, carpeta_base='descargas', salida=None):
+    """
+    Plan de descargas (lo que haría descargar_como_pdf) sin navegador.
+    Marca qué archivos ya están en disco (los subidos, con la extensión que
+    se les puso al descargarlos).
+    """
+    elementos = []
+    for t in tareas:
+        carpeta = os.path.join(carpeta_base, limpiar_nombre(t.get('clase', '')) or t.get('clase_id', ''),
+                               limpiar_nombre(t.get('tarea', '')) or t.get('tarea_id', ''))
+        for item in plan_descargas(t.get('entregas', []), carpeta):
+            item['tarea_id'] = t.get('tarea_id')
+            item['existe'] = bool(rutas_descargadas(item))
+            elementos.append(item)
+
+    pendientes = sum(1 for i in elementos if not i['existe'])
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(elementos, f, ensure_ascii=False, indent=2)
+        print(f"✓ Plan guardado en {salida}")
+    else:
+        for i in elementos:
+            print(f"{'✓' if i['existe'] else '⬇'} {i['ruta']}  ←  {i['url']}")
+    print(f"\n{len(elementos)} archivo(s) en el plan, {pendientes} pendiente(s) de descargar")
+    return elementos
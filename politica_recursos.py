@@ -0,0 +1,117 @@
+"""
+Política de recursos: bloquea en el contexto del navegador las peticiones que
+no hacen falta para leer Classroom (imágenes, avatares, fuentes, vídeo,
+analítica...) y cuenta, por fase del bot, lo permitido y lo bloqueado.
+
+Nota: con context.route() activo Playwright desactiva la caché HTTP del
+navegador, así que conviene comparar una ejecución con y sin política
+(solo_medir=True cuenta sin bloquear nada).
+"""
+
+import fnmatch
+
+# Tipos de recurso que nunca se leen al extraer entregas
+TIPOS_BLOQUEADOS = ['image', 'media', 'font']
+
+# Patrones de URL (fnmatch) que se bloquean aunque su tipo esté permitido
+URLS_BLOQUEADAS = [
+    '*google-analytics.com/*',
+    '*googletagmanager.com/*',
+    '*doubleclick.net/*',
+    '*play.google.com/log*',
+    '*/gen_204*',
+    '*/jserror*',
+    '*i.ytimg.com/*',
+    '*lh3.googleusercontent.com/*',
+    '*drive.google.com/thumbnail*',
+]
+
+# Patrones que siempre se dejan pasar (tienen prioridad sobre lo anterior).
+# El login se deja intacto para no disparar comprobaciones anti-bot.
+URLS_PERMITIDAS = [
+    '*accounts.google.com/*',
+    '*/export?format=*',
+    '*/export/pdf*',
+    '*uc?export=download*',
+]
+
+
+class PoliticaRecursos:
+    """Decide qué peticiones se bloquean y lleva los contadores por fase"""
+
+    def __init__(self, tipos_bloqueados=None, urls_bloqueadas=None, urls_permitidas=None, solo_medir=False):
+        self.tipos_bloqueados = set(TIPOS_BLOQUEADOS if tipos_bloqueados is None else tipos_bloqueados)
+        self.urls_bloqueadas = list(URLS_BLOQUEADAS if urls_bloqueadas is None else urls_bloqueadas)
+        self.urls_permitidas = list(URLS_PERMITIDAS if urls_permitidas is None else urls_permitidas)
+        self.solo_medir = solo_medir
+        self.fase = 'inicio'
+        # fase -> {'permitidas', 'bloqueadas', 'bytes', 'bytes_bloqueables', 'bloqueadas_por_tipo': {}}
+        self.contadores = {}
+
+    def permitir(self, url, tipo):
+        """True si la petición debe seguir adelante"""
+        if any(fnmatch.fnmatchcase(url, p) for p in self.urls_permitidas):
+            return True
+        if tipo in self.tipos_bloqueados:
+            return False
+        return not any(fnmatch.fnmatchcase(url, p) for p in self.urls_bloqueadas)
+
+    def _contador(self):
+        return self.contadores.setdefault(
+            self.fase, {'permitidas': 0, 'bloqueadas': 0, 'bytes': 0, 'bytes_bloqueables': 0,
+                        'bloqueadas_por_tipo': {}}
+        )
+
+    # ---------------- Integración con Playwright ----------------
+
+    def instalar(self, contexto):
+        """Registra la ruta y el contador de bytes en el contexto"""
+        contexto.route('**/*', self._al_enrutar)
+        contexto.on('response', self._al_responder)
+        return self
+
+    def _al_enrutar(self, route, request):
+        contador = self._contador()
+        if self.permitir(request.url, request.resource_type):
+            contador['permitidas'] += 1
+            route.continue_()
+            return
+
+        # En solo_medir se cuenta lo que se habría bloqueado, pero se deja pasar
+        contador['bloqueadas'] += 1
+        por_tipo = contador['bloqueadas_por_tipo']
+        por_tipo[request.resource_type] = por_tipo.get(request.resource_type, 0) + 1
+        if self.solo_medir:
+            route.continue_()
+        else:
+            route.abort('blockedbyclient')
+
+    def _al_responder(self, respuesta):
+        # Content-Length ya viene en las cabeceras: no cuesta otra llamada
+        try:
+            n = int(respuesta.headers.get('content-length', 0))
+        except (ValueError, TypeError):
+            return
+        contador = self._contador()
+        contador['bytes'] += n
+        # Solo hay respuestas de lo "bloqueable" en modo solo_medir: es el ahorro
+        if not self.permitir(respuesta.url, respuesta.request.resource_type):
+            contador['bytes_bloqueables'] += n
+
+    def informe(self):
+        """Muestra peticiones y bytes por fase"""
+        if not self.contadores:
+            return
+        modo = " (solo medición: ✗ = se habría bloqueado)" if self.solo_medir else ""
+        print(f"\n🧱 RECURSOS POR FASE{modo}:")
+        print("-" * 60)
+        total = {'permitidas': 0, 'bloqueadas': 0, 'bytes': 0}
+        for fase, c in self.contadores.items():
+            tipos = ', '.join(f"{t}:{n}" for t, n in sorted(c['bloqueadas_por_tipo'].items()))
+            ahorro = f" ({c['bytes_bloqueables'] / 1e6:.1f} MB)" if self.solo_medir else ""
+            print(f"  {fase:<12} ✓ {c['permitidas']:>6} ({c['bytes'] / 1e6:7.1f} MB)"
+                  f"   ✗ {c['bloqueadas']:>6}{ahorro}  {tipos}")
+            for clave in total:
+                total[clave] += c[clave]
+        print(f"  {'TOTAL':<12} ✓ {total['permitidas']:>6} ({total['bytes'] / 1e6:7.1f} MB)"
+              f"   ✗ {total['bloqueadas']:>6}")
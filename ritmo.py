@@ -0,0 +1,136 @@
+"""
+Control de ritmo compartido por todas las navegaciones y descargas.
+
+Cubo de fichas (token bucket) cuya tasa se ajusta como AIMD: cada petición
+que sale bien sube la tasa un poco (suma), y cada señal de frenado de Google
+(429/503 en las exportaciones, la página de "tráfico inusual" /sorry/, o una
+redirección al login a mitad de ejecución) la divide (multiplica por
+`factor`) y pausa todo durante un tiempo con backoff exponencial y jitter.
+Sustituye a las pausas fijas de 1 s entre alumnos y entre archivos.
+"""
+
+import time
+import random
+import threading
+
+# Motivos de frenado tras los que merece la pena reintentar la misma petición
+REINTENTABLES = ('http_429', 'http_503', 'trafico_inusual')
+
+# Reintentos de una misma petición frenada antes de darla por fallida
+REINTENTOS_FRENADO = 3
+
+
+def motivo_frenado(status=None, url_final='', url_pedida=''):
+    """Devuelve el motivo si la respuesta indica que Google nos está frenando; si no, None"""
+    if status == 429:
+        return 'http_429'
+    if status == 503:
+        return 'http_503'
+    if 'google.com/sorry' in url_final or '/sorry/index' in url_final:
+        return 'trafico_inusual'
+    if 'accounts.google.com' in url_final and 'accounts.google.com' not in url_pedida:
+        return 'login'
+    return None
+
+
+def segundos_retry_after(cabeceras):
+    """Segundos de la cabecera Retry-After (solo el formato numérico)"""
+    valor = (cabeceras.get('Retry-After') or '').strip() if cabeceras else ''
+    return float(valor) if valor.isdigit() else None
+
+
+class Frenado(Exception):
+    """Google ha respondido con una señal de frenado (ver motivo_frenado)"""
+
+    def __init__(self, motivo, espera=None):
+        super().__init__(f"frenado por Google ({motivo})")
+        self.motivo = motivo
+        self.espera = espera
+
+
+class ControlRitmo:
+    """
+    Cubo de fichas con tasa adaptativa (peticiones por segundo).
+    Es seguro entre hilos: lo usan a la vez la pestaña y el pool de descargas.
+    """
+
+    def __init__(self, tasa_inicial=1.0, tasa_min=0.2, tasa_max=5.0, incremento=0.05, factor=0.5,
+                 rafaga=2, pausa_base=5.0, pausa_max=300.0, jitter=0.25):
+        self.tasa = tasa_inicial
+        self.tasa_min = tasa_min
+        self.tasa_max = tasa_max
+        self.incremento = incremento
+        self.factor = factor
+        self.rafaga = rafaga
+        self.pausa_base = pausa_base
+        self.pausa_max = pausa_max
+        self.jitter = jitter
+        self.fichas = float(rafaga)
+        self.consecutivos = 0
+        self.peticiones = 0
+        self.esperado = 0.0
+        self.tasa_pico = tasa_inicial
+        # [{'t', 'motivo', 'tasa', 'pausa'}]
+        self.eventos = []
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Espera (fuera del lock) hasta poder hacer la siguiente petición"""
+        with self._lock:
+            ahora = time.monotonic()
+            self.fichas = min(self.rafaga, self.fichas + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            espera = max(0.0, self._pausa_hasta - ahora)
+            if self.fichas < 1:
+                espera = max(espera, (1 - self.fichas) / self.tasa)
+            if espera:
+                # Un poco de jitter para no pedir a intervalos exactos
+                espera += random.uniform(0, self.jitter / self.tasa)
+            # La ficha se reserva ya: los siguientes esperan detrás
+            self.fichas -= 1
+            self.peticiones += 1
+            self.esperado += espera
+        if espera:
+            time.sleep(espera)
+        return espera
+
+    def exito(self):
+        """Subida aditiva tras una petición sin frenado"""
+        with self._lock:
+            self.consecutivos = 0
+            self.tasa = min(self.tasa_max, self.tasa + self.incremento)
+            self.tasa_pico = max(self.tasa_pico, self.tasa)
+
+    def frenado(self, motivo, espera=None):
+        """
+        Bajada multiplicativa y pausa con backoff exponencial + jitter.
+        Varias señales dentro de la misma pausa (p. ej. de varias descargas a
+        la vez) solo bajan la tasa una vez.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            en_pausa = ahora < self._pausa_hasta
+            if not en_pausa:
+                self.consecutivos += 1
+                self.tasa = max(self.tasa_min, self.tasa * self.factor)
+            base = espera or self.pausa_base * 2 ** (self.consecutivos - 1)
+            pausa = min(self.pausa_max, base) * random.uniform(1, 1 + self.jitter)
+            self._pausa_hasta = max(self._pausa_hasta, ahora + pausa)
+            self.fichas = min(self.fichas, 0.0)
+            self.eventos.append({'t': time.time(), 'motivo': motivo, 'tasa': self.tasa, 'pausa': pausa})
+        if not en_pausa:
+            print(f"🐢 Google está frenando ({motivo}): pausa de {pausa:.0f}s, ritmo {self.tasa:.2f} pet/s")
+
+    def informe(self):
+        """Ritmo actual, pico y eventos de frenado por motivo"""
+        print("\n🚦 RITMO DE PETICIONES:")
+        print("-" * 50)
+        print(f"  {self.peticiones} peticiones, {self.esperado:.1f}s de espera por ritmo")
+        print(f"  ritmo actual {self.tasa:.2f} pet/s (pico {self.tasa_pico:.2f}, máx. {self.tasa_max:.2f})")
+        if self.eventos:
+            motivos = {}
+            for e in self.eventos:
+                motivos[e['motivo']] = motivos.get(e['motivo'], 0) + 1
+            print(f"  frenados: {', '.join(f'{m} x{n}' for m, n in motivos.items())}")
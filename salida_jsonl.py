@@ -0,0 +1,148 @@
+"""
+Salida en streaming de las entregas: una línea JSON compacta por alumno,
+escrita (flush + fsync) en cuanto se extrae. Si el proceso se cae a mitad,
+lo ya extraído sigue en disco, y durante una ejecución larga el archivo se
+puede seguir con `tail -f`.
+
+El JSON de resumen de siempre (entregas_*.json) se genera al final leyendo
+el stream, sin tener todas las entregas en memoria.
+"""
+
+import os
+import json
+import textwrap
+
+
+def ruta_jsonl(ruta_json):
+    """entregas_X.json -> entregas_X.jsonl"""
+    return os.path.splitext(ruta_json)[0] + '.jsonl'
+
+
+class EscritorEntregas:
+    """
+    Añade una entrega por línea; fsync cada `sincronizar_cada` entregas.
+    Por defecto el stream empieza de cero (lo ya hecho lo repone el
+    manifiesto). Con `continuar` se escribe detrás de lo que dejó una
+    ejecución anterior: un alumno repetido vale por su última línea.
+    """
+
+    def __init__(self, ruta, sincronizar_cada=1, continuar=False):
+        self.ruta = ruta
+        self.sincronizar_cada = max(1, sincronizar_cada)
+        self.escritas = 0
+        self._sin_sincronizar = 0
+        if continuar:
+            _quitar_linea_cortada(ruta)
+        self._f = open(ruta, 'a' if continuar else 'w', encoding='utf-8')
+
+    def escribir(self, entrega):
+        self._f.write(json.dumps(entrega, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._f.flush()
+        self.escritas += 1
+        self._sin_sincronizar += 1
+        if self._sin_sincronizar >= self.sincronizar_cada:
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Fuerza a disco lo escrito hasta ahora"""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._sin_sincronizar = 0
+
+    def cerrar(self):
+        if not self._f.closed:
+            self.sincronizar()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def _quitar_linea_cortada(ruta):
+    """Recorta la última línea si quedó a medias (caída durante la escritura)"""
+    try:
+        f = open(ruta, 'r+b')
+    except FileNotFoundError:
+        return
+    with f:
+        fin = f.seek(0, os.SEEK_END)
+        posicion = fin
+        while posicion > 0:
+            bloque = min(64 * 1024, posicion)
+            f.seek(posicion - bloque)
+            datos = f.read(bloque)
+            salto = datos.rfind(b'\n')
+            if salto != -1:
+                posicion = posicion - bloque + salto + 1
+                break
+            posicion -= bloque
+        if posicion < fin:
+            f.truncate(posicion)
+
+
+def _lineas(ruta):
+    """(posición, entrega) de cada línea válida; la última puede estar cortada"""
+    with open(ruta, 'rb') as f:
+        while True:
+            posicion = f.tell()
+            linea = f.readline()
+            if not linea:
+                return
+            try:
+                yield posicion, json.loads(linea)
+            except ValueError:
+                continue
+
+
+def leer_entregas(ruta):
+    """Itera las entregas del stream (se salta una línea final incompleta)"""
+    for _, entrega in _lineas(ruta):
+        yield entrega
+
+
+def escribir_resumen(ruta_jsonl, ruta_json, cabecera, orden=None):
+    """
+    Genera el JSON de resumen a partir del stream, en dos pasadas: la primera
+    calcula las estadísticas y dónde empieza cada alumno (si un alumno sale
+    dos veces vale la última), la segunda copia las entregas una a una.
+    `orden` (lista de estudiante_id) fija el orden de salida; los que no
+    estén en ella van detrás, en el orden del stream.
+    Devuelve el resumen sin la lista de entregas.
+    """
+    indice = {}   # estudiante_id -> (posición en el stream, nº de archivos)
+    for posicion, entrega in _lineas(ruta_jsonl):
+        indice[entrega['estudiante_id']] = (posicion, len(entrega['archivos']))
+
+    ids = [i for i in dict.fromkeys(orden or []) if i in indice]
+    vistos = set(ids)
+    ids += [i for i in indice if i not in vistos]
+
+    resumen = dict(cabecera)
+    resumen['total_alumnos'] = len(ids)
+    resumen['alumnos_con_archivos'] = sum(1 for i in ids if indice[i][1])
+    resumen['total_archivos'] = sum(indice[i][1] for i in ids)
+
+    # Mismo formato que json.dump(..., indent=2), escrito de forma atómica
+    temporal = ruta_json + '.tmp'
+    with open(ruta_jsonl, 'rb') as origen, open(temporal, 'w', encoding='utf-8') as f:
+        f.write('{\n')
+        for clave, valor in resumen.items():
+            f.write(f"  {json.dumps(clave)}: {json.dumps(valor, ensure_ascii=False)},\n")
+        if not ids:
+            f.write('  "entregas": []\n}')
+        else:
+            f.write('  "entregas": [\n')
+            for n, est_id in enumerate(ids):
+                origen.seek(indice[est_id][0])
+                entrega = json.loads(origen.readline())
+                texto = json.dumps(entrega, ensure_ascii=False, indent=2)
+                f.write(textwrap.indent(texto, '    ') + (',\n' if n < len(ids) - 1 else '\n'))
+            f.write('  ]\n}')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta_json)
+    print(f"✓ Guardado en {ruta_json}")
+    return resumen
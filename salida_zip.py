@@ -0,0 +1,155 @@
+"""
+Salida en un .zip por tarea: cada archivo descargado se escribe por bloques
+directamente como entrada del ZIP (sin pasar por una carpeta ni archivos
+temporales), así que la memoria no depende del tamaño de los archivos.
+
+Un ZIP solo admite escribir una entrada a la vez: las descargas en paralelo
+esperan su turno con la respuesta ya abierta (la exportación a PDF, que es
+lo lento, sí se solapa) y luego vuelcan el cuerpo. Las entradas llevan
+ZIP64 para no tener límite de 4 GB. El ZIP se escribe como <ruta>.part y se
+renombra al cerrarlo, con un manifiesto.json que describe su contenido; si
+la exportación falla a medias, el .part se borra y no queda un ZIP incompleto.
+"""
+
+import os
+import json
+import shutil
+import zipfile
+import threading
+import contextlib
+from datetime import datetime
+
+from almacen import con_extension
+from descargas import extension_descarga
+
+COMPRESIONES = {
+    # Los PDF ya van comprimidos: por defecto se guardan tal cual
+    'stored': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+}
+
+MANIFIESTO_ZIP = "manifiesto.json"
+
+
+class ArchivoZip:
+    """ZIP de una tarea al que se añaden archivos en streaming desde varios hilos"""
+
+    def __init__(self, ruta, compresion='stored', tam_bloque=64 * 1024):
+        self.ruta = ruta
+        self.tam_bloque = tam_bloque
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._zip = zipfile.ZipFile(ruta + '.part', 'w', compression=COMPRESIONES[compresion], allowZip64=True)
+        self._lock = threading.Lock()
+        # (estudiante_id, file_id) -> nombre de la entrada en el ZIP (para el manifiesto)
+        self.entradas = {}
+        self.bytes = 0
+
+    def _nombre_libre(self, nombre):
+        """Evita entradas repetidas (dos alumnos con el mismo nombre y archivo)"""
+        base, ext = os.path.splitext(nombre)
+        n = 1
+        while nombre in self._zip.NameToInfo:
+            n += 1
+            nombre = f"{base}_{n}{ext}"
+        return nombre
+
+    @contextlib.contextmanager
+    def abrir(self, item, tipo=None, nombre_servidor=None):
+        """
+        Abre la entrada de un elemento del plan para escribir en ella.
+        Si el bloque falla, la entrada a medias se quita del ZIP.
+        """
+        item = con_extension(item, extension_descarga(item['formato'], tipo, nombre_servidor))
+        with self._lock:
+            nombre = self._nombre_libre(item['nombre'])
+            info = zipfile.ZipInfo(nombre, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = self._zip.compression
+            # Deshacer = volver a escribir desde donde empezaba esta entrada
+            inicio = self._zip.start_dir
+            try:
+                with self._zip.open(info, 'w', force_zip64=True) as entrada:
+                    yield entrada
+            except BaseException:
+                if info in self._zip.filelist:
+                    self._zip.filelist.remove(info)
+                self._zip.NameToInfo.pop(nombre, None)
+                self._zip.start_dir = inicio
+                self._zip.fp.seek(inicio)
+                self._zip.fp.truncate()
+                raise
+            self.entradas[(item['estudiante_id'], item['id'])] = nombre
+            self.bytes += info.file_size
+
+    def agregar_archivo(self, item, ruta_origen, nombre_servidor=None):
+        """Copia por bloques un archivo ya en disco (almacén o descarga del navegador)"""
+        with open(ruta_origen, 'rb') as origen, \
+                self.abrir(item, nombre_servidor=nombre_servidor or os.path.basename(ruta_origen)) as entrada:
+            shutil.copyfileobj(origen, entrada, self.tam_bloque)
+
+    def agregar_json(self, nombre, datos):
+        with self._lock:
+            self._zip.writestr(nombre, json.dumps(datos, ensure_ascii=False, indent=2),
+                               compress_type=zipfile.ZIP_DEFLATED)
+
+    def cerrar(self):
+        """Escribe el directorio central y deja el ZIP en su ruta final"""
+        if self._zip.fp is None:
+            return
+        self._zip.close()
+        os.replace(self.ruta + '.part', self.ruta)
+
+    def descartar(self):
+        """Cierra el ZIP a medias y borra el .part (un ZIP sin terminar no se puede retomar)"""
+        if self._zip.fp is None:
+            return
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.ruta + '.part')
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        # Solo se publica con su nombre final si la exportación terminó bien
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
+
+
+def manifiesto_zip(entregas, plan, resultados, entradas):
+    """
+    Contenido de manifiesto.json: los alumnos con sus archivos y, por archivo,
+    la entrada del ZIP (o el error si no se pudo descargar).
+    """
+    por_id = {(item['estudiante_id'], item['id']): r for item, r in zip(plan, resultados)}
+    alumnos = []
+    for entrega in entregas:
+        archivos = []
+        for archivo in entrega['archivos']:
+            clave = (entrega['estudiante_id'], archivo['id'])
+            r = por_id.get(clave, {})
+            archivos.append({
+                'id': archivo['id'],
+                'url': archivo['url'],
+                'entrada': entradas.get(clave),
+                'bytes': r.get('bytes'),
+                'sha256': r.get('sha256'),
+                'error': None if clave in entradas else r.get('error') or "no descargado",
+            })
+        alumnos.append({'estudiante_id': entrega['estudiante_id'], 'nombre_alumno': entrega['nombre_alumno'],
+                        'archivos': archivos})
+    return {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'total_alumnos': len(entregas),
+        'total_archivos': sum(len(a['archivos']) for a in alumnos),
+        'en_zip': len(entradas),
+        'alumnos': alumnos,
+    }
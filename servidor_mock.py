@@ -0,0 +1,318 @@
+"""
+Servidor HTTP local que reproduce respuestas grabadas de Classroom.
+Sirve para probar el modo captura de red (y el resto del bot) sin tocar
+Google: se graba una vez con CapturaRespuestas.guardar_grabacion() y luego
+se apunta el bot a este servidor con base_url=.
+
+También puede servir un Classroom sintético (ClassroomSintetico) con el
+tamaño que se quiera, para medir el bot de punta a punta
+(ver benchmarks/bench_e2e.py).
+
+Uso:
+    python servidor_mock.py grabacion.json [puerto]
+    python servidor_mock.py --sintetico N_ALUMNOS [puerto]
+"""
+
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+HOST_ORIGINAL = "https://classroom.google.com"
+RUTA_BATCHEXECUTE = "/_/ClassroomUi/data/batchexecute"
+
+
+class ServidorMock:
+    """
+    Servidor en un hilo aparte. Las respuestas se buscan por ruta + query
+    (sin el host); las URLs absolutas de Classroom en los cuerpos se
+    reescriben para que apunten a este servidor.
+    """
+
+    def __init__(self, grabaciones=None, puerto=0, cortar_en=None):
+        self.rutas = {}
+        # Cortar la primera respuesta de cada ruta tras `cortar_en` bytes (prueba de reanudación)
+        self.cortar_en = cortar_en
+        self._cortadas = set()
+        # [(prefijo, funcion(ruta) -> (status, content_type, cuerpo))]
+        self.dinamicas = []
+        self.peticiones = []
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', puerto), self._crear_manejador())
+        self.puerto = self._servidor.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.puerto}"
+        self._hilo = None
+        for captura in grabaciones or []:
+            self.agregar(captura['url'], captura['body'], captura.get('content_type', 'text/html'),
+                         captura.get('status', 200))
+
+    @classmethod
+    def desde_archivo(cls, ruta, puerto=0):
+        with open(ruta, encoding='utf-8') as f:
+            return cls(json.load(f), puerto)
+
+    @staticmethod
+    def _clave(url):
+        partes = urllib.parse.urlsplit(url)
+        return partes.path + ('?' + partes.query if partes.query else '')
+
+    def agregar(self, url, cuerpo, content_type='text/html; charset=utf-8', status=200):
+        """Registra la respuesta para una URL (absoluta o solo ruta)"""
+        self.rutas[self._clave(url)] = (status, content_type, cuerpo)
+
+    def agregar_dinamica(self, prefijo, funcion):
+        """Responde a las rutas que empiezan por `prefijo` con funcion(ruta)"""
+        self.dinamicas.append((prefijo, funcion))
+
+    def responder(self, ruta):
+        """Devuelve (status, content_type, bytes) para una ruta pedida"""
+        respuesta = self.rutas.get(ruta) or self.rutas.get(ruta.split('?')[0])
+        if not respuesta:
+            for prefijo, funcion in self.dinamicas:
+                if ruta.startswith(prefijo):
+                    respuesta = funcion(ruta)
+                    break
+        if not respuesta:
+            return 404, 'text/plain', b'no grabado'
+        status, content_type, cuerpo = respuesta
+        if isinstance(cuerpo, str):
+            cuerpo = cuerpo.replace(HOST_ORIGINAL, self.base_url).encode('utf-8')
+        return status, content_type, cuerpo
+
+    def _crear_manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def _servir(self):
+                servidor.peticiones.append(self.path)
+                status, content_type, cuerpo = servidor.responder(self.path)
+                etag = '"' + hashlib.sha1(cuerpo).hexdigest() + '"'
+                inicio = 0
+                # Range "bytes=N-" (con If-Range, solo si el ETag coincide), como Drive
+                rango = re.match(r'bytes=(\d+)-$', self.headers.get('Range') or '')
+                if status == 200 and rango and self.headers.get('If-Range', etag) == etag:
+                    inicio = int(rango.group(1))
+                    if inicio >= len(cuerpo):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{len(cuerpo)}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    status = 206
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(cuerpo) - inicio))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('ETag', etag)
+                if status == 206:
+                    self.send_header('Content-Range', f"bytes {inicio}-{len(cuerpo) - 1}/{len(cuerpo)}")
+                self.end_headers()
+                if self.command == 'HEAD':
+                    return
+                if servidor.cortar_en and self.path not in servidor._cortadas and len(cuerpo) > servidor.cortar_en:
+                    servidor._cortadas.add(self.path)
+                    self.wfile.write(cuerpo[inicio:inicio + servidor.cortar_en])
+                    self.close_connection = True
+                    return
+                self.wfile.write(cuerpo[inicio:])
+
+            do_GET = do_POST = do_HEAD = _servir
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+class ClassroomSintetico:
+    """
+    Classroom generado de forma determinista: clases, tareas, alumnos y
+    entregas con las mismas estructuras que lee el bot (enlaces /c/ID con
+    .YVvGBb, [data-item-id], enlaces /student/ID y div.clmEye[data-url]),
+    más exportaciones falsas (/export, uc?export=download) con la latencia
+    y el tamaño que se indiquen.
+
+    Como en el Classroom real, la vista de calificación /g/tg/CLASE/TAREA
+    lleva el alumno en el fragmento (#u=ID), que no llega al servidor: la
+    página lo lee con JavaScript y pide sus adjuntos por XHR, también al
+    cambiar el fragmento sin recargar. Con `fallo_spa` (0..1) esa fracción de
+    cambios de fragmento se ignora y el DOM sigue mostrando al alumno
+    anterior, como le pasa a veces al Classroom real.
+
+    La página de entregas trae además los datos que lee el modo captura de
+    red, con el formato de Google: la primera mitad de los alumnos embebida
+    en el HTML (AF_initDataCallback) y la otra en un batchexecute que la
+    página pide por XHR.
+    """
+
+    TIPOS = ('document', 'presentation', 'spreadsheets', 'file')
+
+    def __init__(self, n_clases=1, n_tareas=1, n_alumnos=30, max_archivos=2, tam_archivo=100 * 1024,
+                 latencia_pagina=0.0, latencia_exportacion=0.0, fallo_spa=0.0):
+        self.n_clases = n_clases
+        self.n_tareas = n_tareas
+        self.n_alumnos = n_alumnos
+        self.max_archivos = max_archivos
+        self.latencia_pagina = latencia_pagina
+        self.latencia_exportacion = latencia_exportacion
+        self.fallo_spa = fallo_spa
+        self.pdf = (b'%PDF-1.4\n' + b'0' * tam_archivo)[:max(tam_archivo, 9)]
+
+    # ---------------- Datos ----------------
+
+    def clases(self):
+        return [{'id': f"C{c + 1:09d}", 'nombre': f"Clase sintética {c + 1}"} for c in range(self.n_clases)]
+
+    def tareas(self, clase_id):
+        c = int(clase_id[1:])
+        # IDs numéricos de 15+ cifras, como los que reconoce extractor_html
+        return [{'id': f"{c:05d}{t + 1:010d}", 'nombre': f"Tarea {t + 1}"} for t in range(self.n_tareas)]
+
+    def alumnos(self, clase_id):
+        c = int(clase_id[1:])
+        return [{'id': f"{c:04d}{i + 1:016d}", 'nombre': f"Alumno {i + 1:04d}"} for i in range(self.n_alumnos)]
+
+    def archivos(self, tarea_id, estudiante_id):
+        """URLs de los adjuntos de un alumno en una tarea (0..max_archivos)"""
+        semilla = hashlib.sha1(f"{tarea_id}/{estudiante_id}".encode()).digest()
+        urls = []
+        for k in range(semilla[0] % (self.max_archivos + 1)):
+            file_id = hashlib.sha1(f"{tarea_id}/{estudiante_id}/{k}".encode()).hexdigest()[:28]
+            tipo = self.TIPOS[semilla[k + 1] % len(self.TIPOS)]
+            if tipo == 'file':
+                urls.append(f"https://drive.google.com/file/d/{file_id}/view")
+            else:
+                urls.append(f"https://docs.google.com/{tipo}/d/{file_id}/edit")
+        return urls
+
+    def entregas_esperadas(self, clase_id, tarea_id):
+        """Lo que debería extraer el bot: [{'estudiante_id', 'nombre_alumno', 'urls'}]"""
+        return [{'estudiante_id': a['id'], 'nombre_alumno': a['nombre'], 'urls': self.archivos(tarea_id, a['id'])}
+                for a in self.alumnos(clase_id)]
+
+    # ---------------- Páginas ----------------
+
+    def instalar(self, servidor):
+        """Registra todas las rutas en un ServidorMock"""
+        enlaces = ''.join(f'<a href="/c/{c["id"]}"><div class="YVvGBb">{c["nombre"]}</div></a>\n'
+                          for c in self.clases())
+        servidor.agregar('/', f"<html><body>{enlaces}</body></html>")
+        servidor.agregar_dinamica('/w/', self._trabajo_de_clase)
+        servidor.agregar_dinamica('/c/', self._entregas)
+        servidor.agregar_dinamica('/g/tg/', self._calificacion)
+        servidor.agregar_dinamica('/_mock/entrega/', self._adjuntos)
+        servidor.agregar_dinamica(RUTA_BATCHEXECUTE, self._batchexecute)
+        for prefijo in ('/document/d/', '/presentation/d/', '/spreadsheets/d/', '/uc?'):
+            servidor.agregar_dinamica(prefijo, self._exportacion)
+        return servidor
+
+    def _pagina(self, cuerpo):
+        if self.latencia_pagina:
+            time.sleep(self.latencia_pagina)
+        return 200, 'text/html; charset=utf-8', f"<html><body>{cuerpo}</body></html>"
+
+    def _trabajo_de_clase(self, ruta):
+        # /w/CLASE/t/all
+        clase_id = ruta.split('/')[2]
+        items = ''.join(f'<li data-item-id="{t["id"]}"><a href="/c/{clase_id}/a/{t["id"]}/details">'
+                        f'<span class="asQXV">{t["nombre"]}</span></a></li>\n'
+                        for t in self.tareas(clase_id))
+        return self._pagina(f"<ol>{items}</ol>")
+
+    def _entregas(self, ruta):
+        # /c/CLASE/a/TAREA/submissions/by-status/and-sort-name/all
+        partes = ruta.split('?')[0].split('/')
+        if len(partes) < 5:
+            return None
+        clase_id, tarea_id = partes[2], partes[4]
+        alumnos = self.alumnos(clase_id)
+        # Cada alumno en su fila con el estado, como en Classroom (lo usa el modo vigilancia)
+        filas = ''.join(f'<div role="row"><a href="/c/{clase_id}/a/{tarea_id}/submissions/by-status/and-sort-name/'
+                        f'student/{a["id"]}"><span class="YVvGBb">{a["nombre"]}</span></a> '
+                        f'<span>{"Entregado" if self.archivos(tarea_id, a["id"]) else "Asignado"}</span></div>\n'
+                        for a in alumnos)
+        datos = json.dumps(self.registros_red(tarea_id, alumnos[:len(alumnos) // 2]))
+        return self._pagina(f"""{filas}
+<script>AF_initDataCallback({{key: 'ds:1', hash: '2', data:{datos}, sideChannel: {{}}}});</script>
+<script>fetch('{self.ruta_batchexecute(clase_id, tarea_id)}', {{method: 'POST'}});</script>""")
+
+    def ruta_batchexecute(self, clase_id, tarea_id):
+        """XHR con la segunda mitad de las entregas de la tarea"""
+        return f"{RUTA_BATCHEXECUTE}?rpcids=Xy1pQ&c={clase_id}&t={tarea_id}"
+
+    def registros_red(self, tarea_id, alumnos):
+        """Un registro por alumno como los de Classroom: [id, [[url, título], ...], estado]"""
+        return [[a['id'], [[url, f"Trabajo de {a['nombre']}"] for url in self.archivos(tarea_id, a['id'])],
+                 "TURNED_IN" if self.archivos(tarea_id, a['id']) else "CREATED"] for a in alumnos]
+
+    def _batchexecute(self, ruta):
+        consulta = urllib.parse.parse_qs(urllib.parse.urlsplit(ruta).query)
+        clase_id, tarea_id = consulta['c'][0], consulta['t'][0]
+        alumnos = self.alumnos(clase_id)
+        interno = json.dumps([self.registros_red(tarea_id, alumnos[len(alumnos) // 2:])])
+        bloque = json.dumps([["wrb.fr", "Xy1pQ", interno, None, None, None, "generic"], ["di", 42]])
+        return 200, 'application/json; charset=utf-8', f")]}}'\n\n{len(bloque)}\n{bloque}\n"
+
+    def _calificacion(self, ruta):
+        # /g/tg/CLASE/TAREA (el alumno va en #u=ID)
+        clase_id, tarea_id = ruta.split('?')[0].split('/')[3:5]
+        return self._pagina(f"""<div id="alumno" aria-selected="true"></div><div id="adjuntos"></div>
+<script>
+async function pintar(cambio) {{
+    if (cambio && Math.random() < {self.fallo_spa}) return;
+    const u = new URLSearchParams(location.hash.slice(1)).get('u');
+    const urls = await (await fetch('/_mock/entrega/{clase_id}/{tarea_id}/' + u)).json();
+    document.getElementById('alumno').dataset.studentId = u;
+    document.getElementById('adjuntos').innerHTML =
+        urls.map(x => '<div class="clmEye" data-url="' + x + '"></div>').join('');
+}}
+window.addEventListener('hashchange', () => pintar(true));
+pintar(false);
+</script>""")
+
+    def _adjuntos(self, ruta):
+        # /_mock/entrega/CLASE/TAREA/ALUMNO
+        _, _, _, clase_id, tarea_id, estudiante_id = ruta.split('?')[0].split('/')
+        return 200, 'application/json', json.dumps(self.archivos(tarea_id, estudiante_id))
+
+    def _exportacion(self, ruta):
+        if self.latencia_exportacion:
+            time.sleep(self.latencia_exportacion)
+        return 200, 'application/pdf', self.pdf
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == '--sintetico':
+        puerto = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+        servidor = ClassroomSintetico(n_alumnos=int(sys.argv[2])).instalar(ServidorMock(puerto=puerto))
+        print(f"🧪 Classroom sintético en {servidor.base_url}: CLASSROOM_BASE_URL={servidor.base_url} "
+              f"CLASSROOM_HOST_EXPORTACION={servidor.base_url}")
+    else:
+        puerto = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+        servidor = ServidorMock.desde_archivo(sys.argv[1], puerto)
+        print(f"🧪 Servidor mock en {servidor.base_url} ({len(servidor.rutas)} respuestas grabadas)")
+    try:
+        servidor._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
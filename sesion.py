@@ -0,0 +1,71 @@
+"""
+Instantáneas de la sesión de Google (cookies + localStorage) para arrancar en
+caliente sin pasar por login(): si el perfil persistente ya no tiene la
+sesión (o se ha borrado por estar corrupto), se restaura desde el archivo.
+"""
+
+import os
+import json
+import time
+
+# Cookies que indican una sesión de Google iniciada
+COOKIES_SESION = ('SID', '__Secure-1PSID', '__Secure-3PSID', 'SAPISID')
+
+# Una instantánea más antigua que esto no se usa (segundos)
+EDAD_MAXIMA = 7 * 24 * 3600
+
+# Restaura el localStorage de cada origen al cargar sus páginas
+JS_RESTAURAR_LOCAL_STORAGE = """
+(origenes => {
+    const datos = origenes[location.origin];
+    if (!datos) return;
+    for (const {name, value} of datos) {
+        if (localStorage.getItem(name) === null) localStorage.setItem(name, value);
+    }
+})(%s);
+"""
+
+
+def tiene_sesion(cookies, ahora=None):
+    """True si entre las cookies hay alguna de sesión de Google sin caducar"""
+    ahora = ahora or time.time()
+    for c in cookies:
+        if c['name'] in COOKIES_SESION and 'google.com' in c.get('domain', ''):
+            expira = c.get('expires', -1)
+            if expira is None or expira <= 0 or expira > ahora:
+                return True
+    return False
+
+
+def guardar_sesion(contexto, ruta):
+    """Guarda cookies + localStorage del contexto (solo legible por el usuario)"""
+    estado = contexto.storage_state()
+    estado['guardado'] = time.time()
+    temporal = ruta + '.tmp'
+    fd = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+    os.replace(temporal, ruta)
+    return estado
+
+
+def cargar_sesion(ruta, edad_maxima=EDAD_MAXIMA):
+    """Devuelve la instantánea si existe, no es vieja y tiene sesión; si no, None"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - estado.get('guardado', 0) > edad_maxima:
+        return None
+    if not tiene_sesion(estado.get('cookies', [])):
+        return None
+    return estado
+
+
+def restaurar_sesion(contexto, estado):
+    """Carga la instantánea en el contexto (cookies ya, localStorage al navegar)"""
+    contexto.add_cookies(estado.get('cookies', []))
+    origenes = {o['origin']: o.get('localStorage', []) for o in estado.get('origins', [])}
+    if any(origenes.values()):
+        contexto.add_init_script(JS_RESTAURAR_LOCAL_STORAGE % json.dumps(origenes))
@@ -0,0 +1,104 @@
+"""
+Trazas de tiempo por fase: cada navegación (goto/reload), espera, lectura
+del DOM y descarga queda registrada como un tramo con su duración, bytes y
+resultado. Al final se muestra una tabla con p50/p95 por fase y se exporta
+una línea de tiempo en formato Chrome trace (chrome://tracing o Perfetto).
+
+Desactivado, el bot usa contextlib.nullcontext en lugar de tramo(): el coste
+es el de crear un diccionario vacío por tramo.
+"""
+
+import os
+import json
+import math
+import time
+import threading
+import contextlib
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano; valores ya ordenados"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class Trazador:
+    """Acumula tramos (nombre, fase, inicio, duración, hilo, datos)"""
+
+    def __init__(self):
+        self.fase = 'inicio'
+        self.tramos = []
+        self._t0 = time.perf_counter()
+        # Las descargas registran sus tramos desde los hilos del pool
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def tramo(self, nombre, **datos):
+        """
+        Mide el bloque. Devuelve el dict `datos` para añadir bytes, resultado...
+        Si el bloque lanza una excepción el tramo queda con ok=False.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield datos
+        except BaseException as e:
+            datos['ok'] = False
+            datos['error'] = type(e).__name__
+            raise
+        finally:
+            self.registrar(nombre, inicio, **datos)
+
+    def registrar(self, nombre, inicio, fin=None, **datos):
+        """Añade un tramo medido fuera de tramo() (inicio/fin de perf_counter)"""
+        fin = time.perf_counter() if fin is None else fin
+        with self._lock:
+            self.tramos.append((nombre, self.fase, inicio, fin - inicio, threading.get_ident(), datos))
+
+    # ---------------- Salida ----------------
+
+    def exportar(self, ruta):
+        """Guarda la línea de tiempo en formato Chrome trace (eventos 'X')"""
+        pid = os.getpid()
+        eventos = [{
+            'name': nombre,
+            'cat': fase,
+            'ph': 'X',
+            'ts': round((inicio - self._t0) * 1e6),
+            'dur': round(duracion * 1e6),
+            'pid': pid,
+            'tid': hilo,
+            'args': datos,
+        } for nombre, fase, inicio, duracion, hilo, datos in self.tramos]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+        print(f"✓ Trazas guardadas en {ruta} ({len(eventos)} tramos)")
+
+    def resumen(self):
+        """(fase, nombre) -> {'n', 'total', 'p50', 'p95', 'max', 'bytes', 'errores'}"""
+        grupos = {}
+        for nombre, fase, _, duracion, _, datos in self.tramos:
+            g = grupos.setdefault((fase, nombre), {'duraciones': [], 'bytes': 0, 'errores': 0})
+            g['duraciones'].append(duracion)
+            g['bytes'] += datos.get('bytes') or 0
+            if datos.get('ok') is False:
+                g['errores'] += 1
+
+        resumen = {}
+        for clave, g in grupos.items():
+            d = sorted(g['duraciones'])
+            resumen[clave] = {'n': len(d), 'total': sum(d), 'p50': percentil(d, 50), 'p95': percentil(d, 95),
+                              'max': d[-1], 'bytes': g['bytes'], 'errores': g['errores']}
+        return resumen
+
+    def informe(self):
+        """Tabla de fin de ejecución: tiempo por fase y tipo de tramo"""
+        resumen = self.resumen()
+        if not resumen:
+            return
+        print("\n📊 TIEMPO POR FASE (tramos):")
+        print(f"  {'fase':<11} {'tramo':<22} {'n':>5} {'total':>8} {'p50':>7} {'p95':>7} {'máx':>7} {'MB':>7} {'err':>4}")
+        print("-" * 86)
+        for (fase, nombre), r in resumen.items():
+            print(f"  {fase:<11} {nombre:<22} {r['n']:>5} {r['total']:>7.1f}s {r['p50']:>6.2f}s {r['p95']:>6.2f}s"
+                  f" {r['max']:>6.2f}s {r['bytes'] / 1e6:>7.1f} {r['errores']:>4}")
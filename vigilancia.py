@@ -0,0 +1,170 @@
+"""
+Modo vigilancia: archiva las entregas según van llegando.
+
+Cada `intervalo` segundos (± `jitter`) recarga solo la página de entregas
+de cada tarea vigilada y la compara con el último estado conocido:
+alumnos nuevos, fila cambiada (estado "Entregado"/"Devuelto", nota...) o,
+si la captura de red los resuelve en esa misma carga, IDs de adjuntos
+distintos. Solo esos alumnos se extraen y se descargan. Sin cambios, cada
+ronda cuesta una carga de página por tarea en lugar de una por alumno.
+
+El estado (huella y entrega de cada alumno) se guarda en
+vigilancia_classroom.json de forma atómica tras revisar cada tarea, así
+que al volver a arrancar se sigue donde se quedó.
+"""
+
+import os
+import json
+import time
+import random
+import tempfile
+import traceback
+
+from lote import LoteClassroom
+from salida_jsonl import EscritorEntregas, ruta_jsonl, escribir_resumen
+from captura_red import entregas_desde_capturas, RE_ID_ARCHIVO
+
+ESTADO_POR_DEFECTO = "vigilancia_classroom.json"
+
+
+def _ids_archivos(urls):
+    """IDs de Drive de una lista de URLs, ordenados (para comparar)"""
+    return sorted({m.group(1) for m in map(RE_ID_ARCHIVO.search, urls) if m})
+
+
+class VigilanciaClassroom(LoteClassroom):
+    """LoteClassroom que, en lugar de procesar la cola una vez, la revisa en rondas"""
+
+    def __init__(self, bot, intervalo=300, jitter=0.2, rondas=0, ruta_estado=ESTADO_POR_DEFECTO, **opciones):
+        super().__init__(bot, **opciones)
+        self.intervalo = intervalo
+        self.jitter = jitter
+        # Número de rondas (0 = hasta Ctrl-C)
+        self.rondas = rondas
+        self.ruta_estado = ruta_estado
+        self.estado = {'version': 1, 'tareas': {}}
+        if os.path.exists(ruta_estado):
+            try:
+                with open(ruta_estado, encoding='utf-8') as f:
+                    self.estado = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠ Estado de vigilancia ilegible, se empieza de cero: {ruta_estado}")
+        self.vigiladas = []
+        self.estadisticas = {'rondas': 0, 'cargas': 0, 'alumnos': 0, 'cambios': 0, 'descargados': 0}
+
+    # ---------------- Rondas ----------------
+
+    def ejecutar(self):
+        """Revisa las tareas planificadas cada `intervalo` segundos (Ctrl-C para parar)"""
+        self.vigiladas = list(self.cola)
+        self.cola.clear()
+        if not self.vigiladas:
+            return self.resultados
+        print(f"\n👀 Vigilando {len(self.vigiladas)} tarea(s) cada {self.intervalo:.0f}s "
+              f"(±{self.jitter:.0%}); Ctrl-C para terminar")
+        while True:
+            self.ronda()
+            if self.rondas and self.estadisticas['rondas'] >= self.rondas:
+                break
+            espera = self.intervalo * random.uniform(1 - self.jitter, 1 + self.jitter)
+            print(f"💤 Próxima ronda en {espera:.0f}s")
+            time.sleep(espera)
+        return self.resultados
+
+    def ronda(self):
+        """Una pasada por todas las tareas; un fallo en una no para el resto"""
+        self.estadisticas['rondas'] += 1
+        cambios = 0
+        for trabajo in self.vigiladas:
+            clase, tarea = trabajo['clase'], trabajo['tarea']
+            try:
+                cambios += self.revisar(clase, tarea)
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                print(f"✗ Error revisando {clase['nombre']} → {tarea['nombre']}: {e}")
+                traceback.print_exc()
+        print(f"🔎 Ronda {self.estadisticas['rondas']}: {len(self.vigiladas)} tarea(s), {cambios} cambio(s)")
+        return cambios
+
+    # ---------------- Una tarea ----------------
+
+    def revisar(self, clase, tarea):
+        """Carga la página de entregas, procesa los alumnos que cambiaron y devuelve cuántos"""
+        estudiantes, filas, capturas = self.bot.leer_estado_entregas(clase['id'], tarea['id'])
+        self.estadisticas['cargas'] += 1
+        self.estadisticas['alumnos'] += len(estudiantes)
+        por_red = entregas_desde_capturas(capturas, estudiantes) if capturas else {}
+
+        conocidos = self.estado['tareas'].setdefault(f"{clase['id']}/{tarea['id']}", {'alumnos': {}})['alumnos']
+        nuevos, cambiados, huellas = [], [], {}
+        for est in estudiantes:
+            huella = {'fila': filas.get(est['id'], ''),
+                      'archivos': _ids_archivos(por_red[est['id']]) if est['id'] in por_red else None}
+            huellas[est['id']] = huella
+            previo = conocidos.get(est['id'])
+            if previo is None:
+                nuevos.append(est)
+            elif previo['fila'] != huella['fila'] or (
+                    huella['archivos'] is not None and previo['archivos'] is not None
+                    and huella['archivos'] != previo['archivos']):
+                cambiados.append(est)
+        # Alumnos que ya no están en la lista
+        quitados = set(conocidos) - set(huellas)
+        for est_id in quitados:
+            del conocidos[est_id]
+        if not (nuevos or cambiados or quitados):
+            return 0
+
+        print(f"\n🔔 {clase['nombre']} → {tarea['nombre']}: {len(nuevos)} alumno(s) nuevos, "
+              f"{len(cambiados)} con cambios, {len(quitados)} fuera de la lista")
+        entregas = []
+        # Los nuevos pueden salir del manifiesto; los cambiados hay que volver a leerlos
+        for grupo, revisitar in ((nuevos, False), (cambiados, True)):
+            if grupo:
+                entregas += self.bot.extraer_todas_entregas(
+                    clase['id'], tarea['id'], tarea['nombre'], concurrencia=self.concurrencia,
+                    estudiantes=grupo, nombre_clase=clase['nombre'], revisitar=revisitar, capturas=capturas)
+        for entrega in entregas:
+            conocidos[entrega['estudiante_id']] = dict(huellas[entrega['estudiante_id']], entrega=entrega)
+
+        carpeta = self.carpeta_tarea(clase, tarea)
+        self._escribir_json(clase, tarea, carpeta, [conocidos[e['id']]['entrega'] for e in estudiantes
+                                                    if e['id'] in conocidos])
+        if self.descargar and any(e['archivos'] for e in entregas):
+            self.estadisticas['descargados'] += self.bot.descargar_como_pdf(
+                entregas, carpeta, concurrencia=self.descargas, clase_id=clase['id'], tarea_id=tarea['id'])
+        self.estadisticas['cambios'] += len(entregas) + len(quitados)
+        self.guardar_estado()
+        return len(entregas) + len(quitados)
+
+    def _escribir_json(self, clase, tarea, carpeta, entregas):
+        """Vuelve a generar entregas_X.json con todos los alumnos conocidos de la tarea"""
+        from bot import cabecera_resumen, nombre_json_tarea
+
+        ruta_json = os.path.join(carpeta, nombre_json_tarea(tarea['nombre']))
+        with EscritorEntregas(ruta_jsonl(ruta_json), sincronizar_cada=1000) as flujo:
+            for entrega in entregas:
+                flujo.escribir(entrega)
+        escribir_resumen(flujo.ruta, ruta_json, cabecera_resumen(clase['nombre'], clase['id'],
+                                                                tarea['nombre'], tarea['id']))
+
+    def guardar_estado(self):
+        """Escribe el estado de forma atómica"""
+        carpeta = os.path.dirname(os.path.abspath(self.ruta_estado))
+        fd, temporal = tempfile.mkstemp(prefix='.vigilancia_', suffix='.tmp', dir=carpeta)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.estado, f, ensure_ascii=False)
+            os.replace(temporal, self.ruta_estado)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+    def resumen(self):
+        est = self.estadisticas
+        print("\n👀 RESUMEN DE LA VIGILANCIA:")
+        print("-" * 60)
+        print(f"  {est['rondas']} ronda(s), {est['cargas']} carga(s) de página para {est['alumnos']} alumno(s) revisados")
+        print(f"  {est['cambios']} entrega(s) nuevas o cambiadas, {est['descargados']} archivo(s) descargados")